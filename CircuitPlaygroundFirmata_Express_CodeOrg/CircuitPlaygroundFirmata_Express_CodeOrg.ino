@@ -98,7 +98,7 @@
   See file LICENSE.txt for further informations on licensing terms.
 */
 
-uint8_t IMPLEMENTATION_VERSION[3] = { 8, 29, 19 }; // semver: maj, min, fix
+uint8_t IMPLEMENTATION_VERSION[3] = { 8, 30, 0 }; // semver: maj, min, fix
 
 #include <SPI.h>
 #include <Servo.h>
@@ -184,12 +184,51 @@ void line_state_callback(bool connected) {
 #define CP_PIXEL_BRIGHTNESS     0x13  // Set the brightness of the NeoPixels, just like calling the
                                       // NeoPixel library setBrightness function.  Takes one parameter
                                       // which is a single byte with a value 0-100.
+#define CP_PIXEL_SET_ALL        0x14  // Set a run of NeoPixels with one command, expects the following bytes as data:
+                                      //  - First pixel ID (0-9)
+                                      //  - Show flag, if 1 the pixels are shown after being set (like CP_PIXEL_SHOW)
+                                      //  - Pixel RGB color data as 4 7-bit bytes (same packing as CP_PIXEL_SET)
+                                      //    for each pixel, starting at the first pixel ID.
+#define CP_PIXEL_ANIM           0x15  // Run a pixel animation on the board, it's rendered from the loop until another
+                                      // animation or any other pixel command.  Expects the following bytes as data:
+                                      //  - Animation: 0 = off (pixels keep their colors), 1 = breathe (every pixel
+                                      //    pulses from color 1 to color 0 and back together), 2 = chase (a pulse of
+                                      //    color 0 travels over color 1), 3 = lerp (each pixel follows a sine wave
+                                      //    between color 0 and color 1), 4 = rainbow (colors are ignored),
+                                      //    other values are ignored
+                                      //  - Frequency (millihertz) as 2 7-bit bytes
+                                      //  - Phase offset between adjacent pixels (thousandths of a turn) as 2 7-bit bytes
+                                      //  - Color 0 and color 1 RGB data as 4 7-bit bytes each (same packing as CP_PIXEL_SET)
 #define CP_TONE                 0x20  // Play a tone on the speaker, expects the following bytes as data:
                                       //  - Frequency (hz) as 2 7-bit bytes (up to 2^14 hz, or about 16khz)
                                       //  - Duration (ms) as 2 7-bit bytes.
 #define CP_NO_TONE              0x21  // Stop playing anything on the speaker.
+#define CP_TONE_SEQUENCE        0x22  // Queue a sequence of notes to play on the speaker with on-board timing, expects the
+                                      // following bytes as data:
+                                      //  - Flags: bit 0 = start a new sequence (stop playback and clear the queued
+                                      //    notes), bit 1 = start playing the queued notes.
+                                      //  - For each note (up to TONE_SEQUENCE_MAX notes queued in total):
+                                      //    - Frequency (hz) as 2 7-bit bytes, 0 = a rest.
+                                      //    - Duration (ms) as 2 7-bit bytes.
+                                      // Long sequences are sent as multiple messages, only the last sets the play flag.
+                                      // A CP_TONE_SEQUENCE_REPLY is sent once the sequence finishes or is stopped.
+#define CP_TONE_SEQUENCE_STOP   0x23  // Stop playing a tone sequence.
+#define CP_TONE_SEQUENCE_REPLY  0x24  // Tone sequence finished.  Includes a byte that's 1 if every note was played or 0 if
+                                      // the sequence was stopped, then a byte with the number of notes played.
 #define CP_ACCEL_READ           0x30  // Return the current x, y, z accelerometer values.
 #define CP_ACCEL_TAP            0x31  // Return the current accelerometer tap state.
+#define CP_ACCEL_STREAM_CONFIG  0x32  // Turn on continuous streaming of accelerometer data with a configured format and
+                                      // rate, expects the following bytes as data:
+                                      //  - Format: 0 = floats (CP_ACCEL_READ_REPLY), 1 = int16 counts (CP_ACCEL_RAW_REPLY)
+                                      //  - Interval between samples (ms) as 2 7-bit bytes, 0 = the sampling interval.
+#define CP_ACCEL_RAW_REPLY      0x33  // Result of a raw accelerometer read.  Sent as 7-bit bytes (not expanded into 2 bytes
+                                      // like the other responses), includes a byte with the accelerometer range (0-3) then
+                                      // x, y, z as signed 12-bit counts, each split across 2 7-bit bytes (LSB first).
+#define CP_ACCEL_BATCH_ON       0x34  // Turn on batched streaming of accelerometer data, the board buffers samples and sends
+                                      // them in CP_ACCEL_BATCH_REPLY messages.  Expects the following bytes as data:
+                                      //  - Samples per message (1-32)
+                                      //  - Interval between samples (ms) as 2 7-bit bytes.
+#define CP_ACCEL_BATCH_OFF      0x35  // Turn off batched streaming of accelerometer data.
 #define CP_ACCEL_READ_REPLY     0x36  // Result of an acceleromete read.  Includes 3 floating point values (4 bytes each) with x, y, z
                                       // acceleration in meters/second^2.
 #define CP_ACCEL_TAP_REPLY      0x37  // Result of the tap sensor read.  Includes a byte with the tap register value.
@@ -205,6 +244,12 @@ void line_state_callback(bool connected) {
                                       //   - Click threshold: 0-255, the higher the value the less sensitive.  Depends on the accelerometer
                                       //     range, good values are: +/-16G = 5-10, +/-8G = 10-20, +/-4G = 20-40, +/-2G = 40-80
                                       //     80 is the default value (goes well with default of +/-2G)
+#define CP_ACCEL_BATCH_REPLY    0x3E  // Batch of accelerometer samples.  Sent as 7-bit bytes like CP_ACCEL_RAW_REPLY, includes:
+                                      //  - Accelerometer range (0-3)
+                                      //  - Number of samples
+                                      //  - Time of the first sample (ms since board start) as 4 7-bit bytes (LSB first)
+                                      //  - Interval between samples (ms) as 2 7-bit bytes
+                                      //  - x, y, z of each sample as signed 12-bit counts, each split across 2 7-bit bytes
 #define CP_CAP_READ             0x40  // Read a single capacitive input.  Expects a byte as a parameter with the
                                       // cap touch input to read (0, 1, 2, 3, 6, 9, 10, 12).  Will respond with a
                                       // CP_CAP_REPLY message.
@@ -212,6 +257,23 @@ void line_state_callback(bool connected) {
 #define CP_CAP_OFF              0x42  // Turn off continuous cap touch reads for the specified input (sent as a byte parameter).
 #define CP_CAP_REPLY            0x43  // Capacitive input read response.  Includes a byte with the pin # of the cap input, then
                                       // four bytes of data which represent an int32_t value read from the cap input.
+#define CP_CAP_SCAN             0x44  // Read all eight capacitive inputs at once.  Will respond with a single
+                                      // CP_CAP_SCAN_REPLY message.
+#define CP_CAP_SCAN_REPLY       0x45  // Capacitive scan response.  Includes eight int32_t values (4 bytes each), one for
+                                      // each cap touch input in cap_state order (0, 1, 2, 3, 6, 9, 10, 12).
+#define CP_CAP_CONFIG           0x46  // Configure on-board touch detection of a cap touch input, expects the following bytes as data:
+                                      //  - Cap touch input (0, 1, 2, 3, 6, 9, 10, 12)
+                                      //  - Touch threshold as 2 7-bit bytes, 0 = no touch detection (stream every
+                                      //    value with CP_CAP_REPLY, the default)
+                                      //  - Hysteresis as 2 7-bit bytes, a touched input is released once its value
+                                      //    drops below threshold - hysteresis
+                                      //  - Heartbeat interval (ms) as 2 7-bit bytes, 0 = no heartbeat
+                                      // With a threshold set a streaming input (see CP_CAP_ON) only sends a
+                                      // CP_CAP_EVENT_REPLY when it's touched or released, plus its raw value as a
+                                      // CP_CAP_REPLY every heartbeat interval.
+#define CP_CAP_EVENT_REPLY      0x47  // Cap touch event.  Includes a byte with the pin # of the cap input, a byte that's
+                                      // 1 if the input was touched or 0 if released, then four bytes of data which
+                                      // represent the int32_t value read from the cap input.
 #define CP_SENSECOLOR           0x50  // Perform a color sense using the NeoPixel and light sensor.
 #define CP_SENSECOLOR_REPLY     0x51  // Result of a color sense, will return the red, green, blue color
                                       // values that were read from the light sensor.  This will return
@@ -221,6 +283,26 @@ void line_state_callback(bool connected) {
                                       //  - blue color (unsigned 8 bit value, split across 2 7-bit bytes)
 #define CP_IMPL_VERS            0x60  // Get the implementation version
 #define CP_IMPL_VERS_REPLY      0x61  // 3 bytes from IMPLEMENTATION_VERSION
+#define CP_MIC_CAPTURE          0x70  // Capture raw microphone samples and send them in CP_MIC_SAMPLES_REPLY messages,
+                                      // expects the following bytes as data:
+                                      //  - Number of samples as 2 7-bit bytes, 0 = capture until CP_MIC_CAPTURE_STOP
+                                      //  - Interval between samples (microseconds) as 2 7-bit bytes.
+#define CP_MIC_CAPTURE_STOP     0x71  // Stop capturing raw microphone samples.
+#define CP_MIC_LEVEL_ON         0x72  // Turn on streaming of the sound level, every interval the board samples the
+                                      // microphone and sends the RMS and peak level in a CP_MIC_LEVEL_REPLY.  Samples
+                                      // are taken in short slices between the other loop work, so long windows don't
+                                      // stall the board.  Expects the following bytes as data:
+                                      //  - Interval between reports (ms) as 2 7-bit bytes.
+                                      //  - Number of samples per report (1-4096) as 2 7-bit bytes.
+                                      //  - Interval between samples (microseconds) as 2 7-bit bytes.
+#define CP_MIC_LEVEL_OFF        0x73  // Turn off streaming of the sound level.
+#define CP_MIC_SAMPLES_REPLY    0x74  // Frame of raw microphone samples.  Sent as 7-bit bytes like CP_ACCEL_RAW_REPLY, includes:
+                                      //  - Time of the first sample (microseconds since board start) as 4 7-bit bytes (LSB first)
+                                      //  - Number of samples (1-32)
+                                      //  - Interval between samples (microseconds) as 2 7-bit bytes
+                                      //  - Each sample as an unsigned 10-bit value split across 2 7-bit bytes
+#define CP_MIC_LEVEL_REPLY      0x75  // Sound level.  Includes a floating point value (4 bytes) with the RMS level and a
+                                      // uint16_t value (2 bytes) with the peak level, both in ADC counts from the average.
 
 
 // the minimum interval for sampling analog input
@@ -234,10 +316,80 @@ void line_state_callback(bool connected) {
 // Circuit playground globals:
 bool streamTap = false;
 bool streamAccel = false;
+// Accelerometer stream formats set by CP_ACCEL_STREAM_CONFIG.
+#define ACCEL_FORMAT_FLOAT  0
+#define ACCEL_FORMAT_INT16  1
+uint8_t accelStreamFormat = ACCEL_FORMAT_FLOAT;
+unsigned int accelStreamInterval = 0;  // Milliseconds between streamed accelerometer samples, 0 = samplingInterval.
+unsigned long previousAccelMillis = 0;
+// Batched accelerometer streaming state, samples are buffered until a batch is full.
+#define ACCEL_BATCH_MAX     32
+bool streamAccelBatch = false;
+uint8_t accelBatchSize = 0;             // Samples to send in each CP_ACCEL_BATCH_REPLY.
+uint8_t accelBatchCount = 0;            // Samples currently buffered.
+unsigned int accelBatchInterval = 0;    // Milliseconds between batched samples.
+unsigned long previousBatchMillis = 0;  // Time of the last batched sample.
+unsigned long accelBatchStart = 0;      // Time of the first buffered sample.
+int16_t accelBatch[ACCEL_BATCH_MAX][3];
+// Pixel animation state, set by CP_PIXEL_ANIM and rendered from the loop.
+#define PIXEL_ANIM_OFF       0
+#define PIXEL_ANIM_BREATHE   1
+#define PIXEL_ANIM_CHASE     2
+#define PIXEL_ANIM_LERP      3
+#define PIXEL_ANIM_RAINBOW   4
+#define PIXEL_ANIM_INTERVAL  20   // Milliseconds between animation frames.
+uint8_t pixelAnim = PIXEL_ANIM_OFF;
+uint16_t pixelAnimFrequency = 0;        // Millihertz.
+uint16_t pixelAnimPhaseStep = 0;        // Phase between adjacent pixels in 1/65536 of a turn.
+uint8_t pixelAnimColors[2][3];
+uint32_t pixelAnimTurn = 0;             // Animation phase in millionths of a turn.
+unsigned long previousPixelAnimMillis = 0;
+// Quarter wave of a sine scaled to +/-127, see sineWave8.
+const uint8_t quarterSine[65] PROGMEM = {
+    0,   3,   6,   9,  12,  16,  19,  22,  25,  28,  31,  34,  37,  40,  43,  46,
+   49,  51,  54,  57,  60,  63,  65,  68,  71,  73,  76,  78,  81,  83,  85,  88,
+   90,  92,  94,  96,  98, 100, 102, 104, 106, 107, 109, 111, 112, 113, 115, 116,
+  117, 118, 120, 121, 122, 122, 123, 124, 125, 125, 126, 126, 126, 127, 127, 127,
+  127
+};
+// Tone sequence state, notes are queued by CP_TONE_SEQUENCE and played from the loop.
+#define TONE_SEQUENCE_MAX   64
+uint16_t toneSequence[TONE_SEQUENCE_MAX][2];  // Frequency (hz) and duration (ms) of each note.
+uint8_t toneSequenceLength = 0;         // Notes queued.
+uint8_t toneSequenceIndex = 0;          // Next note to play.
+bool toneSequencePlaying = false;
+unsigned long toneNoteStart = 0;        // Time the current note started.
+unsigned int toneNoteDuration = 0;      // Duration of the current note.
+// Microphone capture and sound level state, set by CP_MIC_CAPTURE and CP_MIC_LEVEL_ON.
+#define MIC_ANALOG          4    // Analog input of the microphone.
+#define MIC_FRAME_MAX       32   // Samples per CP_MIC_SAMPLES_REPLY.
+#define MIC_LEVEL_MAX       4096 // Samples per sound level report.
+bool micCapture = false;
+unsigned int micRemaining = 0;           // Samples left to capture, 0 = capture until stopped.
+unsigned int micPeriod = 125;            // Microseconds between captured samples.
+int16_t micFrame[MIC_FRAME_MAX];
+bool streamMicLevel = false;
+unsigned int micLevelInterval = 50;      // Milliseconds between sound level reports.
+unsigned int micLevelSamples = 128;      // Samples per sound level report.
+unsigned int micLevelPeriod = 125;       // Microseconds between sound level samples.
+unsigned long previousMicLevelMillis = 0;
+#define MIC_LEVEL_SLICE     1000 // Most microseconds spent sampling the sound level per loop pass.
+bool micLevelSampling = false;           // True while a sound level window is being sampled.
+unsigned int micLevelCount = 0;          // Samples taken in the current window.
+unsigned long micLevelNext = 0;          // Time of the next sample (micros).
+uint32_t micLevelSum = 0;
+uint32_t micLevelSumSquares = 0;
+int16_t micLevelLow = 1023;
+int16_t micLevelHigh = 0;
 // Define type for the cap touch sensor state of each cap touch input.
 typedef struct {
   bool streaming;
   uint8_t pin;
+  uint16_t threshold;           // Touch threshold set by CP_CAP_CONFIG, 0 = stream every value.
+  uint16_t hysteresis;          // Touched inputs are released below threshold - hysteresis.
+  bool touched;                 // Last touch state sent in a CP_CAP_EVENT_REPLY.
+  unsigned int heartbeat;       // Milliseconds between raw values sent in event mode, 0 = never.
+  unsigned long lastHeartbeat;  // Time the last raw value was sent in event mode.
 } cap_state_type;
 
 cap_state_type cap_state[CAP_COUNT] = {
@@ -841,6 +993,7 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
       // Set a NeoPixel to the specified RGB color.
       // Expect: 1 byte pixel number, 4 bytes pixel RGB value (as 7-bit bytes)
       if (argc >= 5) {
+        pixelAnim = PIXEL_ANIM_OFF;
         // Parse out the pixel number and R, G, B bytes.
         uint8_t pixel = argv[0] & 0x7F;
         uint8_t r = (argv[1] << 1) | ((argv[2] & 0x7F) >> 6);  // Red = 7 bits from byte 4 and 1 bit from byte 5
@@ -849,12 +1002,60 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
         CircuitPlayground.strip.setPixelColor(pixel, r, g, b);
       }
       break;
+    case CP_PIXEL_SET_ALL:
+      // Set a run of NeoPixels to the specified RGB colors.
+      // Expect: 1 byte first pixel number, 1 byte show flag, then 4 bytes pixel RGB value
+      // (as 7-bit bytes) for each pixel.
+      if (argc >= 2) {
+        pixelAnim = PIXEL_ANIM_OFF;
+        uint8_t pixel = argv[0] & 0x7F;
+        for (int i=2; (i+4 <= argc) && (pixel < CircuitPlayground.strip.numPixels()); i+=4, ++pixel) {
+          // Parse out the R, G, B bytes just like CP_PIXEL_SET.
+          uint8_t r = (argv[i] << 1) | ((argv[i+1] & 0x7F) >> 6);
+          uint8_t g = ((argv[i+1] & 0x3F) << 2) | (((argv[i+2]) & 0x7F) >> 5);
+          uint8_t b = ((argv[i+2] & 0x1F) << 3) | (((argv[i+3]) & 0x7F) >> 4);
+          CircuitPlayground.strip.setPixelColor(pixel, r, g, b);
+        }
+        if (argv[1] & 0x01) {
+          CircuitPlayground.strip.show();
+        }
+      }
+      break;
+    case CP_PIXEL_ANIM:
+      // Start or stop a pixel animation.
+      // Expect: 1 byte animation, 2 bytes frequency, 2 bytes phase offset, then 4 bytes
+      // RGB value (as 7-bit bytes) for each of the 2 colors.
+      if (argc >= 13) {
+        // Stop processing if the animation is unknown, the running
+        // animation (if any) keeps going.
+        if ((argv[0] & 0x7F) > PIXEL_ANIM_RAINBOW) {
+          return;
+        }
+        pixelAnim = argv[0] & 0x7F;
+        pixelAnimFrequency = ((argv[2] & 0x7F) << 7) | (argv[1] & 0x7F);
+        uint16_t phaseStep = (((argv[4] & 0x7F) << 7) | (argv[3] & 0x7F)) % 1000;
+        pixelAnimPhaseStep = (uint32_t)phaseStep*65536/1000;
+        for (int c=0; c<2; ++c) {
+          // Parse out the R, G, B bytes just like CP_PIXEL_SET.
+          byte* color = &argv[5+c*4];
+          pixelAnimColors[c][0] = (color[0] << 1) | ((color[1] & 0x7F) >> 6);
+          pixelAnimColors[c][1] = ((color[1] & 0x3F) << 2) | ((color[2] & 0x7F) >> 5);
+          pixelAnimColors[c][2] = ((color[2] & 0x1F) << 3) | ((color[3] & 0x7F) >> 4);
+        }
+        pixelAnimTurn = 0;
+        previousPixelAnimMillis = millis();
+        if (pixelAnim != PIXEL_ANIM_OFF) {
+          renderPixelAnimation(0);
+        }
+      }
+      break;
     case CP_PIXEL_SHOW:
       // Light up the neopixels with their current buffer values.
       CircuitPlayground.strip.show();
       break;
     case CP_PIXEL_CLEAR:
       // Clear all the pixel color values.
+      pixelAnim = PIXEL_ANIM_OFF;
       CircuitPlayground.strip.clear();
       break;
     case CP_PIXEL_BRIGHTNESS:
@@ -872,6 +1073,7 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
       // Play a tone on the speaker.
       // Expect: 2 bytes tone frequency, 2 bytes tone duration
       if (argc >= 4) {
+        stopToneSequence();
         uint16_t frequency = ((argv[1] & 0x7F) << 7) | (argv[0] & 0x7F);
         uint16_t duration = ((argv[3] & 0x7F) << 7) | (argv[2] & 0x7F);
         // If duration is zero then interpret that as continuous tone playback.
@@ -890,6 +1092,7 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
       break;
     case CP_NO_TONE:
       // Stop tone playback.
+      stopToneSequence();
       // Force output mode of speaker and speaker enable pin as it might have
       // been clobbered by user code since A0 / D12 is also the speaker output.
       pinMode(CPLAY_SPEAKER, OUTPUT);
@@ -898,6 +1101,29 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
       tone(CPLAY_SPEAKER, 100, 1);  // Very short tone to stop playback as noTone locks the board.
       //noTone(CPLAY_SPEAKER);  TODO: Notone broken! Locks up
       break;
+    case CP_TONE_SEQUENCE:
+      // Queue notes of a tone sequence and start playing them.
+      // Expect: 1 byte flags, then 2 bytes frequency and 2 bytes duration for each note
+      if (argc >= 1) {
+        if (argv[0] & 0x01) {
+          stopToneSequence();
+        }
+        for (int i=1; (i+3 < argc) && (toneSequenceLength < TONE_SEQUENCE_MAX); i += 4) {
+          toneSequence[toneSequenceLength][0] = ((argv[i+1] & 0x7F) << 7) | (argv[i] & 0x7F);
+          toneSequence[toneSequenceLength][1] = ((argv[i+3] & 0x7F) << 7) | (argv[i+2] & 0x7F);
+          toneSequenceLength++;
+        }
+        if ((argv[0] & 0x02) && !toneSequencePlaying) {
+          toneSequencePlaying = true;
+          toneNoteStart = millis();
+          toneNoteDuration = 0;
+          playNextSequenceNote();
+        }
+      }
+      break;
+    case CP_TONE_SEQUENCE_STOP:
+      stopToneSequence();
+      break;
     case CP_IMPL_VERS:
       sendImplemenationVersionResponse();
       break;
@@ -915,6 +1141,44 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
       break;
     case CP_ACCEL_STREAM_ON:
       streamAccel = true;
+      accelStreamFormat = ACCEL_FORMAT_FLOAT;
+      accelStreamInterval = 0;
+      break;
+    case CP_ACCEL_BATCH_ON:
+      // Turn on batched accelerometer streaming.
+      // Expects 1 byte samples per message, 2 bytes interval between samples (ms).
+      if (argc >= 3) {
+        uint8_t size = argv[0] & 0x7F;
+        unsigned int interval = ((argv[2] & 0x7F) << 7) | (argv[1] & 0x7F);
+        if ((size < 1) || (size > ACCEL_BATCH_MAX) || (interval == 0)) {
+          // Bad batch configuration, stop processing!
+          return;
+        }
+        accelBatchSize = size;
+        accelBatchInterval = interval;
+        accelBatchCount = 0;
+        previousBatchMillis = millis();
+        streamAccelBatch = true;
+      }
+      break;
+    case CP_ACCEL_BATCH_OFF:
+      streamAccelBatch = false;
+      accelBatchCount = 0;
+      break;
+    case CP_ACCEL_STREAM_CONFIG:
+      // Turn on accelerometer streaming with the specified format and rate.
+      // Expects 1 byte format, 2 bytes interval between samples (ms).
+      if (argc >= 3) {
+        uint8_t format = argv[0] & 0x7F;
+        if (format > ACCEL_FORMAT_INT16) {
+          // Unknown format value, stop processing!
+          return;
+        }
+        accelStreamFormat = format;
+        accelStreamInterval = ((argv[2] & 0x7F) << 7) | (argv[1] & 0x7F);
+        previousAccelMillis = millis();
+        streamAccel = true;
+      }
       break;
     case CP_ACCEL_STREAM_OFF:
       streamAccel = false;
@@ -958,6 +1222,27 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
         }
       }
       break;
+    case CP_CAP_SCAN:
+      // Read all the cap inputs and send their values back in one response.
+      sendCapScanResponse();
+      break;
+    case CP_CAP_CONFIG:
+      // Configure touch detection of the specified input.
+      // Expects 1 byte input, 2 bytes threshold, 2 bytes hysteresis, 2 bytes heartbeat interval (ms).
+      if (argc >= 7) {
+        uint8_t input = argv[0] & 0x7F;
+        // Now find the specified cap input and update its configuration.
+        for (int i=0; i<CAP_COUNT; ++i) {
+          if (cap_state[i].pin == input) {
+            cap_state[i].threshold = ((argv[2] & 0x7F) << 7) | (argv[1] & 0x7F);
+            cap_state[i].hysteresis = ((argv[4] & 0x7F) << 7) | (argv[3] & 0x7F);
+            cap_state[i].heartbeat = ((argv[6] & 0x7F) << 7) | (argv[5] & 0x7F);
+            cap_state[i].touched = false;
+            cap_state[i].lastHeartbeat = millis();
+          }
+        }
+      }
+      break;
     case CP_ACCEL_RANGE:
       // Set the range of the accelerometer based on the passed in value.
       // First check we have enough parameters and grab the input from the first byte.
@@ -984,6 +1269,46 @@ void circuitPlaygroundCommand(byte command, byte argc, byte* argv) {
         CircuitPlayground.lis.setClick(type, threshold);
       }
       break;
+    case CP_MIC_CAPTURE:
+      // Start capturing microphone samples.
+      // Expects 2 bytes number of samples, 2 bytes interval between samples (us).
+      if (argc >= 4) {
+        unsigned int period = ((argv[3] & 0x7F) << 7) | (argv[2] & 0x7F);
+        if (period == 0) {
+          // Bad sample interval, stop processing!
+          return;
+        }
+        micRemaining = ((argv[1] & 0x7F) << 7) | (argv[0] & 0x7F);
+        micPeriod = period;
+        micCapture = true;
+      }
+      break;
+    case CP_MIC_CAPTURE_STOP:
+      micCapture = false;
+      break;
+    case CP_MIC_LEVEL_ON:
+      // Turn on sound level streaming.
+      // Expects 2 bytes interval between reports (ms), 2 bytes samples per
+      // report, 2 bytes interval between samples (us).
+      if (argc >= 6) {
+        unsigned int samples = ((argv[3] & 0x7F) << 7) | (argv[2] & 0x7F);
+        unsigned int period = ((argv[5] & 0x7F) << 7) | (argv[4] & 0x7F);
+        if ((samples < 1) || (samples > MIC_LEVEL_MAX) || (period == 0)) {
+          // Bad sound level configuration, stop processing!
+          return;
+        }
+        micLevelInterval = ((argv[1] & 0x7F) << 7) | (argv[0] & 0x7F);
+        micLevelSamples = samples;
+        micLevelPeriod = period;
+        previousMicLevelMillis = millis();
+        streamMicLevel = true;
+        micLevelSampling = false;
+      }
+      break;
+    case CP_MIC_LEVEL_OFF:
+      streamMicLevel = false;
+      micLevelSampling = false;
+      break;
     case CP_SENSECOLOR:
       // Sense the color of an object over the light sensor and send back
       // a CP_SENSECOLOR_REPLY response.
@@ -1047,6 +1372,78 @@ void sendAccelResponse() {
   Firmata.sendSysex(CP_COMMAND, 13, data);
 }
 
+// Read the raw accelerometer counts and send a compact response packet.
+void sendAccelRawResponse() {
+  // Get the raw accelerometer X, Y, Z counts.
+  CircuitPlayground.lis.read();
+  int16_t counts[3] = { CircuitPlayground.lis.x, CircuitPlayground.lis.y, CircuitPlayground.lis.z };
+  // Send the response as 7-bit bytes directly instead of having Firmata.sendSysex
+  // expand every byte into 2 bytes.  The response includes:
+  // - CP_ACCEL_RAW_REPLY as 2 7-bit bytes (like the other responses)
+  // - accelerometer range (0-3)
+  // - x, y, z as signed 12-bit counts, each split across 2 7-bit bytes
+  Firmata.startSysex();
+  Firmata.write(CP_COMMAND);
+  Firmata.write(CP_ACCEL_RAW_REPLY);
+  Firmata.write(0);
+  Firmata.write(CircuitPlayground.lis.getRange() & 0x7F);
+  for (int i=0; i<3; ++i) {
+    // The accelerometer runs in high resolution mode with 12-bit counts that
+    // are left justified in the 16-bit value.
+    int16_t value = counts[i] >> 4;
+    Firmata.write(value & 0x7F);
+    Firmata.write((value >> 7) & 0x7F);
+  }
+  Firmata.endSysex();
+}
+
+// Take an accelerometer sample for the current batch and send the batch once it's full.
+void sampleAccelBatch(unsigned long sampleMillis) {
+  // Get the raw accelerometer X, Y, Z counts (12-bit counts that are left
+  // justified in the 16-bit value).
+  CircuitPlayground.lis.read();
+  if (accelBatchCount == 0) {
+    accelBatchStart = sampleMillis;
+  }
+  accelBatch[accelBatchCount][0] = CircuitPlayground.lis.x >> 4;
+  accelBatch[accelBatchCount][1] = CircuitPlayground.lis.y >> 4;
+  accelBatch[accelBatchCount][2] = CircuitPlayground.lis.z >> 4;
+  accelBatchCount++;
+  if (accelBatchCount < accelBatchSize) {
+    return;
+  }
+  // Send the full batch as 7-bit bytes, see CP_ACCEL_BATCH_REPLY for the format.
+  Firmata.startSysex();
+  Firmata.write(CP_COMMAND);
+  Firmata.write(CP_ACCEL_BATCH_REPLY);
+  Firmata.write(0);
+  Firmata.write(CircuitPlayground.lis.getRange() & 0x7F);
+  Firmata.write(accelBatchCount);
+  for (int i=0; i<4; ++i) {
+    Firmata.write((accelBatchStart >> (i*7)) & 0x7F);
+  }
+  Firmata.write(accelBatchInterval & 0x7F);
+  Firmata.write((accelBatchInterval >> 7) & 0x7F);
+  for (int i=0; i<accelBatchCount; ++i) {
+    for (int j=0; j<3; ++j) {
+      Firmata.write(accelBatch[i][j] & 0x7F);
+      Firmata.write((accelBatch[i][j] >> 7) & 0x7F);
+    }
+  }
+  Firmata.endSysex();
+  accelBatchCount = 0;
+}
+
+// Send a streamed accelerometer sample in the configured format.
+void sendAccelStreamResponse() {
+  if (accelStreamFormat == ACCEL_FORMAT_INT16) {
+    sendAccelRawResponse();
+  }
+  else {
+    sendAccelResponse();
+  }
+}
+
 // Read the accelerometer tap detection and send a response packet.
 void sendTapResponse() {
   // Get the accelerometer tap detection state.
@@ -1062,7 +1459,11 @@ void sendTapResponse() {
 // Read the capacitive sensor state and send a response packet.
 void sendCapResponse(uint8_t pin) {
   // Get the cap sense value for the provided input pin.
-  uint16_t capread = CircuitPlayground.readCap(pin, CAP_SAMPLES);
+  sendCapValueResponse(pin, CircuitPlayground.readCap(pin, CAP_SAMPLES));
+}
+
+// Send a response packet with a capacitive sensor value that was already read.
+void sendCapValueResponse(uint8_t pin, uint16_t capread) {
   // Build a response data packet and send it.  The response includes:
   // - uint8_t: CP_CAP_REPLY value
   // - uint8_t: pin number of the read input
@@ -1078,6 +1479,277 @@ void sendCapResponse(uint8_t pin) {
   Firmata.sendSysex(CP_COMMAND, 6, bytes);
 }
 
+// Send a cap touch event packet for an input that was touched or released.
+void sendCapEventResponse(uint8_t pin, bool touched, int32_t value) {
+  // Build a response data packet and send it.  The response includes:
+  // - uint8_t: CP_CAP_EVENT_REPLY value
+  // - uint8_t: pin number of the input
+  // - uint8_t: 1 if the input was touched, 0 if it was released
+  // - int32_t: cap sensor value that caused the event
+  uint8_t bytes[7] = {0};
+  bytes[0] = CP_CAP_EVENT_REPLY;
+  bytes[1] = pin;
+  bytes[2] = touched ? 1 : 0;
+  bytes[3] = value;
+  bytes[4] = value >> 8;
+  bytes[5] = value >> 16;
+  bytes[6] = value >> 24;
+  // Send the response, this will expand each byte into 2 bytes of 7-bit data.
+  Firmata.sendSysex(CP_COMMAND, 7, bytes);
+}
+
+// Read a streaming cap touch input with touch detection configured and only
+// send an event when it's touched or released (with hysteresis so a noisy value
+// near the threshold doesn't send a stream of events), plus its raw value when
+// a heartbeat is due.
+void checkCapEvents(cap_state_type* state) {
+  uint16_t value = CircuitPlayground.readCap(state->pin, CAP_SAMPLES);
+  if (!state->touched && (value > (int32_t)state->threshold)) {
+    state->touched = true;
+    sendCapEventResponse(state->pin, true, value);
+  } else if (state->touched && (value < (int32_t)state->threshold - (int32_t)state->hysteresis)) {
+    state->touched = false;
+    sendCapEventResponse(state->pin, false, value);
+  }
+  if ((state->heartbeat > 0) && (currentMillis - state->lastHeartbeat >= state->heartbeat)) {
+    state->lastHeartbeat = currentMillis;
+    sendCapValueResponse(state->pin, value);
+  }
+}
+
+// Read all the capacitive sensors and send a single response packet.
+void sendCapScanResponse() {
+  // Build a response data packet and send it.  The response includes:
+  // - uint8_t: CP_CAP_SCAN_REPLY value
+  // - int32_t[CAP_COUNT]: cap sensor value of each input in cap_state order
+  uint8_t data[1+CAP_COUNT*4] = {0};
+  data[0] = CP_CAP_SCAN_REPLY;
+  for (int i=0; i<CAP_COUNT; ++i) {
+    // Get the cap sense value for the input and put it in the response.
+    uint16_t capread = CircuitPlayground.readCap(cap_state[i].pin, CAP_SAMPLES);
+    data[1+i*4] = capread;       // send 16 bits split over 4 bytes
+    data[2+i*4] = capread >> 8;  // top two bytes are not used!
+  }
+  // Send the response, this will expand each byte into 2 bytes of 7-bit data.
+  Firmata.sendSysex(CP_COMMAND, 1+CAP_COUNT*4, data);
+}
+
+// Read one microphone sample as an unsigned 10-bit value (synthesized from the
+// PDM microphone like analog input A4).
+int16_t readMicSample() {
+  return shimAnalogRead(MIC_ANALOG);
+}
+
+// Capture a frame of microphone samples at the configured interval and send
+// it.  Samples are timed with micros() so the interval stays exact within the
+// frame, the board pauses briefly between frames to send them.
+void sendMicFrame() {
+  uint8_t count = MIC_FRAME_MAX;
+  if ((micRemaining > 0) && (micRemaining < count)) {
+    count = micRemaining;
+  }
+  unsigned long start = micros();
+  unsigned long next = start;
+  for (uint8_t i=0; i<count; ++i) {
+    while ((long)(micros() - next) < 0) {
+      // Wait for the next sample time.
+    }
+    micFrame[i] = readMicSample();
+    next += micPeriod;
+  }
+  // Send the frame as 7-bit bytes, see CP_MIC_SAMPLES_REPLY for the format.
+  Firmata.startSysex();
+  Firmata.write(CP_COMMAND);
+  Firmata.write(CP_MIC_SAMPLES_REPLY);
+  Firmata.write(0);
+  for (int i=0; i<4; ++i) {
+    Firmata.write((start >> (i*7)) & 0x7F);
+  }
+  Firmata.write(count);
+  Firmata.write(micPeriod & 0x7F);
+  Firmata.write((micPeriod >> 7) & 0x7F);
+  for (uint8_t i=0; i<count; ++i) {
+    Firmata.write(micFrame[i] & 0x7F);
+    Firmata.write((micFrame[i] >> 7) & 0x7F);
+  }
+  Firmata.endSysex();
+  if (micRemaining > 0) {
+    micRemaining -= count;
+    if (micRemaining == 0) {
+      micCapture = false;
+    }
+  }
+}
+
+// Start a sound level window, samples are then taken by sampleMicLevel.
+void startMicLevel() {
+  micLevelSampling = true;
+  micLevelCount = 0;
+  micLevelSum = 0;
+  micLevelSumSquares = 0;
+  micLevelLow = 1023;
+  micLevelHigh = 0;
+  micLevelNext = micros();
+}
+
+// Take the sound level samples that are due, spending at most MIC_LEVEL_SLICE
+// microseconds per loop pass so the rest of the loop keeps running during long
+// windows.  Once the window is complete its RMS and peak level are sent.  Only
+// running sums are kept so the number of samples isn't limited by memory.
+void sampleMicLevel() {
+  unsigned long sliceStart = micros();
+  while (micLevelCount < micLevelSamples) {
+    unsigned long now = micros();
+    long wait = (long)(micLevelNext - now);
+    if (wait > 0) {
+      if ((now - sliceStart) + wait > MIC_LEVEL_SLICE) {
+        // Not due within this pass, continue on the next one.
+        return;
+      }
+      while ((long)(micros() - micLevelNext) < 0) {
+        // Wait for the next sample time.
+      }
+    } else if ((unsigned long)(-wait) >= micLevelPeriod) {
+      // Fell behind by more than a sample (the loop was busy), continue from
+      // now instead of taking a burst of samples.
+      micLevelNext = now;
+    }
+    int16_t sample = readMicSample();
+    micLevelNext += micLevelPeriod;
+    micLevelCount++;
+    micLevelSum += sample;
+    micLevelSumSquares += (uint32_t)sample*sample;
+    micLevelLow = min(micLevelLow, sample);
+    micLevelHigh = max(micLevelHigh, sample);
+    if (micros() - sliceStart >= MIC_LEVEL_SLICE) {
+      break;
+    }
+  }
+  if (micLevelCount < micLevelSamples) {
+    return;
+  }
+  micLevelSampling = false;
+  // The level is measured from the average so the microphone bias is ignored.
+  float mean = (float)micLevelSum/micLevelSamples;
+  float variance = (float)micLevelSumSquares/micLevelSamples - mean*mean;
+  // Build a response data packet and send it.  The response includes:
+  // - uint8_t: CP_MIC_LEVEL_REPLY value
+  // - float: RMS level
+  // - uint16_t: peak level
+  union {
+    struct {
+      uint8_t type;
+      float rms;
+      uint16_t peak;
+    } __attribute__((packed)) data;
+    uint8_t bytes[7];
+  } response;
+  response.data.type = CP_MIC_LEVEL_REPLY;
+  response.data.rms = (variance > 0) ? sqrt(variance) : 0;
+  response.data.peak = (uint16_t)max(micLevelHigh - mean, mean - micLevelLow);
+  // Send the response, this will expand each byte into 2 bytes of 7-bit data.
+  Firmata.sendSysex(CP_COMMAND, 7, response.bytes);
+}
+
+// Return a sine wave at a phase (0-255 is one turn) scaled to 1-255, so
+// animations don't need floating point math.
+uint8_t sineWave8(uint8_t phase) {
+  uint8_t i = phase & 0x3F;
+  if (phase & 0x40) {
+    i = 64 - i;
+  }
+  uint8_t value = pgm_read_byte(&quarterSine[i]);
+  return (phase & 0x80) ? 128 - value : 128 + value;
+}
+
+// Render a frame of the pixel animation and show it.  Elapsed is the
+// milliseconds since the last frame.
+void renderPixelAnimation(unsigned long elapsed) {
+  pixelAnimTurn = (pixelAnimTurn + elapsed*pixelAnimFrequency) % 1000000;
+  // Millionths of a turn to 1/65536 of a turn, without overflowing 32 bits.
+  uint16_t phase = pixelAnimTurn*4096/62500;
+  for (uint8_t i=0; i<CircuitPlayground.strip.numPixels(); ++i) {
+    uint16_t pixelPhase = phase + i*pixelAnimPhaseStep;
+    if (pixelAnim == PIXEL_ANIM_RAINBOW) {
+      CircuitPlayground.strip.setPixelColor(i, CircuitPlayground.colorWheel(pixelPhase >> 8));
+      continue;
+    }
+    // Weight of color 1 (0-255) over color 0.
+    uint16_t weight;
+    if (pixelAnim == PIXEL_ANIM_BREATHE) {
+      // Every pixel together, squared so the pulse lingers at color 1.
+      weight = sineWave8(phase >> 8);
+      weight = 255 - weight*weight/255;
+    } else if (pixelAnim == PIXEL_ANIM_CHASE) {
+      // Raised to the 4th power so only a narrow pulse is near color 0.
+      weight = sineWave8(pixelPhase >> 8);
+      weight = weight*weight/255;
+      weight = 255 - weight*weight/255;
+    } else {
+      weight = sineWave8(pixelPhase >> 8);
+    }
+    uint8_t rgb[3];
+    for (uint8_t c=0; c<3; ++c) {
+      int16_t from = pixelAnimColors[0][c];
+      int16_t to = pixelAnimColors[1][c];
+      rgb[c] = from + (int32_t)(to - from)*weight/255;
+    }
+    CircuitPlayground.strip.setPixelColor(i, rgb[0], rgb[1], rgb[2]);
+  }
+  CircuitPlayground.strip.show();
+}
+
+// Start or stop the speaker for a tone sequence note.
+void sequenceTone(uint16_t frequency) {
+  // Force output mode of speaker and speaker enable pin as it might have
+  // been clobbered by user code since A0 / D12 is also the speaker output.
+  pinMode(CPLAY_SPEAKER, OUTPUT);
+  pinMode(CPLAY_SPEAKER_SHUTDOWN, OUTPUT);
+  if (frequency > 0) {
+    digitalWrite(CPLAY_SPEAKER_SHUTDOWN, HIGH);
+    tone(CPLAY_SPEAKER, frequency);
+  } else {
+    digitalWrite(CPLAY_SPEAKER_SHUTDOWN, LOW);
+    tone(CPLAY_SPEAKER, 100, 1);  // Very short tone to stop playback as noTone locks the board.
+  }
+}
+
+// Send a CP_TONE_SEQUENCE_REPLY with the result of the tone sequence.
+void sendToneSequenceResponse(bool completed) {
+  uint8_t data[3] = { CP_TONE_SEQUENCE_REPLY, completed, toneSequenceIndex };
+  Firmata.sendSysex(CP_COMMAND, 3, data);
+}
+
+// Stop a playing tone sequence and clear the queued notes.  If a sequence was
+// playing it's reported as stopped.
+void stopToneSequence() {
+  if (toneSequencePlaying) {
+    toneSequencePlaying = false;
+    sequenceTone(0);
+    sendToneSequenceResponse(false);
+  }
+  toneSequenceLength = 0;
+  toneSequenceIndex = 0;
+}
+
+// Play the next note of the tone sequence, or finish the sequence after the
+// last note.  Notes are scheduled from the start of the previous note so the
+// timing doesn't drift over the sequence.
+void playNextSequenceNote() {
+  if (toneSequenceIndex >= toneSequenceLength) {
+    toneSequencePlaying = false;
+    sequenceTone(0);
+    sendToneSequenceResponse(true);
+    toneSequenceLength = 0;
+    toneSequenceIndex = 0;
+    return;
+  }
+  toneNoteStart += toneNoteDuration;
+  toneNoteDuration = toneSequence[toneSequenceIndex][1];
+  sequenceTone(toneSequence[toneSequenceIndex][0]);
+  toneSequenceIndex++;
+}
+
 /*==============================================================================
  * SYSEX-BASED commands
  *============================================================================*/
@@ -1432,8 +2104,21 @@ void circuitPlaygroundReset() {
   // Turn off streaming of tap, accel, and cap touch data.
   streamTap = false;
   streamAccel = false;
+  accelStreamFormat = ACCEL_FORMAT_FLOAT;
+  accelStreamInterval = 0;
+  streamAccelBatch = false;
+  accelBatchCount = 0;
+  micCapture = false;
+  streamMicLevel = false;
+  micLevelSampling = false;
+  pixelAnim = PIXEL_ANIM_OFF;
+  // Report a tone sequence that's still playing as not completed, just like
+  // a CP_TONE_SEQUENCE_STOP command does.
+  stopToneSequence();
   for (int i=0; i<CAP_COUNT; ++i) {
     cap_state[i].streaming = false;
+    cap_state[i].threshold = 0;
+    cap_state[i].touched = false;
   }
 }
 
@@ -1516,6 +2201,44 @@ void loop()
   // TODO - ensure that Stream buffer doesn't go over 60 bytes
 
   currentMillis = millis();
+  // Check if the next note of a tone sequence is due.
+  if (toneSequencePlaying && (currentMillis - toneNoteStart >= toneNoteDuration)) {
+    playNextSequenceNote();
+  }
+  // Check if the next frame of a pixel animation is due.
+  if ((pixelAnim != PIXEL_ANIM_OFF) && (currentMillis - previousPixelAnimMillis >= PIXEL_ANIM_INTERVAL)) {
+    renderPixelAnimation(currentMillis - previousPixelAnimMillis);
+    previousPixelAnimMillis = currentMillis;
+  }
+  // Check if an accelerometer event should be streamed at its own configured rate.
+  if (streamAccel && (accelStreamInterval > 0) && (currentMillis - previousAccelMillis >= accelStreamInterval)) {
+    previousAccelMillis = currentMillis;
+    sendAccelStreamResponse();
+  }
+  // Check if a batched accelerometer sample is due.  Samples are scheduled at a
+  // fixed interval so the batch timestamps stay exact.
+  if (streamAccelBatch && (currentMillis - previousBatchMillis >= accelBatchInterval)) {
+    previousBatchMillis += accelBatchInterval;
+    if (currentMillis - previousBatchMillis >= accelBatchInterval) {
+      // Fell behind by more than a sample, start a new batch from now.
+      previousBatchMillis = currentMillis;
+      accelBatchCount = 0;
+    }
+    sampleAccelBatch(previousBatchMillis);
+  }
+  // Check if microphone samples are being captured, a frame is sent each loop.
+  if (micCapture) {
+    sendMicFrame();
+  }
+  // Check if a sound level report is due at its own configured rate.
+  if (streamMicLevel && !micLevelSampling && (currentMillis - previousMicLevelMillis >= micLevelInterval)) {
+    previousMicLevelMillis = currentMillis;
+    startMicLevel();
+  }
+  // Take the samples of a sound level window that are due.
+  if (micLevelSampling) {
+    sampleMicLevel();
+  }
   if (currentMillis - previousMillis > samplingInterval) {
     previousMillis += samplingInterval;
     /* ANALOGREAD - do all analogReads() at the configured sampling interval */
@@ -1538,13 +2261,18 @@ void loop()
       sendTapResponse();
     }
     // Check if an accelerometer event should be streamed to the firmata client.
-    if (streamAccel) {
-      sendAccelResponse();
+    if (streamAccel && (accelStreamInterval == 0)) {
+      sendAccelStreamResponse();
     }
-    // Check if any cap touch inputs should be streamed to the firmata client.
+    // Check if any cap touch inputs should be streamed to the firmata client,
+    // inputs with touch detection only send touch and release events.
     for (int i=0; i<CAP_COUNT; ++i) {
       if (cap_state[i].streaming) {
-        sendCapResponse(cap_state[i].pin);
+        if (cap_state[i].threshold > 0) {
+          checkCapEvents(&cap_state[i]);
+        } else {
+          sendCapResponse(cap_state[i].pin);
+        }
       }
     }
   }
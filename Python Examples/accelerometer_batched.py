@@ -0,0 +1,42 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Change the range of the accelerometer.
+# You can use values like: ACCEL_2G, ACCEL_4G, ACCEL_8G or ACCEL_16G
+# to change the range from small to large.  ACCEL_2G = +/- 2G
+board.set_accel_range(ACCEL_2G)
+
+# Callback that will be called with each batch of accelerometer samples.  The
+# samples parameter is a NumPy array with one row of X, Y, Z acceleration per
+# sample, timestamp_ms is the board time of the first sample and period_ms the
+# time between samples.
+def accel_batch(samples, timestamp_ms, period_ms):
+    print('{0} samples at {1} ms (every {2} ms), mean X = {3:.2f} Y = {4:.2f} Z = {5:.2f}'.format(
+        len(samples), timestamp_ms, period_ms, *samples.mean(axis=0)))
+
+# Sample the accelerometer 200 times a second and receive the samples 20 at a
+# time (this needs NumPy to be installed).
+try:
+    print('Printing accelerometer batches, press Ctrl-C to quit...')
+    board.start_accel_batched(accel_batch, samples_per_frame=20, rate_hz=200)
+    while True:
+        time.sleep(1.0)
+finally:
+    print('Stopping...')
+    board.stop_accel_batched()
+
+# Close Firmata board connection when done.
+board.close()
@@ -0,0 +1,46 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Change the range of the accelerometer.
+# You can use values like: ACCEL_2G, ACCEL_4G, ACCEL_8G or ACCEL_16G
+# to change the range from small to large.  ACCEL_2G = +/- 2G
+board.set_accel_range(ACCEL_2G)
+
+# Count the samples received so the sample rate can be printed.
+samples = 0
+last = (0.0, 0.0, 0.0)
+
+def accel_data(x, y, z):
+    global samples, last
+    samples += 1
+    last = (x, y, z)
+
+# Stream accelerometer data 100 times a second.  The 'int16' format sends the
+# raw accelerometer counts which are much smaller than floating point values
+# and converted to meters/second^2 on the computer.
+try:
+    print('Printing accelerometer sample rate, press Ctrl-C to quit...')
+    board.start_accel(accel_data, rate_hz=100, format='int16')
+    while True:
+        time.sleep(1.0)
+        print('{0} samples/second, last X = {1:.2f} Y = {2:.2f} Z = {3:.2f}'.format(samples, *last))
+        samples = 0
+finally:
+    print('Stopping...')
+    board.stop_accel()
+
+# Close Firmata board connection when done.
+board.close()
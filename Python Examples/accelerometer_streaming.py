@@ -25,6 +25,11 @@ def accel_data(x, y, z):
     print('Y = {0}'.format(y))
     print('Z = {0}'.format(z))
 
+# Printing is slow, so call accel_data on its own thread with only the newest
+# values instead of on the thread that reads the board.  Values that arrive
+# while it's still printing are coalesced (see board.dispatch_stats()).
+board.set_dispatch('accel', 'latest')
+
 # Stream accelerometer data for 2 seconds, pause for 5 seconds, then stream forever.
 print('Printing accelerometer data for 2 seconds...')
 board.start_accel(accel_data)
@@ -43,6 +48,7 @@ try:
 finally:
     print('Stopping...')
     board.stop_accel()
+    print('Dispatch statistics: {0}'.format(board.dispatch_stats()['accel']))
 
 # Close Firmata board connection when done.
 board.close()
@@ -0,0 +1,178 @@
+# Circuit Playground asyncio helper class.
+#
+# This is not an example, rather it's a class to use the Circuit Playground
+# PyMata helper class from asyncio code.  Readings can be awaited and streams
+# consumed with async for.  Make sure this file is in the same directory as the
+# examples!  Requires Python 3.7 or newer.
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import asyncio
+import functools
+
+from circuitplayground import CircuitPlayground, CAP_HYSTERESIS, READ_TIMEOUT
+
+
+STREAM_MAXSIZE = 100  # Default number of stream values buffered for a slow consumer.
+
+
+def _put_latest(queue, item):
+    """Put an item in a bounded queue, dropping the oldest item if it's full."""
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(item)
+
+
+class AsyncCircuitPlayground(object):
+    """asyncio front end for a CircuitPlayground board.  Replies are received
+    on PyMata's threads and handed to the event loop with call_soon_threadsafe,
+    so many boards can be used from one event loop without blocking it.  Use
+    connect to open a board, for example:
+
+      board = await AsyncCircuitPlayground.connect('/dev/ttyACM0')
+      x, y, z = await board.accel()
+      async for x, y, z in board.accel_stream():
+          ...
+
+    Any other CircuitPlayground method (like set_pixel or tone) can be called
+    directly as they only send a command and don't wait for a reply.
+
+    Without a loop an AsyncCircuitPlayground must be created from a coroutine,
+    it then uses the running event loop.
+    """
+
+    def __init__(self, board, loop=None):
+        self.board = board
+        self._loop = loop if loop is not None else asyncio.get_running_loop()
+
+    @classmethod
+    async def connect(cls, port_id='/dev/ttyACM0', **kwargs):
+        """Connect to a board (in a worker thread as this takes a few seconds)
+        and return an AsyncCircuitPlayground for it.  Keyword arguments are
+        passed to CircuitPlayground.
+        """
+        loop = asyncio.get_running_loop()
+        board = await loop.run_in_executor(None, functools.partial(CircuitPlayground, port_id, **kwargs))
+        return cls(board, loop)
+
+    def __getattr__(self, name):
+        # Pass anything else through to the board.
+        return getattr(self.board, name)
+
+    async def close(self):
+        """Disconnect from the board without exiting the program."""
+        await self._loop.run_in_executor(None, self.board.disconnect)
+
+    async def _read(self, future):
+        """Wait for the concurrent.futures.Future of a board read request.
+        Cancelling the wait also cancels the request.
+        """
+        return await asyncio.wrap_future(future, loop=self._loop)
+
+    async def accel(self, timeout=READ_TIMEOUT):
+        """Read the accelerometer and return a tuple of the X, Y, Z acceleration
+        in meters/second^2.
+        """
+        return await self._read(self.board.read_accel(timeout=timeout))
+
+    async def tap(self, timeout=READ_TIMEOUT):
+        """Read the tap state and return a tuple of single and double tap
+        booleans.
+        """
+        return await self._read(self.board.read_tap(timeout=timeout))
+
+    async def cap(self, input_pin, timeout=READ_TIMEOUT):
+        """Read a capacitive touch input and return a tuple of the input pin, a
+        touched boolean and the raw cap touch value.
+        """
+        return await self._read(self.board.read_cap_touch(input_pin, timeout=timeout))
+
+    async def cap_scan(self, timeout=READ_TIMEOUT):
+        """Read all eight capacitive touch inputs and return a tuple of the
+        touched booleans and the raw values (see CircuitPlayground.scan_cap_touch).
+        """
+        return await self._read(self.board.scan_cap_touch(timeout=timeout))
+
+    async def sense_color(self, timeout=READ_TIMEOUT):
+        """Perform a color sense and return a tuple of red, green, blue values."""
+        return await self._read(self.board.sense_color(timeout=timeout))
+
+    async def version(self, timeout=READ_TIMEOUT):
+        """Read the firmware implementation version and return a tuple of the
+        major, minor and bugfix version.
+        """
+        return await self._read(self.board.read_implementation_version(timeout=timeout))
+
+    async def play_sequence(self, notes, timeout=READ_TIMEOUT):
+        """Play a sequence of frequency and duration notes and return a tuple
+        of a completed boolean and the number of notes played once it ends (see
+        CircuitPlayground.play_sequence).
+        """
+        return await self._read(self.board.play_sequence(notes, timeout=timeout))
+
+    async def _stream(self, start, stop, maxsize):
+        """Start a stream by calling start with a callback and yield each tuple
+        of callback parameters.  At most maxsize values are buffered, older
+        values are dropped if the consumer falls behind.
+
+        The stream is only stopped (by calling stop) when the generator is
+        closed, and breaking out of async for doesn't close it until it's
+        garbage collected.  Close a stream explicitly by awaiting its aclose
+        method, or use contextlib.aclosing (Python 3.10 or newer):
+
+          async with contextlib.aclosing(board.accel_stream()) as stream:
+              async for x, y, z in stream:
+                  ...
+        """
+        queue = asyncio.Queue(maxsize)
+        def callback(*values):
+            self._loop.call_soon_threadsafe(_put_latest, queue, values)
+        start(callback)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            stop()
+
+    def accel_stream(self, rate_hz=None, format='float', maxsize=STREAM_MAXSIZE):
+        """Stream accelerometer data, use with async for to get X, Y, Z tuples.
+        See CircuitPlayground.start_accel for the rate_hz and format parameters
+        and _stream for how to stop the stream.
+        """
+        return self._stream(lambda callback: self.board.start_accel(callback, rate_hz, format),
+                            self.board.stop_accel, maxsize)
+
+    def tap_stream(self, maxsize=STREAM_MAXSIZE):
+        """Stream tap data, use with async for to get single and double tap
+        tuples.  See _stream for how to stop the stream.
+        """
+        return self._stream(self.board.start_tap, self.board.stop_tap, maxsize)
+
+    def cap_stream(self, input_pin, threshold=None, hysteresis=CAP_HYSTERESIS, maxsize=STREAM_MAXSIZE):
+        """Stream a capacitive touch input, use with async for to get tuples of
+        the input pin, touched boolean and raw value.  See
+        CircuitPlayground.start_cap_touch for the threshold and hysteresis
+        parameters to only get touch and release events, and _stream for how to
+        stop the stream.
+        """
+        return self._stream(lambda callback: self.board.start_cap_touch(input_pin, callback, threshold,
+                                                                         hysteresis),
+                            functools.partial(self.board.stop_cap_touch, input_pin), maxsize)
@@ -0,0 +1,46 @@
+#!/usr/bin/python3
+import asyncio
+import sys
+
+from aiocircuitplayground import AsyncCircuitPlayground
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+
+async def print_taps(board):
+    # Print the tap state every time it's streamed from the board.  Close the
+    # stream when done so tap streaming is stopped on the board.
+    taps = board.tap_stream()
+    try:
+        async for single, double in taps:
+            if single or double:
+                print('Tap! single={0} double={1}'.format(single, double))
+    finally:
+        await taps.aclose()
+
+
+async def main():
+    # Connect to Circuit Playground board on specified port.
+    board = await AsyncCircuitPlayground.connect(port)
+    print('Firmware version: {0}.{1}.{2}'.format(*await board.version()))
+    # Print taps in the background while reading the accelerometer and color
+    # sensor every second.
+    taps = asyncio.ensure_future(print_taps(board))
+    try:
+        print('Printing sensor data (Ctrl-C to quit)...')
+        while True:
+            x, y, z = await board.accel()
+            red, green, blue = await board.sense_color()
+            print('X={0:.2f} Y={1:.2f} Z={2:.2f} color=({3}, {4}, {5})'.format(x, y, z, red, green, blue))
+            await asyncio.sleep(1.0)
+    finally:
+        taps.cancel()
+        await board.close()
+
+
+asyncio.run(main())
@@ -0,0 +1,428 @@
+#!/usr/bin/python
+# Throughput and latency benchmark of the Circuit Playground helper class.
+#
+# Measures:
+#  - the cost of encoding and sending commands (per call and bytes sent),
+#  - the bytes, messages and time it takes to update all ten NeoPixels one at
+#    a time vs. with a single batched command,
+#  - the cost of decoding each reply type in the response handler, and the
+#    decoding alone compared to the original if/elif decoder,
+#  - the request to reply latency of reads through the whole PyMata stack,
+#  - the sustained frames/second of accelerometer, tap and cap touch streams
+#    running at the same time.
+# By default the board is simulated (see fakeboard.py) so no hardware is needed,
+# or pass --port to run against a real board.  Results are printed and can be
+# saved as JSON with --output to compare versions, for example:
+#
+#   python benchmark.py --output before.json
+import argparse
+import json
+import math
+import platform
+import struct
+import time
+import timeit
+
+from circuitplayground import *
+from fakeboard import FakeCircuitPlayground, START_SYSEX
+
+
+BAUD_RATE = 57600  # Serial baud rate of the firmware (10 bits per byte on the wire).
+
+
+class CountingTransport(object):
+    """Stand-in for the PyMata serial transport that counts the bytes and
+    sysex messages written.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.messages = 0
+
+    def write(self, data):
+        self.count += 1
+        if data == chr(START_SYSEX):
+            self.messages += 1
+
+
+def offline_board():
+    """Create a board object that isn't connected to any hardware, commands
+    are written to a CountingTransport and replies can be fed straight into
+    the response handler.
+    """
+    board = CircuitPlayground.__new__(CircuitPlayground)
+    board._init_state()
+    board._init_pymata(CountingTransport())
+    return board
+
+
+def best_rate(function, repeat, number):
+    """Return the best calls/second rate of function."""
+    return number/min(timeit.repeat(function, repeat=repeat, number=number))
+
+
+def bench_encode(repeat=5, number=2000):
+    """Measure the cost of encoding and sending commands."""
+    board = offline_board()
+    commands = [
+        ('set_pixel',      lambda: board.set_pixel(3, 255, 128, 0)),
+        ('set_pixels',     lambda: board.set_pixels([(255, 128, 0)]*PIXEL_COUNT)),
+        ('tone',           lambda: board.tone(440, 100)),
+        ('set_tap_config', lambda: board.set_tap_config(2, 80)),
+        ('read_accel',     lambda: board.read_accel(timeout=None).cancel()),
+    ]
+    results = {}
+    for name, command in commands:
+        board.transport.count = 0
+        command()
+        sent = board.transport.count
+        rate = best_rate(command, repeat, number)
+        board._cancel_requests()
+        results[name] = {'us_per_call': 1e6/rate, 'bytes': sent}
+    return results
+
+
+def frame_colors(t):
+    """Colors of one frame of a red to green sine wave animation."""
+    colors = []
+    for i in range(PIXEL_COUNT):
+        x = math.sin(2.0*math.pi*t + (i/float(PIXEL_COUNT))*2.0*math.pi)
+        colors.append((int(127.5*(1.0 - x)), int(127.5*(1.0 + x)), 0))
+    return colors
+
+
+def bench_pixels(repeat=5, number=2000):
+    """Measure updating all the NeoPixels per pixel (a set_pixel call for each
+    pixel, then show_pixels) and batched (a single set_pixels call).
+    """
+    board = offline_board()
+    colors = frame_colors(0.25)
+    def per_pixel():
+        for i, (red, green, blue) in enumerate(colors):
+            board.set_pixel(i, red, green, blue)
+        board.show_pixels()
+    def batched():
+        board.set_pixels(colors)
+    results = {}
+    for name, update in (('per-pixel', per_pixel), ('batched', batched)):
+        board.transport.count = board.transport.messages = 0
+        update()
+        sent, messages = board.transport.count, board.transport.messages
+        rate = best_rate(update, repeat, number)
+        results[name] = {'bytes': sent, 'messages': messages, 'us_per_frame': 1e6/rate,
+                         'max_fps': BAUD_RATE/10.0/sent}
+    return results
+
+
+def reply_frames():
+    """Return a list of name and response handler data of each reply type,
+    encoded exactly like the (simulated) firmware sends them.
+    """
+    fake = FakeCircuitPlayground(accel=(0.31, -0.62, 9.81), cap_values={10: 1016}, color=(201, 87, 12))
+    messages = []
+    fake._output = messages.append
+    frames = []
+    for name, command, data in (
+            ('accelerometer', CP_ACCEL_READ,          []),
+            ('accel raw',     CP_ACCEL_STREAM_CONFIG, [ACCEL_FORMATS['int16'], 1, 0]),
+            ('tap',           CP_ACCEL_TAP,           []),
+            ('cap touch',     CP_CAP_READ,            [10]),
+            ('cap scan',      CP_CAP_SCAN,            []),
+            ('color sense',   CP_SENSECOLOR,          []),
+            ('version',       CP_IMPL_VERS,           [])):
+        del messages[:]
+        fake._cp_command(command, data)
+        if command == CP_ACCEL_STREAM_CONFIG:
+            fake._send_accel_stream()
+        message = messages[-1]
+        assert message[0] == START_SYSEX and message[1] == CP_COMMAND
+        # The response handler gets the data between the command and end bytes.
+        frames.append((name, list(message[2:-1])))
+    return frames
+
+
+def bench_decode(repeat=5, number=20000):
+    """Measure the reply frames/second decoded by the response handler."""
+    board = offline_board()
+    ignore = lambda *args: None
+    board._accel_callback = ignore
+    board._tap_callback = ignore
+    board._cap_callbacks[10] = ignore
+    results = {}
+    for name, data in reply_frames():
+        rate = best_rate(lambda: board._response_handler(data), repeat, number)
+        results[name] = {'frames_per_second': rate}
+    return results
+
+
+# Original decoding functions of CircuitPlayground, used by
+# legacy_response_handler.
+def parse_firmata_byte(data):
+    """Parse a byte value from two 7-bit byte firmata response bytes."""
+    if len(data) != 2:
+        raise ValueError('Expected 2 bytes of firmata repsonse for a byte value!')
+    return (data[0] & 0x7F) | ((data[1] & 0x01) << 7)
+
+
+def parse_firmata_float(data):
+    """Parse a 4 byte floating point value from a 7-bit byte firmata response
+    byte array.  Each pair of firmata 7-bit response bytes represents a single
+    byte of float data so there should be 8 firmata response bytes total.
+    """
+    if len(data) != 8:
+        raise ValueError('Expected 8 bytes of firmata response for floating point value!')
+    # Convert 2 7-bit bytes in little endian format to 1 8-bit byte for each
+    # of the four floating point bytes.
+    raw_bytes = bytearray(4)
+    for i in range(4):
+        raw_bytes[i] = parse_firmata_byte(data[i*2:i*2+2])
+    # Use struct unpack to convert to floating point value.
+    return struct.unpack('<f', raw_bytes)[0]
+
+
+def parse_firmata_long(data):
+    """Parse a 4 byte signed long integer value from a 7-bit byte firmata response
+    byte array.  Each pair of firmata 7-bit response bytes represents a single
+    byte of long data so there should be 8 firmata response bytes total.
+    """
+    if len(data) != 8:
+        raise ValueError('Expected 8 bytes of firmata response for long value!')
+    # Convert 2 7-bit bytes in little endian format to 1 8-bit byte for each
+    # of the four floating point bytes.
+    raw_bytes = bytearray(4)
+    for i in range(4):
+        raw_bytes[i] = parse_firmata_byte(data[i*2:i*2+2])
+    # Use struct unpack to convert to floating point value.
+    return struct.unpack('<l', raw_bytes)[0]
+
+
+def tap_register_to_clicks(register):
+    """Convert accelerometer tap register value to booleans that indicate
+    if a single and/or double tap have been detected.  Returns a tuple
+    of bools with single click boolean and double click boolean.
+    """
+    single = False
+    double = False
+    # Check if there is a good tap register value and check the single and
+    # double tap bits to set the appropriate bools.
+    if register & 0x30 > 0:
+        single = True if register & 0x10 > 0 else False
+        double = True if register & 0x20 > 0 else False
+    return (single, double)
+
+
+def legacy_response_handler(board, data):
+    """Original if/elif response handler, kept here as the baseline of
+    bench_decode_original.
+    """
+    logger.debug('CP response: 0x{0}'.format(hexlify(bytearray(data))))
+    if len(data) < 1:
+        logger.warning('Received response with no data!')
+        return
+    command = data[0] & 0x7F
+    if command == CP_ACCEL_READ_REPLY:
+        if len(data) < 26:
+            return
+        x = parse_firmata_float(data[2:10])
+        y = parse_firmata_float(data[10:18])
+        z = parse_firmata_float(data[18:26])
+        if board._accel_callback is not None:
+            board._accel_callback(x, y ,z)
+    elif command == CP_ACCEL_TAP_REPLY:
+        if len(data) < 4:
+            return
+        tap = parse_firmata_byte(data[2:4])
+        if board._tap_callback is not None:
+            board._tap_callback(*tap_register_to_clicks(tap))
+    elif command == CP_CAP_REPLY:
+        if len(data) < 12:
+            return
+        input_pin = parse_firmata_byte(data[2:4])
+        value = parse_firmata_long(data[4:12])
+        if board._cap_callback is not None:
+            board._cap_callback(input_pin, value > CAP_THRESHOLD, value)
+    elif command == CP_SENSECOLOR_REPLY:
+        if len(data) < 8:
+            return
+        red = parse_firmata_byte(data[2:4])
+        green = parse_firmata_byte(data[4:6])
+        blue = parse_firmata_byte(data[6:8])
+        if board._sensecolor_callback is not None:
+            board._sensecolor_callback(red, green, blue)
+    elif command == CP_IMPL_VERS_REPLY:
+        if len(data) < 8:
+            return
+        major = parse_firmata_byte(data[2:4])
+        minor = parse_firmata_byte(data[4:6])
+        bugfix = parse_firmata_byte(data[6:8])
+        if board._implemenation_version_callback is not None:
+            board._implemenation_version_callback(major, minor, bugfix)
+
+
+# Reply types the original decoder handled.
+ORIGINAL_REPLIES = ('accelerometer', 'tap', 'cap touch', 'color sense', 'version')
+
+
+def bench_decode_original(repeat=15, number=10000):
+    """Compare the reply frames/second decoded by the original if/elif decoder
+    and the current decoder table.  The reply handlers also record the latest
+    values and resolve pending reads, which the original decoder never did, so
+    they're swapped for the same do nothing callback to only compare the
+    decoding.  Both decoders take turns on every repeat so they see the same
+    machine load.
+    """
+    board = offline_board()
+    ignore = lambda *args: None
+    board._accel_callback = ignore
+    board._tap_callback = ignore
+    board._cap_callback = ignore
+    board._sensecolor_callback = ignore
+    board._implemenation_version_callback = ignore
+    for command, (length, layout, handler, name) in list(board._reply_decoders.items()):
+        board._reply_decoders[command] = (length, layout, ignore, name)
+    replies = [(name, data) for name, data in reply_frames() if name in ORIGINAL_REPLIES]
+    results = {}
+    for name, frames in [(name, [data]) for name, data in replies] + [('mixed', [data for _, data in replies])]:
+        best = [None, None]
+        for _ in range(repeat):
+            for i, handler in enumerate((lambda data: legacy_response_handler(board, data),
+                                         board._response_handler)):
+                def run():
+                    for data in frames:
+                        handler(data)
+                elapsed = timeit.timeit(run, number=number)
+                if best[i] is None or elapsed < best[i]:
+                    best[i] = elapsed
+        before, after = [len(frames)*number/elapsed for elapsed in best]
+        results[name] = {'before_frames_per_second': before, 'after_frames_per_second': after,
+                         'speedup': after/before}
+    return results
+
+
+def percentiles(values, points=(50, 90, 99)):
+    """Return a dict of summary statistics of values."""
+    values = sorted(values)
+    result = {'count': len(values), 'min': values[0], 'max': values[-1]}
+    for point in points:
+        result['p{0}'.format(point)] = values[min(len(values) - 1, int(len(values)*point/100.0))]
+    return result
+
+
+def bench_latency(board, count=100):
+    """Measure the milliseconds from sending a read request until its callback
+    is called, for each type of read.
+    """
+    results = {}
+    for name, request in (('read_accel',      board.read_accel),
+                          ('read_cap_touch',  lambda callback: board.read_cap_touch(10, callback)),
+                          ('sense_color',     board.sense_color)):
+        latencies = []
+        for i in range(count):
+            received = []
+            start = time.time()
+            future = request(lambda *values: received.append(time.time()))
+            future.result(READ_TIMEOUT)
+            latencies.append((received[0] - start)*1000.0)
+        results[name] = percentiles(latencies)
+    return results
+
+
+def bench_streams(board, duration=5.0, accel_rate_hz=200):
+    """Measure the frames/second received while accelerometer (raw format),
+    tap and cap touch streams run at the same time.
+    """
+    counts = {'accel': 0, 'tap': 0, 'cap touch': 0}
+    def counter(name):
+        def callback(*values):
+            counts[name] += 1
+        return callback
+    board.start_accel(counter('accel'), rate_hz=accel_rate_hz, format='int16')
+    board.start_tap(counter('tap'))
+    board.start_cap_touch(10, counter('cap touch'))
+    # Let the streams settle before counting.
+    time.sleep(0.5)
+    for name in counts:
+        counts[name] = 0
+    time.sleep(duration)
+    results = dict((name, {'frames_per_second': count/duration}) for name, count in counts.items())
+    board.stop_accel()
+    board.stop_tap()
+    board.stop_cap_touch(10)
+    results['total'] = {'frames_per_second': sum(counts.values())/duration}
+    return results
+
+
+def print_results(results):
+    print('Encode (per call):')
+    for name, result in sorted(results['encode'].items()):
+        print('  {0:<16} {1:>8.2f} us  {2:>4} bytes'.format(name, result['us_per_call'], result['bytes']))
+    print('Pixel update (all {0} pixels):'.format(PIXEL_COUNT))
+    for name, result in sorted(results['pixels'].items()):
+        print('  {0:<16} {1:>4} bytes {2:>3} messages {3:>8.1f} us  max {4:.0f} fps @ {5} baud'.format(
+            name, result['bytes'], result['messages'], result['us_per_frame'], result['max_fps'], BAUD_RATE))
+    print('Decode:')
+    for name, result in sorted(results['decode'].items()):
+        print('  {0:<16} {1:>12,.0f} frames/s'.format(name, result['frames_per_second']))
+    print('Decoding only, original vs. current decoder:')
+    for name, result in sorted(results['decode_original'].items()):
+        print('  {0:<16} {1:>12,.0f} -> {2:>12,.0f} frames/s {3:>6.1f}x'.format(
+            name, result['before_frames_per_second'], result['after_frames_per_second'], result['speedup']))
+    if 'latency_ms' in results:
+        print('Request to callback latency (ms):')
+        for name, result in sorted(results['latency_ms'].items()):
+            print('  {0:<16} p50={1:.2f} p90={2:.2f} p99={3:.2f} max={4:.2f}'.format(
+                name, result['p50'], result['p90'], result['p99'], result['max']))
+    if 'streams' in results:
+        print('Concurrent streams:')
+        for name, result in sorted(results['streams'].items()):
+            print('  {0:<16} {1:>8.1f} frames/s'.format(name, result['frames_per_second']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Circuit Playground helper class.')
+    parser.add_argument('--port', help='serial port of a real board (default is a simulated board)')
+    parser.add_argument('--output', help='file to save the results to as JSON')
+    parser.add_argument('--requests', type=int, default=100, help='read requests per latency test')
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds to run the streams for')
+    parser.add_argument('--offline', action='store_true',
+                        help='only run the encode and decode tests (no board or simulated board needed)')
+    args = parser.parse_args()
+
+    results = {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }
+    print('Measuring encode and decode...')
+    results['encode'] = bench_encode()
+    results['pixels'] = bench_pixels()
+    results['decode'] = bench_decode()
+    results['decode_original'] = bench_decode_original()
+    if not args.offline:
+        fake = None
+        port = args.port
+        if port is None:
+            fake = FakeCircuitPlayground(accel_noise=0.05, cap_noise=2.0)
+            port = fake.open()
+        results['board'] = args.port or 'simulated'
+        print('Connecting to board on {0}...'.format(port))
+        board = CircuitPlayground(port, verbose=False, fast_connect=True)
+        try:
+            results['firmware'] = board.read_implementation_version_sync()
+            print('Measuring latency...')
+            results['latency_ms'] = bench_latency(board, args.requests)
+            print('Measuring streams...')
+            results['streams'] = bench_streams(board, args.duration)
+        finally:
+            board.disconnect()
+            if fake is not None:
+                fake.close()
+    print_results(results)
+    if args.output is not None:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+        print('Saved results to {0}'.format(args.output))
+
+
+if __name__ == '__main__':
+    main()
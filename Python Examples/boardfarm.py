@@ -0,0 +1,277 @@
+# Circuit Playground board farm.
+#
+# This is not an example, rather it's a class to drive many Circuit Playground
+# boards from one program.  Instead of PyMata's two threads per board, one
+# thread reads the serial ports of every board and dispatches the received
+# messages to the right board object.  Make sure this file is in the same
+# directory as the examples!  Needs a platform where serial ports can be
+# selected, like Linux or Mac OSX.
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import logging
+import os
+import selectors
+import threading
+
+import serial
+
+from circuitplayground import CircuitPlayground, READ_TIMEOUT
+
+
+START_SYSEX = 0xF0
+END_SYSEX   = 0xF7
+
+logger = logging.getLogger(__name__)
+
+
+class FarmTransport(object):
+    """Serial transport of a board in a farm.  Commands are written straight to
+    the port like PyMata's transport does, reading is done by the farm.
+    """
+
+    def __init__(self, port_id, baud_rate, farm):
+        self.port_id = port_id
+        self.serial = serial.Serial(port_id, baud_rate, timeout=0, write_timeout=None)
+        self._farm = farm
+
+    def fileno(self):
+        return self.serial.fileno()
+
+    def write(self, data):
+        self.serial.write(bytes([ord(data)]))
+
+    def stop(self):
+        pass
+
+    def close(self):
+        # The farm must stop reading the port before it's closed (also when
+        # the board is disconnected directly), its selector breaks on a closed
+        # fd.
+        if not self.serial.is_open:
+            return
+        self._farm._detach(self)
+        self.serial.close()
+
+
+class FirmataParser(object):
+    """Splits the data received from a board into Firmata messages and calls
+    the board's command handler for each one, like PyMata's command handler
+    thread does.
+    """
+
+    def __init__(self, board):
+        self._dispatch = board._command_handler.command_dispatch
+        self._message = []
+        self._needed = 0
+
+    def feed(self, data):
+        """Handle bytes received from the board."""
+        message = self._message
+        dispatch = self._dispatch
+        for b in bytearray(data):
+            if not message:
+                if b == START_SYSEX:
+                    message.append(b)
+                elif 0x80 <= b <= 0xFF:
+                    # Analog and digital messages carry the pin or port in the
+                    # command byte, it's passed to the handler as the first value.
+                    if 0x90 <= b <= 0x9F or 0xE0 <= b <= 0xEF:
+                        command = b & 0xF0
+                        message.extend((command, b & 0x0F))
+                    else:
+                        message.append(b)
+                    entry = dispatch.get(message[0])
+                    if entry is None:
+                        del message[:]
+                    else:
+                        self._needed = len(message) + entry[1]
+                # Anything else is stray data and is ignored.
+                continue
+            if message[0] == START_SYSEX:
+                if b == END_SYSEX:
+                    entry = dispatch.get(message[1]) if len(message) > 1 else None
+                    if entry is not None:
+                        entry[0](message[2:])
+                    del message[:]
+                else:
+                    message.append(b)
+                continue
+            message.append(b)
+            if len(message) == self._needed:
+                dispatch[message[0]][0](message[1:])
+                del message[:]
+
+
+class BoardFarm(object):
+    """Many Circuit Playground boards that share one reader thread.  Create it
+    with a list of serial ports, for example:
+
+      farm = BoardFarm(['/dev/ttyACM0', '/dev/ttyACM1'])
+      farm[0].set_pixel(0, 255, 0, 0)     # Use one board like CircuitPlayground.
+      farm.set_pixels([(0, 0, 255)]*10)   # Or every board at once.
+      print(farm.read_accel_all())
+
+    The thread count stays the same no matter how many boards are added, and
+    replies are handled as soon as they arrive instead of PyMata's polling.
+    Boards can be taken out of a running farm with remove.
+    """
+
+    def __init__(self, ports=(), baud_rate=57600, board_class=CircuitPlayground):
+        self.boards = []
+        self._baud_rate = baud_rate
+        self._board_class = board_class
+        self._selector = selectors.DefaultSelector()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        for port in ports:
+            self.add(port)
+
+    def add(self, port_id):
+        """Connect to the board on the provided serial port, add it to the farm
+        and return its board object.
+        """
+        transport = FarmTransport(port_id, self._baud_rate, self)
+        board = self._board_class.__new__(self._board_class)
+        board._init_state()
+        board._init_pymata(transport)
+        self._selector.register(transport.fileno(), selectors.EVENT_READ, (transport, FirmataParser(board)))
+        # Reset the board and set up its pins (see CircuitPlayground fast_connect).
+        board._command_handler.system_reset()
+        try:
+            board._handshake(port_id)
+        except RuntimeError:
+            transport.close()
+            raise
+        self.boards.append(board)
+        return board
+
+    def _run(self):
+        """Reader thread that waits for data from any board and dispatches it."""
+        while not self._stop.is_set():
+            # Wake up periodically to check for a stop and boards added later.
+            for key, events in self._selector.select(timeout=0.1):
+                transport, parser = key.data
+                try:
+                    data = os.read(key.fd, 4096)
+                except OSError:
+                    continue
+                try:
+                    parser.feed(data)
+                except Exception:
+                    logger.exception('Error handling data from {0}!'.format(transport.port_id))
+
+    def remove(self, board):
+        """Reset and disconnect one board and remove it from the farm, the
+        other boards keep running.  Calling the board's disconnect does the
+        same.
+        """
+        assert board in self.boards, 'Board is not in the farm!'
+        board.disconnect()
+
+    def _detach(self, transport):
+        """Stop reading the port of a transport and drop its board from the
+        farm, called by the transport before it closes the port.
+        """
+        try:
+            self._selector.unregister(transport.fileno())
+        except KeyError:
+            pass
+        self.boards = [board for board in self.boards if board.transport is not transport]
+
+    def close(self):
+        """Reset and disconnect every board and stop the reader thread."""
+        boards = list(self.boards)
+        for board in boards:
+            board._cancel_requests()
+            board._command_handler.system_reset()
+        self._stop.set()
+        self._thread.join()
+        for board in boards:
+            board.transport.close()
+        self._selector.close()
+
+    def __len__(self):
+        return len(self.boards)
+
+    def __iter__(self):
+        return iter(self.boards)
+
+    def __getitem__(self, index):
+        return self.boards[index]
+
+    def broadcast(self, name, *args, **kwargs):
+        """Call the named board method with the provided parameters on every
+        board and return a list of the results.
+        """
+        return [getattr(board, name)(*args, **kwargs) for board in self.boards]
+
+    def set_pixels(self, colors, show=True, start=0):
+        """Set pixels on every board, see CircuitPlayground.set_pixels."""
+        self.broadcast('set_pixels', colors, show, start)
+
+    def clear_pixels(self):
+        """Clear and show the pixels on every board."""
+        self.broadcast('clear_pixels')
+        self.broadcast('show_pixels')
+
+    def set_pixel_brightness(self, brightness):
+        """Set the pixel brightness on every board."""
+        self.broadcast('set_pixel_brightness', brightness)
+
+    def tone(self, frequency_hz, duration_ms=0):
+        """Play a tone on every board."""
+        self.broadcast('tone', frequency_hz, duration_ms)
+
+    def no_tone(self):
+        """Stop the tone on every board."""
+        self.broadcast('no_tone')
+
+    def _read_all(self, name, timeout, *args):
+        # Send every request before waiting so the boards answer in parallel.
+        futures = self.broadcast(name, *args, timeout=timeout)
+        return [future.result(timeout) for future in futures]
+
+    def read_accel_all(self, timeout=READ_TIMEOUT):
+        """Read the accelerometer of every board and return a list of X, Y, Z
+        tuples in the order of the boards.
+        """
+        return self._read_all('read_accel', timeout)
+
+    def read_tap_all(self, timeout=READ_TIMEOUT):
+        """Read the tap state of every board and return a list of single and
+        double tap tuples in the order of the boards.
+        """
+        return self._read_all('read_tap', timeout)
+
+    def read_cap_touch_all(self, input_pin, timeout=READ_TIMEOUT):
+        """Read a cap touch input of every board and return a list of input
+        pin, touched and raw value tuples in the order of the boards.
+        """
+        return self._read_all('read_cap_touch', timeout, input_pin)
+
+    def sense_color_all(self, timeout=READ_TIMEOUT):
+        """Perform a color sense on every board and return a list of red, green,
+        blue tuples in the order of the boards.
+        """
+        return self._read_all('sense_color', timeout)
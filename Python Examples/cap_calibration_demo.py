@@ -0,0 +1,46 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+from capcalibration import CapCalibrator
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Callback that will be called when a cap touch input is touched or released.
+# Besides the input pin, touched boolean and raw value it gets the learned
+# untouched value (baseline) of the input.
+def cap_touch_event(input_pin, touched, raw_value, baseline):
+    print('Cap touch pin {0} is {1} (raw value {2}, baseline {3:.0f})'.format(
+        input_pin, 'pressed' if touched else 'released', raw_value, baseline))
+
+# Stream every cap touch input and learn its untouched value and noise.
+calibrator = CapCalibrator(board, callback=cap_touch_event)
+calibrator.start()
+print('Calibrating, don\'t touch the board for 2 seconds...')
+time.sleep(2.0)
+for pin in CAP_INPUTS:
+    print('Pin {0}: baseline {1:.0f}, noise {2:.1f}, touched above {3:.0f}'.format(
+        pin, calibrator.baseline(pin), calibrator.noise(pin), calibrator.threshold(pin)))
+
+try:
+    # Send the learned thresholds to the board so it detects touches itself,
+    # and update them every 30 seconds as the baselines drift.
+    print('Printing cap touch events forever (Ctrl-C to quit)...')
+    while True:
+        calibrator.push_thresholds()
+        time.sleep(30.0)
+finally:
+    print('Stopping!')
+    calibrator.stop()
+
+# Close Firmata board connection when done.
+board.close()
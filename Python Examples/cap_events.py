@@ -0,0 +1,39 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Callback that will be called when a cap touch input is touched or released.
+# The parameters are the same as for cap_streaming.py, the input pin, a touched
+# boolean and the raw value.
+def cap_touch_event(input_pin, touched, raw_value):
+    print('Cap touch pin {0} is {1} (raw value {2})'.format(
+        input_pin, 'pressed' if touched else 'released', raw_value))
+
+try:
+    # Let the board detect touches of every cap input itself, so only touch and
+    # release events are sent instead of a stream of values.  A touched input is
+    # released once its value drops 50 below the threshold of 300.
+    print('Printing cap touch events of all inputs forever (Ctrl-C to quit)...')
+    for pin in CAP_INPUTS:
+        board.start_cap_touch(pin, cap_touch_event, threshold=300, hysteresis=50)
+    while True:
+        time.sleep(1.0)
+finally:
+    print('Stopping!')
+    for pin in CAP_INPUTS:
+        board.stop_cap_touch(pin)
+
+# Close Firmata board connection when done.
+board.close()
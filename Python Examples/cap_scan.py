@@ -0,0 +1,36 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Callback that will be called when a scan of all the cap touch inputs is
+# available.  The touched parameter is a tuple of booleans that are true if the
+# cap touch input is above a touch threshold (as defined by
+# circuitplayground.CAP_THRESHOLD), and raw_values is a tuple of the raw cap
+# touch library values.  Both are in the order of circuitplayground.CAP_INPUTS
+# (pins 0, 1, 2, 3, 6, 9, 10, 12).
+def cap_scan_data(touched, raw_values):
+    pressed = [pin for pin, is_touched in zip(CAP_INPUTS, touched) if is_touched]
+    print('Cap touch values: {0} pressed: {1}'.format(raw_values, pressed))
+
+# Scan all eight cap touch inputs 10 times a second.  Each scan is one command
+# and one response no matter how many inputs are read.
+print('Printing cap touch state of all inputs (Ctrl-C to quit)...')
+try:
+    while True:
+        board.scan_cap_touch(cap_scan_data)
+        time.sleep(0.1)
+finally:
+    # Close Firmata board connection when done.
+    board.close()
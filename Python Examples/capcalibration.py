@@ -0,0 +1,164 @@
+# Adaptive cap touch calibration for Circuit Playground boards.
+#
+# This is not an example, rather it's a class that learns the untouched value
+# and noise of each cap touch input from its stream and detects touches
+# relative to that baseline, instead of the fixed CAP_THRESHOLD.  Make sure
+# this file is in the same directory as the examples!
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+from circuitplayground import CAP_INPUTS
+
+
+class _CapBaseline(object):
+    """Running baseline and noise estimate of one cap touch input."""
+
+    __slots__ = ('baseline', 'noise', 'touched', 'samples')
+
+    def __init__(self):
+        self.baseline = 0.0  # Exponentially weighted moving average of untouched values.
+        self.noise = 0.0     # Moving average of the absolute deviation from the baseline.
+        self.touched = False
+        self.samples = 0     # Untouched values the baseline has learned from.
+
+
+class CapCalibrator(object):
+    """Detect cap touches relative to a baseline that's learned per input, so
+    detection keeps working when humidity, cables or the board's surroundings
+    change the untouched values.  For example:
+
+      calibrator = CapCalibrator(board, callback=touch)
+      calibrator.start()                # Stream and learn every cap input.
+      time.sleep(2.0)                   # Don't touch anything while it learns.
+      calibrator.push_thresholds()      # Optionally let the board detect touches.
+
+    Each input keeps an exponentially weighted moving average of its untouched
+    values (the baseline) and of their absolute deviation from it (the noise).
+    An input is touched when its value rises more than its threshold above the
+    baseline, where the threshold is sensitivity times the noise (but at least
+    min_delta), and released once it drops back below release times the
+    threshold.  The baseline doesn't learn while an input is touched.  The
+    callback is called on each touch and release with the input pin, touched
+    boolean, raw value and baseline.
+
+    Alpha is the weight of each new value, the baseline follows changes over
+    roughly 1/alpha values.  Until that many values were seen the baseline is
+    a plain average so it settles quickly, and no touches are reported before
+    warmup values were seen.  Memory and time per value are constant, so all
+    eight inputs can be streamed at full rate.
+    """
+
+    def __init__(self, board, pins=CAP_INPUTS, callback=None, alpha=0.01, sensitivity=8.0,
+                 min_delta=50, release=0.5, warmup=20):
+        assert 0 < alpha <= 1, 'Alpha must be a value above 0 and at most 1!'
+        assert 0 < release <= 1, 'Release must be a value above 0 and at most 1!'
+        self.board = board
+        self.pins = tuple(pins)
+        self.callback = callback
+        self.alpha = alpha
+        self.sensitivity = sensitivity
+        self.min_delta = min_delta
+        self.release = release
+        self.warmup = warmup
+        self._inputs = dict((pin, _CapBaseline()) for pin in self.pins)
+
+    def start(self):
+        """Start streaming every calibrated input and learning its baseline."""
+        for pin in self.pins:
+            self.board.start_cap_touch(pin, self.update)
+
+    def stop(self):
+        """Stop streaming the calibrated inputs."""
+        for pin in self.pins:
+            self.board.stop_cap_touch(pin)
+
+    def update(self, input_pin, touched, value):
+        """Learn from a value of an input and detect touches.  This is the
+        callback passed to start_cap_touch (touched is ignored), call it
+        yourself to feed values from another source.
+        """
+        state = self._inputs.get(input_pin)
+        if state is None:
+            return
+        if state.samples == 0:
+            # Start the baseline at the first value.
+            state.baseline = float(value)
+        deviation = value - state.baseline
+        threshold = max(self.min_delta, self.sensitivity*state.noise)
+        if state.touched:
+            # Released once the value drops back close to the baseline.
+            if deviation < self.release*threshold:
+                state.touched = False
+                if self.callback is not None:
+                    self.callback(input_pin, False, value, state.baseline)
+        elif state.samples >= self.warmup and deviation > threshold:
+            state.touched = True
+            if self.callback is not None:
+                self.callback(input_pin, True, value, state.baseline)
+        else:
+            # Learn from the untouched value, as a plain average until enough
+            # values were seen for the moving average.
+            state.samples += 1
+            weight = max(self.alpha, 1.0/state.samples)
+            state.baseline += weight*deviation
+            state.noise += weight*(abs(deviation) - state.noise)
+
+    def baseline(self, input_pin):
+        """Return the learned untouched value of an input."""
+        return self._inputs[input_pin].baseline
+
+    def noise(self, input_pin):
+        """Return the learned average deviation from the baseline of an input."""
+        return self._inputs[input_pin].noise
+
+    def threshold(self, input_pin):
+        """Return the raw value above which an input is considered touched."""
+        state = self._inputs[input_pin]
+        return state.baseline + max(self.min_delta, self.sensitivity*state.noise)
+
+    def touched(self, input_pin):
+        """Return True if an input is currently touched."""
+        return self._inputs[input_pin].touched
+
+    def calibrated(self, input_pin):
+        """Return True once an input has seen enough values to detect touches."""
+        return self._inputs[input_pin].samples >= self.warmup
+
+    def push_thresholds(self, heartbeat_ms=1000):
+        """Configure the board to detect touches of each calibrated input with
+        its learned threshold and hysteresis (see
+        CircuitPlayground.start_cap_touch), so the board only sends touch and
+        release events.  The calibrator keeps learning from the events and from
+        the raw value the board sends every heartbeat_ms milliseconds, call this
+        again from time to time to send the board the updated thresholds.
+        Returns a dict of the threshold sent for each input.
+        """
+        thresholds = {}
+        for pin in self.pins:
+            if not self.calibrated(pin):
+                continue
+            delta = max(self.min_delta, self.sensitivity*self.noise(pin))
+            threshold = max(1, min(16383, int(round(self.baseline(pin) + delta))))
+            hysteresis = min(threshold, int(round((1.0 - self.release)*delta)))
+            self.board.start_cap_touch(pin, self.update, threshold, hysteresis, heartbeat_ms,
+                                       heartbeat_callback=self.update)
+            thresholds[pin] = threshold
+        return thresholds
@@ -0,0 +1,172 @@
+# Circuit Playground session capture and replay.
+#
+# This is not an example, rather it's a module to record the firmata messages
+# sent to and received from a Circuit Playground board into a compact binary
+# file, and to replay the received messages through a CircuitPlayground
+# instance without a board.  Every message is recorded, the Circuit Playground
+# sysex frames as well as PyMata's own messages (like the analog reports of the
+# light sensor and thermistor).  Make sure this file is in the same directory
+# as the examples!
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import mmap
+import struct
+import threading
+import time
+
+from circuitplayground import CircuitPlayground, EXTENDED_FIRMWARE
+
+
+# Capture files start with this header, followed by one record per message.
+CAPTURE_MAGIC = b'CPCAP\x01'
+
+# Direction of a captured message.
+CAPTURE_IN  = 0  # Received from the board.
+CAPTURE_OUT = 1  # Sent to the board.
+
+# Each record is this header followed by length bytes of message data (for
+# sysex messages the 7-bit bytes between the sysex command and END_SYSEX, for
+# other messages the bytes after the command byte, with the pin or port of
+# received analog and digital messages as the first byte like PyMata passes
+# them to its handlers):
+#  - Seconds since the capture started (double)
+#  - Direction (CAPTURE_IN or CAPTURE_OUT)
+#  - Firmata command, the sysex command (0x00-0x7F) or the command byte of
+#    other messages (0x80-0xFF)
+#  - Length of the message data
+_RECORD = struct.Struct('<dBBH')
+
+
+class CaptureWriter(object):
+    """Write firmata messages with their timestamp to a capture file.  Messages
+    can be written from any thread.  Pass an instance to
+    CircuitPlayground.start_capture to record a board session.
+    """
+
+    def __init__(self, path):
+        self._file = open(path, 'wb')
+        self._file.write(CAPTURE_MAGIC)
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+
+    def received(self, command, data):
+        """Write a message received from the board."""
+        self.write(CAPTURE_IN, command, data)
+
+    def sent(self, command, data):
+        """Write a message sent to the board."""
+        self.write(CAPTURE_OUT, command, data)
+
+    def write(self, direction, command, data):
+        """Write a message with the direction, firmata command and data."""
+        data = bytes(bytearray(data))
+        with self._lock:
+            self._file.write(_RECORD.pack(time.monotonic() - self._start, direction, command, len(data)))
+            self._file.write(data)
+
+    def close(self):
+        """Flush and close the capture file."""
+        with self._lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def read_capture(path, use_mmap=True):
+    """Generator that reads a capture file and yields a tuple of timestamp
+    (seconds since the capture started), direction, firmata command and
+    message data (as a bytes object) for each message.  By default the file is memory
+    mapped instead of read into memory, so big captures can be read quickly.
+    """
+    with open(path, 'rb') as capture:
+        if use_mmap:
+            buf = mmap.mmap(capture.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            buf = capture.read()
+        try:
+            if buf[:len(CAPTURE_MAGIC)] != CAPTURE_MAGIC:
+                raise ValueError('{0} is not a Circuit Playground capture file!'.format(path))
+            offset = len(CAPTURE_MAGIC)
+            size = len(buf)
+            while offset + _RECORD.size <= size:
+                timestamp, direction, command, length = _RECORD.unpack_from(buf, offset)
+                offset += _RECORD.size
+                yield timestamp, direction, command, buf[offset:offset + length]
+                offset += length
+        finally:
+            if use_mmap:
+                buf.close()
+
+
+class ReplayTransport(object):
+    """Stand-in for the PyMata serial transport that replays the messages a
+    board sent in a capture file.  Commands written to it are ignored.  Create a board
+    for replaying without any hardware with ReplayTransport.board(), then call
+    replay.
+    """
+
+    def __init__(self, path):
+        self.path = path
+
+    def write(self, data):
+        pass
+
+    def board(self, board_class=CircuitPlayground, version=EXTENDED_FIRMWARE[10]):
+        """Create a board object of board_class (by default CircuitPlayground)
+        that isn't connected to any hardware and uses this transport.  Its pins
+        are set up from the pin map of the firmware version (see
+        circuitplayground.PIN_MAPS) so analog reports can be replayed too.
+        """
+        board = board_class.__new__(board_class)
+        board._init_state()
+        board._init_pymata(self)
+        pin_map = board._load_pin_map(version)
+        if pin_map is not None:
+            board._apply_pin_map(pin_map)
+        return board
+
+    def replay(self, board, speed=1.0):
+        """Feed the captured messages received from the board through the
+        board's command handler, like they were just received, and return the
+        number of messages.  Speed scales the original timing (2.0 is twice as
+        fast), or None replays the messages as fast as possible.
+        """
+        count = 0
+        first = None
+        start = time.monotonic()
+        dispatch = board._command_handler.command_dispatch
+        for timestamp, direction, command, data in read_capture(self.path):
+            if direction != CAPTURE_IN or command not in dispatch:
+                continue
+            if first is None:
+                first = timestamp
+            if speed is not None:
+                delay = (timestamp - first)/speed - (time.monotonic() - start)
+                if delay > 0:
+                    time.sleep(delay)
+            dispatch[command][0](bytearray(data))
+            count += 1
+        return count
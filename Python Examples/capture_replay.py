@@ -0,0 +1,57 @@
+#!/usr/bin/python
+# Record a session with a Circuit Playground board and replay it later without
+# the board.
+#
+# Record streamed accelerometer and cap touch data for 10 seconds:
+#   python capture_replay.py record /dev/ttyACM0 session.cpcap
+# Replay it at the original speed, printing the accelerometer data:
+#   python capture_replay.py replay session.cpcap
+# Or replay it as fast as possible and print how fast the messages are decoded:
+#   python capture_replay.py replay session.cpcap fast
+import sys
+import time
+
+from capture import CaptureWriter, ReplayTransport
+from circuitplayground import CircuitPlayground
+
+
+def accel_data(x, y, z):
+    print('X={0:.2f} Y={1:.2f} Z={2:.2f}'.format(x, y, z))
+
+def cap_touch_data(input_pin, touched, raw_value):
+    if touched:
+        print('Cap touch pin {0} is pressed!'.format(input_pin))
+
+def ignore(*args):
+    pass
+
+
+if len(sys.argv) == 4 and sys.argv[1] == 'record':
+    port, path = sys.argv[2], sys.argv[3]
+    # Connect to Circuit Playground board on specified port and record the
+    # messages of a few streams.
+    board = CircuitPlayground(port)
+    board.start_capture(CaptureWriter(path))
+    board.start_accel(accel_data)
+    board.start_cap_touch(10, cap_touch_data)
+    print('Recording for 10 seconds...')
+    time.sleep(10)
+    board.stop_accel()
+    board.stop_cap_touch(10)
+    board.stop_capture()
+    board.close()
+elif len(sys.argv) in (3, 4) and sys.argv[1] == 'replay':
+    fast = len(sys.argv) == 4 and sys.argv[3] == 'fast'
+    # Create a board that isn't connected to hardware and replay the messages
+    # through it, the callbacks are called just like they were live.
+    transport = ReplayTransport(sys.argv[2])
+    board = transport.board()
+    board.start_accel(ignore if fast else accel_data)
+    board.start_cap_touch(10, ignore if fast else cap_touch_data)
+    start = time.time()
+    count = transport.replay(board, speed=None if fast else 1.0)
+    elapsed = time.time() - start
+    print('Replayed {0} messages in {1:.2f} seconds ({2:,.0f} messages/s)'.format(count, elapsed, count/elapsed))
+else:
+    print('ERROR! Usage: capture_replay.py record <serial port> <file> or capture_replay.py replay <file> [fast]')
+    sys.exit(-1)
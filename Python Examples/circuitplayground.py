@@ -28,11 +28,25 @@
 # SOFTWARE.
 import atexit
 from binascii import hexlify
+from collections import deque, namedtuple, OrderedDict
+import concurrent.futures
+import functools
+import json
 import logging
 import math
+import os
 import struct
+import threading
+import time
 
+try:
+    import numpy as np
+except ImportError:
+    # NumPy is optional and only needed for the functions that return arrays.
+    np = None
 from PyMata.pymata import PyMata
+from PyMata.pymata_command_handler import PyMataCommandHandler
+from PyMata.pymata_serial import PyMataSerial
 
 
 # Constants that define the Circuit Playground Firmata command values.
@@ -48,12 +62,47 @@ CP_PIXEL_CLEAR          = 0x12  # Clear all NeoPixels to black/off.  Must call s
 CP_PIXEL_BRIGHTNESS     = 0x13  # Set the brightness of the NeoPixels, just like calling the
                                 # NeoPixel library setBrightness function.  Takes one parameter
                                 # which is a single byte with a value 0-100.
+CP_PIXEL_SET_ALL        = 0x14  # Set a run of NeoPixels with one command, expects the following bytes as data:
+                                #  - First pixel ID (0-9)
+                                #  - Show flag, if 1 the pixels are shown after being set (like CP_PIXEL_SHOW)
+                                #  - Pixel RGB color data as 4 7-bit bytes (same packing as CP_PIXEL_SET)
+                                #    for each pixel, starting at the first pixel ID.
+CP_PIXEL_ANIM           = 0x15  # Run a pixel animation on the board, it's rendered from the loop until another
+                                # animation or any other pixel command.  Expects the following bytes as data:
+                                #  - Animation (see PIXEL_ANIMATIONS), 0 = off (pixels keep their colors)
+                                #  - Frequency (millihertz) as 2 7-bit bytes
+                                #  - Phase offset between adjacent pixels (thousandths of a turn) as 2 7-bit bytes
+                                #  - Color 0 and color 1 RGB data as 4 7-bit bytes each (same packing as CP_PIXEL_SET)
 CP_TONE                 = 0x20  # Play a tone on the speaker, expects the following bytes as data:
                                 #  - Frequency (hz) as 2 7-bit bytes (up to 2^14 hz, or about 16khz)
                                 #  - Duration (ms) as 2 7-bit bytes.
 CP_NO_TONE              = 0x21  # Stop playing anything on the speaker.
+CP_TONE_SEQUENCE        = 0x22  # Queue a sequence of notes to play on the speaker with on-board timing, expects the
+                                # following bytes as data:
+                                #  - Flags: bit 0 = start a new sequence (stop playback and clear the queued
+                                #    notes), bit 1 = start playing the queued notes.
+                                #  - For each note (up to TONE_SEQUENCE_MAX notes queued in total):
+                                #    - Frequency (hz) as 2 7-bit bytes, 0 = a rest.
+                                #    - Duration (ms) as 2 7-bit bytes.
+                                # Long sequences are sent as multiple messages, only the last sets the play flag.
+                                # A CP_TONE_SEQUENCE_REPLY is sent once the sequence finishes or is stopped.
+CP_TONE_SEQUENCE_STOP   = 0x23  # Stop playing a tone sequence.
+CP_TONE_SEQUENCE_REPLY  = 0x24  # Tone sequence finished.  Includes a byte that's 1 if every note was played or 0 if
+                                # the sequence was stopped, then a byte with the number of notes played.
 CP_ACCEL_READ           = 0x30  # Return the current x, y, z accelerometer values.
 CP_ACCEL_TAP            = 0x31  # Return the current accelerometer tap state.
+CP_ACCEL_STREAM_CONFIG  = 0x32  # Turn on continuous streaming of accelerometer data with a configured format and
+                                # rate, expects the following bytes as data:
+                                #  - Format: 0 = floats (CP_ACCEL_READ_REPLY), 1 = int16 counts (CP_ACCEL_RAW_REPLY)
+                                #  - Interval between samples (ms) as 2 7-bit bytes, 0 = the sampling interval.
+CP_ACCEL_RAW_REPLY      = 0x33  # Result of a raw accelerometer read.  Sent as 7-bit bytes (not expanded into 2 bytes
+                                # like the other responses), includes a byte with the accelerometer range (0-3) then
+                                # x, y, z as signed 12-bit counts, each split across 2 7-bit bytes (LSB first).
+CP_ACCEL_BATCH_ON       = 0x34  # Turn on batched streaming of accelerometer data, the board buffers samples and sends
+                                # them in CP_ACCEL_BATCH_REPLY messages.  Expects the following bytes as data:
+                                #  - Samples per message (1-32)
+                                #  - Interval between samples (ms) as 2 7-bit bytes.
+CP_ACCEL_BATCH_OFF      = 0x35  # Turn off batched streaming of accelerometer data.
 CP_ACCEL_READ_REPLY     = 0x36  # Result of an acceleromete read.  Includes 3 floating point values (4 bytes each) with x, y, z
                                 # acceleration in meters/second^2.
 CP_ACCEL_TAP_REPLY      = 0x37  # Result of the tap sensor read.  Includes a byte with the tap register value.
@@ -69,6 +118,12 @@ CP_ACCEL_TAP_CONFIG     = 0x3D  # Set the sensitivity of the tap detection, take
                                 #   - Click threshold: 0-255, the higher the value the less sensitive.  Depends on the accelerometer
                                 #     range, good values are: +/-16G = 5-10, +/-8G = 10-20, +/-4G = 20-40, +/-2G = 40-80
                                 #     80 is the default value (goes well with default of +/-2G)
+CP_ACCEL_BATCH_REPLY    = 0x3E  # Batch of accelerometer samples.  Sent as 7-bit bytes like CP_ACCEL_RAW_REPLY, includes:
+                                #  - Accelerometer range (0-3)
+                                #  - Number of samples
+                                #  - Time of the first sample (ms since board start) as 4 7-bit bytes (LSB first)
+                                #  - Interval between samples (ms) as 2 7-bit bytes
+                                #  - x, y, z of each sample as signed 12-bit counts, each split across 2 7-bit bytes
 CP_CAP_READ             = 0x40  # Read a single capacitive input.  Expects a byte as a parameter with the
                                 # cap touch input to read (0, 1, 2, 3, 6, 9, 10, 12).  Will respond with a
                                 # CP_CAP_REPLY message.
@@ -76,6 +131,23 @@ CP_CAP_ON               = 0x41  # Turn on continuous cap touch reads for the spe
 CP_CAP_OFF              = 0x42  # Turn off continuous cap touch reads for the specified input (sent as a byte parameter).
 CP_CAP_REPLY            = 0x43  # Capacitive input read response.  Includes a byte with the pin # of the cap input, then
                                 # four bytes of data which represent an int32_t value read from the cap input.
+CP_CAP_SCAN             = 0x44  # Read all eight capacitive inputs at once.  Will respond with a single
+                                # CP_CAP_SCAN_REPLY message.
+CP_CAP_SCAN_REPLY       = 0x45  # Capacitive scan response.  Includes eight int32_t values (4 bytes each), one for
+                                # each cap touch input in the order 0, 1, 2, 3, 6, 9, 10, 12.
+CP_CAP_CONFIG           = 0x46  # Configure on-board touch detection of a cap touch input, expects the following bytes as data:
+                                #  - Cap touch input (0, 1, 2, 3, 6, 9, 10, 12)
+                                #  - Touch threshold as 2 7-bit bytes, 0 = no touch detection (stream every
+                                #    value with CP_CAP_REPLY, the default)
+                                #  - Hysteresis as 2 7-bit bytes, a touched input is released once its value
+                                #    drops below threshold - hysteresis
+                                #  - Heartbeat interval (ms) as 2 7-bit bytes, 0 = no heartbeat
+                                # With a threshold set a streaming input (see CP_CAP_ON) only sends a
+                                # CP_CAP_EVENT_REPLY when it's touched or released, plus its raw value as a
+                                # CP_CAP_REPLY every heartbeat interval.
+CP_CAP_EVENT_REPLY      = 0x47  # Cap touch event.  Includes a byte with the pin # of the cap input, a byte that's
+                                # 1 if the input was touched or 0 if released, then four bytes of data which
+                                # represent the int32_t value read from the cap input.
 CP_SENSECOLOR           = 0x50  # Perform a color sense using the NeoPixel and light sensor.
 CP_SENSECOLOR_REPLY     = 0x51  # Result of a color sense, will return the red, green, blue color
                                 # values that were read from the light sensor.  This will return
@@ -85,6 +157,26 @@ CP_SENSECOLOR_REPLY     = 0x51  # Result of a color sense, will return the red,
                                 #  - blue color (unsigned 8 bit value, split across 2 7-bit bytes)
 CP_IMPL_VERS            = 0x60  # Get the implementation version, 3 bytes of Major, Minor, Bugfix
 CP_IMPL_VERS_REPLY      = 0x61
+CP_MIC_CAPTURE          = 0x70  # Capture raw microphone samples and send them in CP_MIC_SAMPLES_REPLY messages,
+                                # expects the following bytes as data:
+                                #  - Number of samples as 2 7-bit bytes, 0 = capture until CP_MIC_CAPTURE_STOP
+                                #  - Interval between samples (microseconds) as 2 7-bit bytes.
+CP_MIC_CAPTURE_STOP     = 0x71  # Stop capturing raw microphone samples.
+CP_MIC_LEVEL_ON         = 0x72  # Turn on streaming of the sound level, every interval the board samples the
+                                # microphone and sends the RMS and peak level in a CP_MIC_LEVEL_REPLY.  Samples
+                                # are taken in short slices between the other loop work, so long windows don't
+                                # stall the board.  Expects the following bytes as data:
+                                #  - Interval between reports (ms) as 2 7-bit bytes.
+                                #  - Number of samples per report (1-4096) as 2 7-bit bytes.
+                                #  - Interval between samples (microseconds) as 2 7-bit bytes.
+CP_MIC_LEVEL_OFF        = 0x73  # Turn off streaming of the sound level.
+CP_MIC_SAMPLES_REPLY    = 0x74  # Frame of raw microphone samples.  Sent as 7-bit bytes like CP_ACCEL_RAW_REPLY, includes:
+                                #  - Time of the first sample (microseconds since board start) as 4 7-bit bytes (LSB first)
+                                #  - Number of samples (1-32)
+                                #  - Interval between samples (microseconds) as 2 7-bit bytes
+                                #  - Each sample as an unsigned 10-bit value split across 2 7-bit bytes
+CP_MIC_LEVEL_REPLY      = 0x75  # Sound level.  Includes a floating point value (4 bytes) with the RMS level and a
+                                # uint16_t value (2 bytes) with the peak level, both in ADC counts from the average.
 
 
 # Accelerometer constants to be passed to set_accel_range.
@@ -93,7 +185,28 @@ ACCEL_4G  = 1
 ACCEL_8G  = 2
 ACCEL_16G = 3
 
+# Accelerometer stream formats to be passed to start_accel.
+ACCEL_FORMATS = {'float': 0, 'int16': 1}
+# Pixel animations to be passed to start_pixel_animation.
+PIXEL_ANIMATIONS = {'off': 0, 'breathe': 1, 'chase': 2, 'lerp': 3, 'rainbow': 4}
+
+# Meters/second^2 of one raw accelerometer count for each range, this matches
+# the conversion done by the Adafruit_LIS3DH library for the float values.
+ACCEL_RAW_SCALE = tuple(16.0*9.80665/divider for divider in (16380.0, 8190.0, 4096.0, 1365.0))
+ACCEL_BATCH_MAX = 32  # Maximum accelerometer samples per batch message.
+
+# Microphone constants.
+MIC_RATE      = 8000  # Default microphone samples per second.
+MIC_FRAME_MAX = 32    # Maximum microphone samples per CP_MIC_SAMPLES_REPLY.
+MIC_LEVEL_MAX = 4096  # Maximum microphone samples per sound level report.
+
+# Tone sequence configuration.
+TONE_SEQUENCE_MAX   = 64  # Maximum notes the board queues for a tone sequence.
+TONE_SEQUENCE_NOTES = 12  # Notes sent per CP_TONE_SEQUENCE message, keeps each message
+                          # within the 64 byte Firmata sysex buffer.
+
 # Constants for some of the board peripherals
+PIXEL_COUNT        = 10       # Number of NeoPixels on the board.
 THERM_PIN          = 0        # Analog input connected to the thermistor.
 THERM_SERIES_OHMS  = 10000.0  # Resistor value in series with thermistor.
 THERM_NOMINAL_OHMS = 10000.0  # Thermistor resistance at 25 degrees C.
@@ -102,175 +215,1111 @@ THERM_BETA         = 3950.0   # Thermistor beta coefficient.
 CAP_THRESHOLD      = 300      # Threshold for considering a cap touch input pressed.
                               # If the cap touch value is above this value it is
                               # considered touched.
+CAP_HYSTERESIS     = 50       # Default drop below the threshold before a touched
+                              # input is considered released (see start_cap_touch).
+CAP_INPUTS = (0, 1, 2, 3, 6, 9, 10, 12)  # Cap touch inputs, in the order used by cap scans.
+READ_TIMEOUT       = 1.0      # Default seconds a read request waits for its reply.
+
+# Callback dispatch settings (see CircuitPlayground.set_dispatch).
+DISPATCH_STREAMS    = ('accel', 'accel_batch', 'tap', 'temperature', 'cap', 'audio', 'sound_level')
+DISPATCH_POLICIES   = ('inline', 'executor', 'queue', 'latest')
+DISPATCH_QUEUE_SIZE = 100  # Default calls a 'queue' dispatcher holds before dropping the oldest.
+
+# Fast connect settings (see the fast_connect parameter of CircuitPlayground).
+CONNECT_TIMEOUT = 10.0  # Seconds to wait for the board to answer the version handshake.
+# Analog mapping of the board pins (analog input number of each pin, or 127 if
+# the pin isn't analog) keyed by firmware implementation version, so the board
+# doesn't need to be discovered.  Maps of other versions are discovered once
+# and saved in the PIN_MAP_CACHE file.
+PIN_MAPS = {
+    (10, 31, 0):  [127]*18 + list(range(12)),  # CircuitPlaygroundFirmata (ATmega32u4 pins).
+    (10, 30, 19): [127]*18 + list(range(12)),  # CircuitPlaygroundFirmata before EXTENDED_FIRMWARE.
+}
+PIN_MAP_CACHE = os.path.join(os.path.expanduser('~'), '.circuitplayground_pins.json')
+
+# First firmware implementation version of each sketch (keyed by its major
+# version) that answers the commands added after the original command set.
+# Older firmware ignores them, so sending one to an older board raises an
+# error instead of silently timing out.
+EXTENDED_FIRMWARE = {
+    10: (10, 31, 0),  # CircuitPlaygroundFirmata.
+    8:  (8, 30, 0),   # CircuitPlaygroundFirmata_Express_CodeOrg.
+}
+# Names of the commands that need EXTENDED_FIRMWARE, keyed by opcode.
+EXTENDED_COMMANDS = {
+    CP_PIXEL_SET_ALL:       'CP_PIXEL_SET_ALL',
+    CP_PIXEL_ANIM:          'CP_PIXEL_ANIM',
+    CP_TONE_SEQUENCE:       'CP_TONE_SEQUENCE',
+    CP_TONE_SEQUENCE_STOP:  'CP_TONE_SEQUENCE_STOP',
+    CP_ACCEL_STREAM_CONFIG: 'CP_ACCEL_STREAM_CONFIG',
+    CP_ACCEL_BATCH_ON:      'CP_ACCEL_BATCH_ON',
+    CP_ACCEL_BATCH_OFF:     'CP_ACCEL_BATCH_OFF',
+    CP_CAP_SCAN:            'CP_CAP_SCAN',
+    CP_CAP_CONFIG:          'CP_CAP_CONFIG',
+    CP_MIC_CAPTURE:         'CP_MIC_CAPTURE',
+    CP_MIC_CAPTURE_STOP:    'CP_MIC_CAPTURE_STOP',
+    CP_MIC_LEVEL_ON:        'CP_MIC_LEVEL_ON',
+    CP_MIC_LEVEL_OFF:       'CP_MIC_LEVEL_OFF',
+}
+
+# Layouts of the decoded reply payloads (after unpacking the 7-bit firmata bytes).
+_ACCEL_REPLY      = struct.Struct('<3f')  # X, Y, Z acceleration in meters/second^2.
+_TAP_REPLY        = struct.Struct('<B')   # Tap register value.
+_CAP_REPLY        = struct.Struct('<Bl')  # Cap input pin, int32 cap touch value.
+_CAP_SCAN_REPLY   = struct.Struct('<8l')  # Int32 cap touch value of each input in CAP_INPUTS.
+_CAP_EVENT_REPLY  = struct.Struct('<BBl') # Cap input pin, touched flag, int32 cap touch value.
+_SENSECOLOR_REPLY = struct.Struct('<3B')  # Red, green, blue color bytes.
+_IMPL_VERS_REPLY  = struct.Struct('<3B')  # Major, minor, bugfix version.
+_MIC_LEVEL_REPLY  = struct.Struct('<fH')  # RMS level, peak level.
+_TONE_SEQUENCE_REPLY = struct.Struct('<2B')  # Completed flag, notes played.
+
+# Masks of the low 7 bits and the high bit of every 7-bit firmata byte pair
+# when a reply payload is read as one little endian integer, big enough for the
+# largest reply payload.
+_PAIR_LOW_BITS = int.from_bytes(b'\x7F\x00'*32, 'little')
+_PAIR_HIGH_BITS = int.from_bytes(b'\x00\x01'*32, 'little')
+
+# Single and double tap booleans of every tap register value.  A register with
+# neither tap bit 0x10 (single) nor 0x20 (double) set has no taps.
+_TAP_CLICKS = tuple((register & 0x30 > 0 and register & 0x10 > 0,
+                     register & 0x30 > 0 and register & 0x20 > 0) for register in range(256))
 
 logger = logging.getLogger(__name__)
 
+# Newest values of a reply type and the host time (from time.time()) they were
+# received, see the *_latest attributes of CircuitPlayground.
+LatestValue = namedtuple('LatestValue', ('value', 'timestamp'))
+
+
+def _call_with_result(callback, future):
+    """Done callback of a read request future that calls a user callback with
+    the values of the reply (nothing is called if the request failed).
+    """
+    if not future.cancelled() and future.exception() is None:
+        callback(*future.result())
+
+
+@functools.lru_cache(maxsize=None)
+def _therm_table(series_ohms, nominal_ohms, nominal_c, beta):
+    """Return a tuple with the temperature in Celsius of each of the 1024
+    thermistor ADC values for a set of thermistor constants.  Tables are
+    cached so boards with the same constants share one.
+    """
+    table = []
+    for adc_value in range(1024):
+        # Use Steinhart-Hart thermistor equation to convert thermistor resistance to
+        # temperature.  See: https://learn.adafruit.com/thermistor/overview
+        # Values of 0 and 1023 have no meaning (and would cause a divide by
+        # zero or log of zero).
+        if adc_value == 0 or adc_value == 1023:
+            table.append(float('NaN'))
+            continue
+        # First calculate the resistance of the thermistor based on its ADC value.
+        resistance = ((1023.0 * series_ohms)/adc_value)
+        resistance -= series_ohms
+        # Now apply Steinhart-Hart equation.
+        steinhart = resistance / nominal_ohms
+        steinhart = math.log(steinhart)
+        steinhart /= beta
+        steinhart += 1.0 / (nominal_c + 273.15)
+        steinhart = 1.0 / steinhart
+        steinhart -= 273.15
+        table.append(steinhart)
+    return tuple(table)
+
+
+class PixelBuffer(object):
+    """Host-side copy of the colors of the 10 NeoPixels on a Circuit Playground
+    board.  Change colors by assigning red, green, blue tuples to buffer[pixel]
+    (or with fill) and then call flush to send only the pixels that changed to
+    the board and show them.  Don't create this yourself, instead use the pixels
+    attribute of a CircuitPlayground instance.
+    """
+
+    # Bytes sent to the board by each of the pixel commands.
+    _SET_BYTES     = 9  # CP_PIXEL_SET
+    _SHOW_BYTES    = 4  # CP_PIXEL_SHOW
+    _SET_ALL_BYTES = 6  # CP_PIXEL_SET_ALL, plus 4 bytes for each pixel.
+
+    def __init__(self, board):
+        self._board = board
+        # Colors as consecutive red, green, blue bytes for each pixel.  Colors
+        # holds the colors to show and sent the colors in the board's pixel
+        # memory (cleared when the board is reset).
+        self._colors = bytearray(3*PIXEL_COUNT)
+        self._sent = bytearray(3*PIXEL_COUNT)
+        # True if the board's pixel memory has changed since the last show.
+        self._show_pending = False
+        # True if an on-board animation changed the pixels, so the colors in
+        # the board's pixel memory aren't known.
+        self._animated = False
+
+    def __len__(self):
+        return PIXEL_COUNT
+
+    def __getitem__(self, pixel):
+        assert 0 <= pixel <= 9, 'pixel must be a value between 0-9!'
+        return tuple(self._colors[pixel*3:pixel*3+3])
+
+    def __setitem__(self, pixel, color):
+        assert 0 <= pixel <= 9, 'pixel must be a value between 0-9!'
+        red, green, blue = color
+        self._colors[pixel*3:pixel*3+3] = bytearray((red & 0xFF, green & 0xFF, blue & 0xFF))
+
+    def fill(self, color):
+        """Set all the pixels to the provided red, green, blue color."""
+        red, green, blue = color
+        self._colors[:] = bytearray((red & 0xFF, green & 0xFF, blue & 0xFF))*PIXEL_COUNT
+
+    def assign(self, colors, start=0):
+        """Set consecutive pixels starting at pixel start from either a sequence
+        of red, green, blue tuples or a bytes-like object with red, green, blue
+        bytes for each pixel (like a NumPy uint8 array of shape (n, 3), which is
+        copied in one go without a loop over the pixels).
+        """
+        assert 0 <= start <= 9, 'start must be a value between 0-9!'
+        try:
+            data = memoryview(colors).tobytes()
+        except TypeError:
+            data = bytearray(value & 0xFF for color in colors for value in color)
+        assert len(data) % 3 == 0 and start + len(data)//3 <= PIXEL_COUNT, 'colors must fit in the 10 pixels!'
+        self._colors[start*3:start*3 + len(data)] = data
+
+    def flush(self):
+        """Send the pixels that changed since they were last sent to the board
+        and show them.  The changed pixels are sent either as individual
+        CP_PIXEL_SET commands or as one CP_PIXEL_SET_ALL command covering the
+        changed pixels, whichever is fewer bytes (or always as CP_PIXEL_SET
+        commands if the firmware is older than EXTENDED_FIRMWARE).  Nothing is
+        sent if no pixel changed.
+        """
+        colors = self._colors
+        if self._animated:
+            self._board.set_pixels([tuple(colors[i*3:i*3+3]) for i in range(PIXEL_COUNT)])
+            self._animated = False
+            return
+        if colors == self._sent:
+            if self._show_pending:
+                self._board.show_pixels()
+            return
+        sent = self._sent
+        dirty = [i for i in range(PIXEL_COUNT) if colors[i*3:i*3+3] != sent[i*3:i*3+3]]
+        first = dirty[0]
+        last = dirty[-1]
+        # Firmware without CP_PIXEL_SET_ALL only takes individual pixels.
+        if (not self._board.has_extended_commands() or
+                self._SET_BYTES*len(dirty) + self._SHOW_BYTES <= self._SET_ALL_BYTES + 4*(last - first + 1)):
+            for i in dirty:
+                self._board.set_pixel(i, colors[i*3], colors[i*3+1], colors[i*3+2])
+            self._board.show_pixels()
+        else:
+            self._board.set_pixels([tuple(colors[i*3:i*3+3]) for i in range(first, last + 1)],
+                                   show=True, start=first)
+
+    def _update(self, start, colors):
+        """Record colors that were sent to the board's pixel memory starting at
+        pixel start.
+        """
+        for i, (red, green, blue) in enumerate(colors, start):
+            self._colors[i*3:i*3+3] = self._sent[i*3:i*3+3] = bytearray((red & 0xFF, green & 0xFF, blue & 0xFF))
+        self._show_pending = True
+
+    def _clear(self):
+        """Record that the board's pixel memory was cleared."""
+        self._colors[:] = self._sent[:] = bytearray(3*PIXEL_COUNT)
+        self._show_pending = True
+        self._animated = False
+
+    def _animate(self):
+        """Record that an on-board animation is changing the pixels."""
+        self._animated = True
+
+    def _shown(self):
+        """Record that the board's pixel memory was shown."""
+        self._show_pending = False
+
+
+class CallbackDispatcher(object):
+    """Runs the callbacks of a stream on other threads than the one reading
+    the board, so a slow callback doesn't hold up the handling of the frames
+    that follow.  Don't create this yourself, instead use
+    CircuitPlayground.set_dispatch.  Policy is one of:
+      - 'executor' = each call is submitted to a pool of worker threads (no
+        call is lost, but calls can pile up if the callback is too slow)
+      - 'queue' = calls wait in a queue for a worker thread, once maxsize
+        calls are waiting the oldest one is dropped
+      - 'latest' = only the newest call of each callback waits for the worker
+        thread, calls that are replaced before they ran are coalesced
+    """
+
+    def __init__(self, name, policy, maxsize=DISPATCH_QUEUE_SIZE, workers=1):
+        assert policy in DISPATCH_POLICIES and policy != 'inline', "Policy must be 'executor', 'queue' or 'latest'!"
+        assert maxsize > 0, 'Maxsize must be at least 1!'
+        self.name = name
+        self.policy = policy
+        self.dispatched = 0  # Calls handed to the dispatcher.
+        self.dropped = 0     # Calls dropped from a full queue.
+        self.coalesced = 0   # Calls replaced by a newer call before they ran.
+        self._executor = None
+        self._thread = None
+        self._closed = False
+        if policy == 'executor':
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+        elif policy == 'queue':
+            self._pending = deque(maxlen=maxsize)
+        else:
+            # Newest call of each wrapped callback, oldest first.
+            self._pending = OrderedDict()
+        self._changed = threading.Condition()
+        self._slots = 0
+        self._waiting = 0  # Calls submitted to the executor that didn't start yet.
+
+    def wrap(self, callback):
+        """Return a function that dispatches calls to callback."""
+        if self.policy == 'latest':
+            # Each wrapped callback (like the callback of each cap input) keeps
+            # its own newest call.
+            self._slots += 1
+            return functools.partial(self._submit_latest, self._slots, callback)
+        if self.policy == 'queue':
+            return functools.partial(self._submit_queue, callback)
+        return functools.partial(self._submit_executor, callback)
+
+    def _submit_executor(self, callback, *values):
+        with self._changed:
+            self.dispatched += 1
+            if self._closed:
+                return
+            self._waiting += 1
+        self._executor.submit(self._run_submitted, callback, values)
+
+    def _run_submitted(self, callback, values):
+        with self._changed:
+            self._waiting -= 1
+        self._run(callback, values)
+
+    def _submit_queue(self, callback, *values):
+        with self._changed:
+            self.dispatched += 1
+            if len(self._pending) == self._pending.maxlen:
+                self.dropped += 1
+            self._pending.append((callback, values))
+            self._wake()
+
+    def _submit_latest(self, slot, callback, *values):
+        with self._changed:
+            self.dispatched += 1
+            if slot in self._pending:
+                self.coalesced += 1
+            self._pending[slot] = (callback, values)
+            self._wake()
+
+    def _wake(self):
+        """Start the worker thread or tell it a call is waiting.  Must be called
+        with the changed condition held.
+        """
+        if self._closed:
+            self._pending.clear()
+            return
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._work)
+            self._thread.daemon = True
+            self._thread.start()
+        self._changed.notify()
+
+    def _work(self):
+        """Worker thread that runs the waiting calls in order."""
+        while True:
+            with self._changed:
+                while not self._pending and not self._closed:
+                    self._changed.wait()
+                if self._closed:
+                    return
+                if self.policy == 'queue':
+                    callback, values = self._pending.popleft()
+                else:
+                    callback, values = self._pending.popitem(last=False)[1]
+            self._run(callback, values)
+
+    def _run(self, callback, values):
+        try:
+            callback(*values)
+        except Exception:
+            logger.exception('Error in {0} callback!'.format(self.name))
+
+    def stats(self):
+        """Return a dict with the policy, the dispatched, dropped and coalesced
+        call counts and the calls still waiting.
+        """
+        pending = self._waiting if self._executor is not None else len(self._pending)
+        return {'policy': self.policy, 'dispatched': self.dispatched, 'dropped': self.dropped,
+                'coalesced': self.coalesced, 'pending': pending}
+
+    def close(self):
+        """Stop the worker threads, calls still waiting are discarded."""
+        with self._changed:
+            self._closed = True
+            if self._executor is None:
+                self._pending.clear()
+                self._changed.notify_all()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+
 
 class CircuitPlayground(PyMata):
 
-    def __init__(self, port_id='/dev/ttyACM0', bluetooth=True, verbose=True):
+    def __init__(self, port_id='/dev/ttyACM0', bluetooth=True, verbose=True, fast_connect=False,
+                 baud_rate=57600):
+        """Connect to the board on port_id.  By default PyMata connects with its
+        startup delays and pin discovery, then the firmware version is read
+        with a blocking CP_IMPL_VERS request that waits up to READ_TIMEOUT
+        seconds (the version is None if the board doesn't answer).  Set
+        fast_connect to True to skip PyMata's delays, see _fast_connect.  The
+        version decides whether the commands added after the original command
+        set can be used (see has_extended_commands).
+        """
+        # Setup the helper state first so replies that arrive while PyMata is
+        # still starting up can be handled.
+        self._init_state()
+        if fast_connect:
+            # Skip PyMata's startup delays and discovery, see _fast_connect.
+            self._fast_connect(port_id, verbose, baud_rate)
+            return
         # PyMata is an old style class so you can't use super.
-        PyMata.__init__(self, port_id, bluetooth, verbose)
+        PyMata.__init__(self, port_id, bluetooth, verbose, baud_rate)
         # Setup handler for response data.
         # Note that the data length (1) appears to be unused for these sysex
         # responses.
         self._command_handler.command_dispatch.update({CP_COMMAND: [self._response_handler, 1]})
-        # Setup configured callbacks to null.
+        # Read the firmware version to know which commands the board answers.
+        try:
+            self._set_firmware_version(self.read_implementation_version_sync())
+        except concurrent.futures.TimeoutError:
+            pass
+
+    def _init_state(self):
+        """Initialize the Circuit Playground specific state of the board (the
+        configured callbacks and the reply decoders).
+        """
+        # Setup configured stream callbacks to null.
         self._accel_callback = None
+        self._accel_batch_callback = None
         self._tap_callback = None
         self._temp_callback = None
-        self._cap_callback = None
-        self._sensecolor_callback = None
-        self._implemenation_version_callback = None
-        
+        self._audio_callback = None
+        self._sound_level_callback = None
+        # Samples array and number of samples received of the running
+        # capture_audio call.
+        self._audio_capture = None
+        # True after microphone frames were stopped, frames still on their way
+        # must be flushed before a capture starts.
+        self._audio_flush = False
+        self._cap_callbacks = {}  # Cap touch callbacks keyed by input pin.
+        self._cap_heartbeat_callbacks = {}  # Cap touch heartbeat callbacks keyed by input pin.
+        # Names of the responses dropped because NumPy isn't installed, so the
+        # warning is only logged once for each.
+        self._numpy_missing = set()
+        # Callback dispatchers of the streams that don't run their callbacks
+        # inline, keyed by stream name (see set_dispatch).
+        self._dispatchers = {}
+        # Touch detection threshold and hysteresis tuples configured on the
+        # board, and the last touch state the board sent, keyed by input pin.
+        self._cap_config = {}
+        self._cap_touched = {}
+        # Table of outstanding read requests.  Each reply key (the reply opcode,
+        # or opcode and input pin for cap touch reads) has a FIFO of future and
+        # deadline tuples, the board answers requests in order so each reply
+        # resolves the oldest request still waiting.
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        # Requests that time out are failed by a reaper thread, which only runs
+        # while requests with a timeout are pending.
+        self._pending_changed = threading.Condition(self._pending_lock)
+        self._reaper = None
+        # Commands are written a byte at a time, so make sure commands sent by
+        # different threads don't interleave.
+        self._send_lock = threading.RLock()
+        # Capture writer that records every message sent and received (see
+        # start_capture).
+        self._capture = None
+        # Implementation version of the board firmware, read when connecting
+        # (None if the board didn't answer), and True if it's older than the
+        # EXTENDED_FIRMWARE version of its sketch.
+        self.firmware_version = None
+        self._old_firmware = False
+        # Newest decoded values of each reply type as a LatestValue of the
+        # values tuple (like the callback parameters) and receive time, or
+        # None until a value was received.  They're updated by every reply,
+        # streamed or read, so they can be polled as often as needed without
+        # sending anything to the board or blocking.
+        self.accel_latest = None        # X, Y, Z acceleration.
+        self.tap_latest = None          # Single and double tap booleans.
+        self.cap_latest = {}            # Input pin, touched, raw value keyed by input pin.
+        self.color_latest = None        # Red, green, blue color sense.
+        self.temperature_latest = None  # Temperature in Celsius and raw ADC value.
+        self.sound_level_latest = None  # RMS and peak sound level.
+        # Host-side copy of the NeoPixel colors.
+        self.pixels = PixelBuffer(self)
+        # Thermistor ADC value to temperature table.
+        self.set_thermistor()
+        # Registry of reply decoders keyed by reply opcode.  Each entry holds
+        # the minimum response length, the struct describing the decoded
+        # payload, the handler that receives the unpacked values and a name
+        # used in warnings.  Each payload byte is sent as two 7-bit bytes after
+        # the two bytes of reply opcode.
+        self._reply_decoders = {}
+        for command, layout, handler, name in (
+                (CP_ACCEL_READ_REPLY, _ACCEL_REPLY,      self._accel_reply,      'accelerometer'),
+                (CP_ACCEL_TAP_REPLY,  _TAP_REPLY,        self._tap_reply,        'tap'),
+                (CP_CAP_REPLY,        _CAP_REPLY,        self._cap_reply,        'cap touch'),
+                (CP_CAP_SCAN_REPLY,   _CAP_SCAN_REPLY,   self._cap_scan_reply,   'cap scan'),
+                (CP_CAP_EVENT_REPLY,  _CAP_EVENT_REPLY,  self._cap_event_reply,  'cap touch event'),
+                (CP_SENSECOLOR_REPLY, _SENSECOLOR_REPLY, self._sensecolor_reply, 'color sense'),
+                (CP_IMPL_VERS_REPLY,  _IMPL_VERS_REPLY,  self._impl_vers_reply,  'implementation version'),
+                (CP_MIC_LEVEL_REPLY,  _MIC_LEVEL_REPLY,  self._mic_level_reply,  'sound level'),
+                (CP_TONE_SEQUENCE_REPLY, _TONE_SEQUENCE_REPLY, self._tone_sequence_reply, 'tone sequence')):
+            self._reply_decoders[command] = (2 + 2*layout.size, layout, handler, name)
+        # Replies sent as plain 7-bit bytes have no layout and their handler is
+        # called with the response data.
+        self._reply_decoders[CP_ACCEL_RAW_REPLY] = (9, None, self._accel_raw_reply, 'raw accelerometer')
+        self._reply_decoders[CP_ACCEL_BATCH_REPLY] = (10, None, self._accel_batch_reply, 'accelerometer batch')
+        self._reply_decoders[CP_MIC_SAMPLES_REPLY] = (9, None, self._mic_samples_reply, 'microphone samples')
+
+    def _init_pymata(self, transport):
+        """Initialize the PyMata state of the board for a transport whose
+        received data is handled elsewhere (like by a BoardFarm), without
+        starting PyMata's threads or discovering the board.  PyMata keeps its
+        receive queue, data lock and command handler tables on the class, so
+        each board gets its own copies to allow many boards in one process.
+        """
+        self.transport = transport
+        self.verbose = False
+        self.command_deque = deque()
+        self.data_lock = threading.RLock()
+        self.digital_output_port_pins = [0x00]*16
+        handler = PyMataCommandHandler(self)
+        for name in ('analog_response_table', 'digital_response_table', 'analog_latch_table',
+                     'digital_latch_table', 'firmata_version', 'firmata_firmware'):
+            setattr(handler, name, [])
+        handler.i2c_map = {}
+        handler.active_sonar_map = {}
+        # Same handlers PyMata's command handler thread installs when it runs.
+        handler.command_dispatch = {
+            handler.REPORT_VERSION:          [handler.report_version, 2],
+            handler.REPORT_FIRMWARE:         [handler.report_firmware, 1],
+            handler.ANALOG_MESSAGE:          [handler.analog_message, 2],
+            handler.DIGITAL_MESSAGE:         [handler.digital_message, 2],
+            handler.ENCODER_DATA:            [handler.encoder_data, 3],
+            handler.SONAR_DATA:              [handler.sonar_data, 3],
+            handler.STRING_DATA:             [handler._string_data, 2],
+            handler.I2C_REPLY:               [handler.i2c_reply, 2],
+            handler.CAPABILITY_RESPONSE:     [handler.capability_response, 2],
+            handler.PIN_STATE_RESPONSE:      [handler.pin_state_response, 2],
+            handler.ANALOG_MAPPING_RESPONSE: [handler.analog_mapping_response, 2],
+            handler.STEPPER_DATA:            [handler.stepper_version_response, 2],
+            CP_COMMAND:                      [self._response_handler, 1]
+        }
+        # Constants PyMata.__init__ copies from the command handler.
+        for name in ('LATCH_IGNORE', 'LATCH_ARMED', 'LATCH_LATCHED', 'DIGITAL_LATCH_HIGH',
+                     'DIGITAL_LATCH_LOW', 'ANALOG_LATCH_GT', 'ANALOG_LATCH_LT',
+                     'ANALOG_LATCH_GTE', 'ANALOG_LATCH_LTE'):
+            setattr(self, name, getattr(handler, name))
+        self.LATCH_PIN = 0
+        self.LATCH_STATE = 1
+        self.LATCHED_DATA = 2
+        self.LATCHED_TIME_STAMP = 3
+        self._command_handler = handler
+
+    def _fast_connect(self, port_id, verbose, baud_rate):
+        """Connect to the board without PyMata's fixed startup delays.  The
+        board is found with a CP_IMPL_VERS request, which is answered as soon as
+        it's running, and its pins are set up from the pin map of its firmware
+        version.  Only if the version has no known pin map are the pins
+        discovered like PyMata does (and the map is saved for next time).
+        """
+        self._init_pymata(None)
+        self.verbose = verbose
+        # The serial port is opened by the transport constructor.
+        self.transport = PyMataSerial(port_id, self.command_deque, baud_rate)
+        self.transport.start()
+        self._command_handler.start()
+        self._command_handler.system_reset()
+        try:
+            self._handshake(port_id)
+        except RuntimeError:
+            self.disconnect()
+            raise
+
+    def _handshake(self, port_id):
+        """Wait for the board to answer a version request and setup its pins
+        from the pin map of its firmware version, or discover them if the
+        version has no known pin map.  The board should be reset first.
+        """
+        verbose = self.verbose
+        # Keep asking for the version until the board answers, it might still
+        # be starting up.
+        start = time.time()
+        while self.firmware_version is None and time.time() - start < CONNECT_TIMEOUT:
+            try:
+                self._set_firmware_version(self.read_implementation_version_sync(timeout=0.25))
+            except concurrent.futures.TimeoutError:
+                pass
+        if verbose:
+            print('Board firmware version: {0}'.format(self.firmware_version))
+        pin_map = self._load_pin_map(self.firmware_version)
+        if pin_map is not None:
+            self._apply_pin_map(pin_map)
+            return
+        if not self._command_handler.auto_discover_board(verbose):
+            raise RuntimeError('Board on {0} did not respond!'.format(port_id))
+        self._save_pin_map(self.firmware_version, self._command_handler.analog_mapping_query_results)
+
+    def _set_firmware_version(self, version):
+        """Record the implementation version the board firmware answered with
+        and whether it's too old for the EXTENDED_COMMANDS.
+        """
+        self.firmware_version = version
+        required = EXTENDED_FIRMWARE.get(version[0])
+        self._old_firmware = required is not None and tuple(version) < required
+        if self._old_firmware:
+            logger.warning('Board firmware {0} is older than {1}, only the original commands are supported!'.format(
+                '.'.join(map(str, version)), '.'.join(map(str, required))))
+
+    def has_extended_commands(self):
+        """Return True if the board firmware answers the commands added after
+        the original command set (see EXTENDED_COMMANDS), like pixel animations,
+        tone sequences, cap scans and microphone streams.  Using one of them
+        with older firmware raises a RuntimeError.  Boards that didn't report
+        their version are assumed to be up to date.
+        """
+        return not self._old_firmware
+
+    def _load_pin_map(self, version):
+        """Return the known pin map of a firmware version, or None."""
+        if version is None:
+            return None
+        if version in PIN_MAPS:
+            return PIN_MAPS[version]
+        try:
+            with open(PIN_MAP_CACHE) as cache:
+                return json.load(cache).get('.'.join(map(str, version)))
+        except (IOError, ValueError):
+            return None
+
+    def _save_pin_map(self, version, pin_map):
+        """Save the discovered pin map of a firmware version in the cache."""
+        if version is None:
+            return
+        try:
+            with open(PIN_MAP_CACHE) as cache:
+                pin_maps = json.load(cache)
+        except (IOError, ValueError):
+            pin_maps = {}
+        pin_maps['.'.join(map(str, version))] = list(pin_map)
+        try:
+            with open(PIN_MAP_CACHE, 'w') as cache:
+                json.dump(pin_maps, cache)
+        except IOError:
+            logger.warning('Unable to save pin map to {0}!'.format(PIN_MAP_CACHE))
+
+    def _apply_pin_map(self, pin_map):
+        """Setup the command handler pin tables from an analog mapping, like
+        the PyMata board discovery does with the mapping it queries.
+        """
+        handler = self._command_handler
+        with self.data_lock:
+            handler.analog_mapping_query_results = list(pin_map)
+            handler.total_pins_discovered = len(pin_map)
+            handler.number_of_analog_pins_discovered = len([pin for pin in pin_map if pin != self.IGNORE])
+            del handler.digital_response_table[:]
+            del handler.analog_response_table[:]
+            del handler.digital_latch_table[:]
+            del handler.analog_latch_table[:]
+            for pin in range(handler.total_pins_discovered):
+                handler.digital_response_table.append([self.INPUT, 0, None])
+                handler.digital_latch_table.append([0, 0, 0, 0, None])
+            for pin in range(handler.number_of_analog_pins_discovered):
+                handler.analog_response_table.append([self.INPUT, 0, None])
+                handler.analog_latch_table.append([0, 0, 0, 0, 0, None])
+
+    def set_thermistor(self, series_ohms=THERM_SERIES_OHMS, nominal_ohms=THERM_NOMINAL_OHMS,
+                       nominal_c=THERM_NOMIMAL_C, beta=THERM_BETA):
+        """Set the constants used to convert thermistor ADC values to
+        temperatures, by default the values of the Circuit Playground
+        thermistor.  Change them if your board uses a different thermistor or
+        series resistor:
+          - series_ohms = resistor value in series with the thermistor
+          - nominal_ohms = thermistor resistance at the nominal temperature
+          - nominal_c = nominal temperature in degrees Celsius
+          - beta = thermistor beta coefficient
+        The temperature of every possible ADC value is computed once here, so
+        converting values later is just a table lookup.
+        """
+        assert series_ohms > 0 and nominal_ohms > 0 and beta > 0, 'Thermistor constants must be positive!'
+        self._therm_table = _therm_table(float(series_ohms), float(nominal_ohms), float(nominal_c), float(beta))
+        self._therm_array = None
+
     def _therm_value_to_temp(self, adc_value):
         """Convert a thermistor ADC value to a temperature in Celsius."""
-        # Use Steinhart-Hart thermistor equation to convert thermistor resistance to
-        # temperature.  See: https://learn.adafruit.com/thermistor/overview
-        # Handle a zero value which has no meaning (and would cause a divide by zero).
-        if adc_value == 0:
-            return float('NaN')
-        # First calculate the resistance of the thermistor based on its ADC value.
-        resistance = ((1023.0 * THERM_SERIES_OHMS)/adc_value)
-        resistance -= THERM_SERIES_OHMS
-        # Now apply Steinhart-Hart equation.
-        steinhart = resistance / THERM_NOMINAL_OHMS
-        steinhart = math.log(steinhart)
-        steinhart /= THERM_BETA
-        steinhart += 1.0 / (THERM_NOMIMAL_C + 273.15)
-        steinhart = 1.0 / steinhart
-        steinhart -= 273.15
-        return steinhart
+        return self._therm_table[adc_value & 0x3FF]
+
+    def adc_to_celsius(self, values):
+        """Convert an array (or any sequence) of raw thermistor ADC values, like
+        logged read_temperature_raw results, to a NumPy array of temperatures
+        in degrees Celsius using this board's thermistor constants (see
+        set_thermistor).  Values of 0 and 1023 have no meaning and convert to
+        NaN.  This requires NumPy to be installed.
+        """
+        if np is None:
+            raise RuntimeError('adc_to_celsius requires NumPy to be installed!')
+        if self._therm_array is None:
+            self._therm_array = np.array(self._therm_table)
+        return self._therm_array[np.asarray(values, dtype=np.intp) & 0x3FF]
 
     def _therm_handler(self, data):
         """Callback invoked when the thermistor analog input has a new value.
         """
-        # Get the raw ADC value and convert to temperature.
+        # Get the raw ADC value and look up its temperature.
         raw = data[2]
-        temp_c = self._therm_value_to_temp(raw)
+        temp_c = self._therm_table[raw & 0x3FF]
+        self.temperature_latest = LatestValue((temp_c, raw), time.time())
         # Call any user callback
         if self._temp_callback is not None:
             self._temp_callback(temp_c, raw)
 
-    def _parse_firmata_byte(self, data):
-        """Parse a byte value from two 7-bit byte firmata response bytes."""
-        if len(data) != 2:
-            raise ValueError('Expected 2 bytes of firmata repsonse for a byte value!')
-        return (data[0] & 0x7F) | ((data[1] & 0x01) << 7)
-
-    def _parse_firmata_float(self, data):
-        """Parse a 4 byte floating point value from a 7-bit byte firmata response
-        byte array.  Each pair of firmata 7-bit response bytes represents a single
-        byte of float data so there should be 8 firmata response bytes total.
-        """
-        if len(data) != 8:
-            raise ValueError('Expected 8 bytes of firmata response for floating point value!')
-        # Convert 2 7-bit bytes in little endian format to 1 8-bit byte for each
-        # of the four floating point bytes.
-        raw_bytes = bytearray(4)
-        for i in range(4):
-            raw_bytes[i] = self._parse_firmata_byte(data[i*2:i*2+2])
-        # Use struct unpack to convert to floating point value.
-        return struct.unpack('<f', raw_bytes)[0]
-
-    def _parse_firmata_long(self, data):
-        """Parse a 4 byte signed long integer value from a 7-bit byte firmata response
-        byte array.  Each pair of firmata 7-bit response bytes represents a single
-        byte of long data so there should be 8 firmata response bytes total.
-        """
-        if len(data) != 8:
-            raise ValueError('Expected 8 bytes of firmata response for long value!')
-        # Convert 2 7-bit bytes in little endian format to 1 8-bit byte for each
-        # of the four floating point bytes.
-        raw_bytes = bytearray(4)
-        for i in range(4):
-            raw_bytes[i] = self._parse_firmata_byte(data[i*2:i*2+2])
-        # Use struct unpack to convert to floating point value.
-        return struct.unpack('<l', raw_bytes)[0]
-
-    def _tap_register_to_clicks(self, register):
-        """Convert accelerometer tap register value to booleans that indicate
-        if a single and/or double tap have been detected.  Returns a tuple
-        of bools with single click boolean and double click boolean.
-        """
-        single = False
-        double = False
-        # Check if there is a good tap register value and check the single and
-        # double tap bits to set the appropriate bools.
-        if register & 0x30 > 0:
-            single = True if register & 0x10 > 0 else False
-            double = True if register & 0x20 > 0 else False
-        return (single, double)
-
     def _response_handler(self, data):
         """Callback invoked when a circuit playground sysex command is received.
         """
-        logger.debug('CP response: 0x{0}'.format(hexlify(bytearray(data))))
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug('CP response: 0x{0}'.format(hexlify(bytearray(data))))
         if len(data) < 1:
             logger.warning('Received response with no data!')
             return
-        # Check what type of response has been received.
-        command = data[0] & 0x7F
-        if command == CP_ACCEL_READ_REPLY:
-            # Parse accelerometer response.
-            if len(data) < 26:
-                logger.warning('Received accelerometer response with not enough data!')
-                return
-            x = self._parse_firmata_float(data[2:10])
-            y = self._parse_firmata_float(data[10:18])
-            z = self._parse_firmata_float(data[18:26])
-            if self._accel_callback is not None:
-                self._accel_callback(x, y ,z)
-        elif command == CP_ACCEL_TAP_REPLY:
-            # Parse accelerometer tap response.
-            if len(data) < 4:
-                logger.warning('Received tap response with not enough data!')
-                return
-            tap = self._parse_firmata_byte(data[2:4])
-            if self._tap_callback is not None:
-                self._tap_callback(*self._tap_register_to_clicks(tap))
-        elif command == CP_CAP_REPLY:
-            # Parse capacitive sensor response.
-            if len(data) < 12:
-                logger.warning('Received cap touch response with not enough data!')
-                return
-            input_pin = self._parse_firmata_byte(data[2:4])
-            value = self._parse_firmata_long(data[4:12])
-            if self._cap_callback is not None:
-                self._cap_callback(input_pin, value > CAP_THRESHOLD, value)
-        elif command == CP_SENSECOLOR_REPLY:
-            # Parse sense color response.
-            if len(data) < 8:
-                logger.warning('Received color sense response with not enough data!')
-                return
-            # Parse out the red, green, blue color bytes.
-            red = self._parse_firmata_byte(data[2:4])
-            green = self._parse_firmata_byte(data[4:6])
-            blue = self._parse_firmata_byte(data[6:8])
-            if self._sensecolor_callback is not None:
-                self._sensecolor_callback(red, green, blue)
-        elif command == CP_IMPL_VERS_REPLY:
-            # Parse implemenation version response.
-            if len(data) < 8:
-                logger.warning('Received color sense response with not enough data!')
-                return
-            # Parse out the maj, min, and fix
-            major = self._parse_firmata_byte(data[2:4])
-            minor = self._parse_firmata_byte(data[4:6])
-            bugfix = self._parse_firmata_byte(data[6:8])
-            if self._implemenation_version_callback is not None:
-                self._implemenation_version_callback(major, minor, bugfix)
-        else:
+        # Look up the decoder for the type of response that has been received.
+        decoder = self._reply_decoders.get(data[0] & 0x7F)
+        if decoder is None:
             logger.warning('Received unexpected response!')
+            return
+        length, layout, handler, name = decoder
+        if len(data) < length:
+            logger.warning('Received {0} response with not enough data!'.format(name))
+            return
+        if layout is None:
+            handler(data)
+            return
+        # Unpack the payload from its 7-bit firmata byte pairs (which start
+        # after the reply opcode and end at the reply length) in one go: read
+        # the pairs as an integer, move each high bit down next to its low 7
+        # bits and keep the low byte of every pair.  For replies longer than a
+        # few bytes (like accelerometer and cap scan replies) this is faster
+        # than merging the pairs byte by byte into a reusable buffer.
+        pairs = int.from_bytes(bytes(data[2:length]), 'little')
+        pairs = (pairs & _PAIR_LOW_BITS) | ((pairs & _PAIR_HIGH_BITS) >> 1)
+        payload = pairs.to_bytes(length - 2, 'little')[::2]
+        handler(*layout.unpack(payload))
+
+    def _send(self, data):
+        """Send a Circuit Playground command with the provided data bytes."""
+        if self._old_firmware and data[0] in EXTENDED_COMMANDS:
+            version = self.firmware_version
+            raise RuntimeError('{0} requires firmware {1} or newer but the board has {2}, upload the latest sketch!'.format(
+                EXTENDED_COMMANDS[data[0]], '.'.join(map(str, EXTENDED_FIRMWARE[version[0]])),
+                '.'.join(map(str, version))))
+        with self._send_lock:
+            self._command_handler.send_sysex(CP_COMMAND, data)
+
+    def _request(self, key, data, callback=None, timeout=READ_TIMEOUT):
+        """Send a command that the board answers with a reply and return a
+        concurrent.futures.Future that resolves to the tuple of reply values.
+        Key identifies the reply (see _resolve).  If callback is provided it's
+        called with the reply values once the future resolves.  If no reply is
+        received within timeout seconds (None to wait forever) the future fails
+        with a TimeoutError.  Note a reply that arrives after its request timed
+        out resolves the next request waiting for the same key.
+        """
+        future = concurrent.futures.Future()
+        if callback is not None:
+            future.add_done_callback(functools.partial(_call_with_result, callback))
+        deadline = None if timeout is None else time.time() + timeout
+        # Queue the request before sending it so the reply can't beat it, and
+        # hold the send lock so requests are queued in the order they're sent.
+        with self._send_lock:
+            with self._pending_lock:
+                self._pending.setdefault(key, deque()).append((future, deadline))
+                if deadline is not None:
+                    if self._reaper is None:
+                        self._reaper = threading.Thread(target=self._reap_requests)
+                        self._reaper.daemon = True
+                        self._reaper.start()
+                    else:
+                        self._pending_changed.notify()
+            self._send(data)
+        return future
 
-    def read_implementation_version(self, callback):
+    def _reap_requests(self):
+        """Reaper thread that fails requests as they time out and stops once
+        no request with a timeout is pending.
+        """
+        while True:
+            with self._pending_lock:
+                expired = self._expire_requests()
+                if not expired:
+                    deadlines = [deadline for queue in self._pending.values()
+                                 for _, deadline in queue if deadline is not None]
+                    if not deadlines:
+                        self._reaper = None
+                        return
+                    self._pending_changed.wait(min(deadlines) - time.time())
+            self._fail_requests(expired)
+
+    def _expire_requests(self):
+        """Remove cancelled and timed out requests from the pending table and
+        return the timed out futures.  Must be called with the pending lock held.
+        """
+        now = time.time()
+        expired = []
+        for queue in self._pending.values():
+            for entry in [entry for entry in queue if entry[0].cancelled() or
+                          (entry[1] is not None and entry[1] <= now)]:
+                queue.remove(entry)
+                if entry[0].set_running_or_notify_cancel():
+                    expired.append(entry[0])
+        return expired
+
+    def _fail_requests(self, futures, exception_type=concurrent.futures.TimeoutError):
+        """Fail the provided running request futures."""
+        for future in futures:
+            future.set_exception(exception_type('No reply received from the board!'))
+
+    def _resolve(self, key, values):
+        """Resolve the oldest pending request for the reply key with the tuple
+        of reply values.  Requests that timed out or were cancelled while they
+        waited are skipped.
+        """
+        # Skip the lock when nothing is waiting, like for streamed replies.
+        if not self._pending.get(key):
+            return
+        now = time.time()
+        expired = []
+        future = None
+        with self._pending_lock:
+            queue = self._pending[key]
+            while queue:
+                entry, deadline = queue.popleft()
+                if not entry.set_running_or_notify_cancel():
+                    continue
+                if deadline is not None and deadline <= now:
+                    expired.append(entry)
+                    continue
+                future = entry
+                break
+        self._fail_requests(expired)
+        if future is not None:
+            future.set_result(values)
+
+    def _cancel_requests(self):
+        """Fail every pending request, for example when disconnecting."""
+        with self._pending_lock:
+            futures = [entry[0] for queue in self._pending.values() for entry in queue
+                       if entry[0].set_running_or_notify_cancel()]
+            self._pending.clear()
+        self._fail_requests(futures, concurrent.futures.CancelledError)
+
+    def _accel_reply(self, x, y, z):
+        """Handle a decoded accelerometer response."""
+        self.accel_latest = LatestValue((x, y, z), time.time())
+        self._resolve(CP_ACCEL_READ_REPLY, (x, y, z))
+        if self._accel_callback is not None:
+            self._accel_callback(x, y, z)
+
+    def _require_numpy(self, name):
+        """Return True if NumPy is installed, otherwise log a warning (once for
+        each response name) that the response is dropped and return False.
+        Streams can still be running on the board after a reconnect even
+        though nothing started them here.
+        """
+        if np is not None:
+            return True
+        if name not in self._numpy_missing:
+            self._numpy_missing.add(name)
+            logger.warning('Ignoring {0} responses, decoding them requires NumPy to be installed!'.format(name))
+        return False
+
+    def _accel_raw_reply(self, data):
+        """Handle a raw accelerometer response by scaling the counts to
+        meters/second^2 with the range reported by the board.
+        """
+        scale = ACCEL_RAW_SCALE[data[2] & 0x03]
+        values = []
+        for i in (3, 5, 7):
+            count = data[i] | (data[i+1] << 7)
+            if count & 0x2000:
+                count -= 0x4000
+            values.append(count*scale)
+        values = tuple(values)
+        self.accel_latest = LatestValue(values, time.time())
+        # A raw sample answers a pending accelerometer read just as well.
+        self._resolve(CP_ACCEL_READ_REPLY, values)
+        if self._accel_callback is not None:
+            self._accel_callback(*values)
+
+    def _accel_batch_reply(self, data):
+        """Handle a batch of raw accelerometer samples by converting them all
+        at once to a NumPy array of meters/second^2 values.
+        """
+        if not self._require_numpy('accelerometer batch'):
+            return
+        count = data[3]
+        if len(data) < 10 + 6*count:
+            logger.warning('Received accelerometer batch response with not enough data!')
+            return
+        timestamp_ms = data[4] | (data[5] << 7) | (data[6] << 14) | (data[7] << 21)
+        period_ms = data[8] | (data[9] << 7)
+        # Combine the 7-bit byte pairs into 14-bit values, then sign extend the
+        # 12-bit counts by shifting them to the top of an int16 and back.
+        pairs = np.array(data[10:10 + 6*count], dtype=np.int16).reshape(count, 3, 2)
+        counts = ((pairs[:, :, 0] | (pairs[:, :, 1] << 7)) << 2) >> 2
+        samples = counts.astype(np.float32)*np.float32(ACCEL_RAW_SCALE[data[2] & 0x03])
+        if count > 0:
+            self.accel_latest = LatestValue(tuple(samples[-1].tolist()), time.time())
+        if self._accel_batch_callback is not None:
+            self._accel_batch_callback(samples, timestamp_ms, period_ms)
+
+    def _tap_reply(self, tap):
+        """Handle a decoded accelerometer tap response."""
+        clicks = _TAP_CLICKS[tap]
+        self.tap_latest = LatestValue(clicks, time.time())
+        self._resolve(CP_ACCEL_TAP_REPLY, clicks)
+        if self._tap_callback is not None:
+            self._tap_callback(*clicks)
+
+    def _cap_is_touched(self, input_pin, value):
+        """Return True if a cap touch value of the input counts as touched, with
+        the threshold and hysteresis configured for the input (see
+        start_cap_touch) or else CAP_THRESHOLD.
+        """
+        config = self._cap_config.get(input_pin)
+        if config is None:
+            return value > CAP_THRESHOLD
+        # Match the board's touch detection, a touched input stays touched
+        # until it drops below the threshold minus the hysteresis.
+        threshold, hysteresis = config
+        return value > threshold or (self._cap_touched.get(input_pin, False) and
+                                     value >= threshold - hysteresis)
+
+    def _cap_reply(self, input_pin, value):
+        """Handle a decoded capacitive sensor response."""
+        touched = self._cap_is_touched(input_pin, value)
+        self.cap_latest[input_pin] = LatestValue((input_pin, touched, value), time.time())
+        self._resolve((CP_CAP_REPLY, input_pin), (input_pin, touched, value))
+        # With touch detection on the board the streamed values are only
+        # heartbeats, they don't go to the touch and release callback.
+        if input_pin in self._cap_config:
+            callback = self._cap_heartbeat_callbacks.get(input_pin)
+        else:
+            callback = self._cap_callbacks.get(input_pin)
+        if callback is not None:
+            callback(input_pin, touched, value)
+
+    def _cap_event_reply(self, input_pin, touched, value):
+        """Handle a decoded capacitive touch or release event."""
+        touched = touched != 0
+        self._cap_touched[input_pin] = touched
+        self.cap_latest[input_pin] = LatestValue((input_pin, touched, value), time.time())
+        callback = self._cap_callbacks.get(input_pin)
+        if callback is not None:
+            callback(input_pin, touched, value)
+
+    def _cap_scan_reply(self, *values):
+        """Handle a decoded capacitive scan response."""
+        touched = tuple(self._cap_is_touched(pin, value) for pin, value in zip(CAP_INPUTS, values))
+        now = time.time()
+        for pin, pin_touched, value in zip(CAP_INPUTS, touched, values):
+            self.cap_latest[pin] = LatestValue((pin, pin_touched, value), now)
+        self._resolve(CP_CAP_SCAN_REPLY, (touched, values))
+
+    def _sensecolor_reply(self, red, green, blue):
+        """Handle a decoded sense color response."""
+        self.color_latest = LatestValue((red, green, blue), time.time())
+        self._resolve(CP_SENSECOLOR_REPLY, (red, green, blue))
+
+    def _impl_vers_reply(self, major, minor, bugfix):
+        """Handle a decoded implementation version response."""
+        self._resolve(CP_IMPL_VERS_REPLY, (major, minor, bugfix))
+
+    def _mic_samples_reply(self, data):
+        """Handle a frame of raw microphone samples by converting them to a
+        NumPy array and adding them to a running capture.
+        """
+        if not self._require_numpy('microphone samples'):
+            return
+        count = data[6]
+        if len(data) < 9 + 2*count:
+            logger.warning('Received microphone samples response with not enough data!')
+            return
+        timestamp_us = data[2] | (data[3] << 7) | (data[4] << 14) | (data[5] << 21)
+        period_us = data[7] | (data[8] << 7)
+        # Combine the 7-bit byte pairs into the 10-bit samples.
+        pairs = np.array(data[9:9 + 2*count], dtype=np.int16).reshape(count, 2)
+        samples = pairs[:, 0] | (pairs[:, 1] << 7)
+        capture = self._audio_capture
+        if capture is not None:
+            buf, filled = capture
+            count = min(count, len(buf) - filled)
+            buf[filled:filled + count] = samples[:count]
+            capture[1] = filled + count
+            if capture[1] == len(buf):
+                self._resolve(CP_MIC_SAMPLES_REPLY, (buf,))
+        if self._audio_callback is not None:
+            self._audio_callback(samples, timestamp_us, period_us)
+
+    def _mic_level_reply(self, rms, peak):
+        """Handle a decoded sound level response."""
+        self.sound_level_latest = LatestValue((rms, peak), time.time())
+        if self._sound_level_callback is not None:
+            self._sound_level_callback(rms, peak)
+
+    def _tone_sequence_reply(self, completed, played):
+        """Handle a decoded tone sequence response."""
+        self._resolve(CP_TONE_SEQUENCE_REPLY, (bool(completed), played))
+
+    def disconnect(self):
+        """Reset the board and close the serial connection.  Unlike close this
+        doesn't exit the program, so it can be used when other boards or work
+        keep running.  Pending read requests fail with a CancelledError.
+        """
+        self._cancel_requests()
+        for dispatcher in self._dispatchers.values():
+            dispatcher.close()
+        self._command_handler.system_reset()
+        self._command_handler.stop()
+        self.transport.stop()
+        self.transport.close()
+
+    def set_dispatch(self, stream, policy='inline', maxsize=DISPATCH_QUEUE_SIZE, workers=1):
+        """Choose how the callbacks of a stream are called.  By default they're
+        called inline on the thread that handles the data received from the
+        board, so a slow callback (printing, writing files) delays the handling
+        of everything received after it.  Stream is one of 'accel',
+        'accel_batch', 'tap', 'temperature', 'cap', 'audio' or 'sound_level'
+        and policy one of:
+          - 'inline' = call the callback right away (the default)
+          - 'executor' = call it on a pool of worker threads, no call is lost
+          - 'queue' = call it on a worker thread, at most maxsize calls wait and
+            the oldest is dropped when the queue is full
+          - 'latest' = call it on a worker thread with only the newest values,
+            values that arrive before the callback got to them are coalesced
+        This applies to the callbacks of later start_* calls, so call it before
+        starting the stream.  See dispatch_stats for the dropped and coalesced
+        counts.
+        """
+        assert stream in DISPATCH_STREAMS, 'Stream must be one of {0}!'.format(', '.join(DISPATCH_STREAMS))
+        assert policy in DISPATCH_POLICIES, 'Policy must be one of {0}!'.format(', '.join(DISPATCH_POLICIES))
+        dispatcher = self._dispatchers.pop(stream, None)
+        if dispatcher is not None:
+            dispatcher.close()
+        if policy != 'inline':
+            self._dispatchers[stream] = CallbackDispatcher(stream, policy, maxsize, workers)
+
+    def dispatch_stats(self):
+        """Return a dict of the statistics of each stream that isn't dispatched
+        inline, keyed by stream name.  Each value is a dict with the policy,
+        the calls dispatched, dropped (by a full queue) and coalesced (replaced
+        by newer values) and the calls still waiting to run.  Growing dropped
+        or coalesced counts mean the callback can't keep up with the stream.
+        """
+        return dict((stream, dispatcher.stats()) for stream, dispatcher in self._dispatchers.items())
+
+    def _dispatch(self, stream, callback):
+        """Return the function the handler of a stream should call for the
+        provided callback, see set_dispatch.
+        """
+        dispatcher = self._dispatchers.get(stream)
+        if dispatcher is None or callback is None:
+            return callback
+        return dispatcher.wrap(callback)
+
+    def start_capture(self, capture):
+        """Start recording every firmata message sent to and received from the
+        board with its timestamp, both the Circuit Playground sysex frames and
+        PyMata's own messages (like analog reports of the light sensor and
+        thermistor).  Capture should be a capture.CaptureWriter (or any object
+        with the same sent, received and close methods), for example:
+
+          board.start_capture(CaptureWriter('session.cpcap'))
+
+        Replay the captured messages later without a board with
+        capture.ReplayTransport.
+        """
+        self.stop_capture()
+        handler = self._command_handler
+        with self._send_lock:
+            self._capture = capture
+            # Record received messages on their way from the command handler
+            # to the method that handles them, with the same command and data.
+            for command, entry in handler.command_dispatch.items():
+                entry[0] = self._capture_received(capture, command, entry[0])
+            # Record sent messages before the command handler writes them.
+            def send_sysex(sysex_command, sysex_data=None):
+                capture.sent(sysex_command, sysex_data or [])
+                PyMataCommandHandler.send_sysex(handler, sysex_command, sysex_data)
+            def send_command(command):
+                capture.sent(command[0], command[1:])
+                PyMataCommandHandler.send_command(handler, command)
+            def system_reset():
+                capture.sent(handler.SYSTEM_RESET, [])
+                PyMataCommandHandler.system_reset(handler)
+            handler.send_sysex = send_sysex
+            handler.send_command = send_command
+            handler.system_reset = system_reset
+
+    def _capture_received(self, capture, command, method):
+        """Return a wrapper of a command handler dispatch method that records
+        each message in the capture before handling it.
+        """
+        def received(data):
+            capture.received(command, data)
+            method(data)
+        received.captured_method = method
+        return received
+
+    def stop_capture(self):
+        """Stop recording messages and close the capture writer."""
+        handler = self._command_handler
+        with self._send_lock:
+            capture, self._capture = self._capture, None
+            if capture is None:
+                return
+            for entry in handler.command_dispatch.values():
+                entry[0] = getattr(entry[0], 'captured_method', entry[0])
+            # Go back to the command handler's own send methods.
+            del handler.send_sysex
+            del handler.send_command
+            del handler.system_reset
+        capture.close()
+
+    def read_implementation_version(self, callback=None, timeout=READ_TIMEOUT):
         """Request the implementation version.  The result will be returned by
         calling the provided callback function and passing it the 3 bytes of data.
+        Returns a concurrent.futures.Future that resolves to a tuple of the same
+        3 values (see read_accel for the timeout).
         """
-        self._implemenation_version_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_IMPL_VERS])
+        return self._request(CP_IMPL_VERS_REPLY, [CP_IMPL_VERS], callback, timeout)
 
 
+    def _pack_pixel(self, red, green, blue):
+        """Pack a red, green, blue color into the 4 7-bit bytes used by the
+        pixel commands.
+        """
+        red &= 0xFF
+        green &= 0xFF
+        blue &= 0xFF
+        b1 = red >> 1
+        b2 = ((red & 0x01) << 6) | (green >> 2)
+        b3 = ((green & 0x03) << 5) | (blue >> 3)
+        b4 = (blue & 0x07) << 4
+        return [b1, b2, b3, b4]
+
     def set_pixel(self, pixel, red, green, blue):
         """Set the specified pixel (0-9) of the Circuit Playground board to the
         provided red, green, blue value.  Each red, green, blue value should be
@@ -279,27 +1328,80 @@ class CircuitPlayground(PyMata):
         """
         assert 0 <= pixel <= 9, 'pixel must be a value between 0-9!'
         # Pack the pixel and RGB values into a string of 7-bit bytes for the command.
-        red &= 0xFF
-        green &= 0xFF
-        blue &= 0xFF
         pixel &= 0x7F
-        b1 = red >> 1
-        b2 = ((red & 0x01) << 6) | (green >> 2)
-        b3 = ((green & 0x03) << 5) | (blue >> 3)
-        b4 = (blue & 0x07) << 4
-        self._command_handler.send_sysex(CP_COMMAND, [CP_PIXEL_SET, pixel, b1, b2, b3, b4])
+        self._send([CP_PIXEL_SET, pixel] + self._pack_pixel(red, green, blue))
+        self.pixels._update(pixel, [(red, green, blue)])
+
+    def set_pixels(self, colors, show=True, start=0):
+        """Set many pixels of the Circuit Playground board with a single
+        command.  Colors should be a sequence of red, green, blue tuples (each
+        value a byte 0-255) that are applied to consecutive pixels starting at
+        pixel start (0-9), for example a list of 10 colors sets every pixel.
+        If show is True (the default) the pixels are shown right away, otherwise
+        call show_pixels() to see the change.  This is much faster than calling
+        set_pixel for each pixel as only one message is sent to the board.  See
+        also the pixels attribute which only sends the pixels that changed.
+        """
+        assert 0 <= start <= 9, 'start must be a value between 0-9!'
+        assert start + len(colors) <= 10, 'colors must fit in the 10 pixels!'
+        data = [CP_PIXEL_SET_ALL, start & 0x7F, 1 if show else 0]
+        for red, green, blue in colors:
+            data.extend(self._pack_pixel(red, green, blue))
+        self._send(data)
+        self.pixels._update(start, colors)
+        if show:
+            self.pixels._shown()
 
     def clear_pixels(self):
         """Clear all the pixels on the Circuit Playground board.  Make sure to
         call show_pixels to push the change out to the pixels!
         """
-        self._command_handler.send_sysex(CP_COMMAND, [CP_PIXEL_CLEAR])
+        self._send([CP_PIXEL_CLEAR])
+        self.pixels._clear()
 
     def show_pixels(self):
         """Send the previously set pixel color data to the 10 pixels on the
         Circuit Playground board.
         """
-        self._command_handler.send_sysex(CP_COMMAND, [CP_PIXEL_SHOW])
+        self._send([CP_PIXEL_SHOW])
+        self.pixels._shown()
+
+    def start_pixel_animation(self, kind, colors=((255, 0, 0), (0, 0, 0)), frequency=1.0, phase=0.1):
+        """Start an animation that the board renders itself 50 times a second,
+        so nothing is sent while it runs and it stays smooth no matter how busy
+        the computer is.  Kind is one of the PIXEL_ANIMATIONS names:
+         - 'breathe': every pixel pulses from the second color up to the first
+           color and back together (use black as the second color to breathe)
+         - 'chase': a pulse of the first color travels over the second color
+         - 'lerp': each pixel follows a sine wave between the two colors, like
+           pixel_animations.py
+         - 'rainbow': the color wheel turns across the pixels (colors are
+           ignored)
+         - 'off': stop animating and leave the pixels at their current colors
+        Colors is a tuple of two red, green, blue colors, frequency is the
+        number of animation cycles per second (0-16.383) and phase is the
+        fraction of a cycle between adjacent pixels (0.1 spreads one cycle over
+        the 10 pixels, negative values go the other way).  The animation runs
+        until another animation is started or any pixel is set or cleared.
+        """
+        assert kind in PIXEL_ANIMATIONS, 'Animation must be one of: {0}'.format(', '.join(sorted(PIXEL_ANIMATIONS)))
+        frequency_mhz = int(round(frequency*1000.0))
+        assert 0 <= frequency_mhz <= 0x3FFF, 'Frequency must be a value 0-16.383!'
+        phase_step = int(round((phase % 1.0)*1000.0)) % 1000
+        color0, color1 = colors
+        data = [CP_PIXEL_ANIM, PIXEL_ANIMATIONS[kind], frequency_mhz & 0x7F, frequency_mhz >> 7,
+                phase_step & 0x7F, phase_step >> 7]
+        data.extend(self._pack_pixel(*color0))
+        data.extend(self._pack_pixel(*color1))
+        self._send(data)
+        if kind != 'off':
+            self.pixels._animate()
+
+    def stop_pixel_animation(self):
+        """Stop the running pixel animation, the pixels keep their current
+        colors until they're set again.
+        """
+        self.start_pixel_animation('off')
 
     def set_pixel_brightness(self, brightness):
         """Set the brightness of all the NeoPixels.  Brightness will be a value
@@ -311,7 +1413,7 @@ class CircuitPlayground(PyMata):
         of pixels that are later set.
         """
         assert brightness >= 0 and brightness <= 100, 'Brightness must be a value of 0-100!'
-        self._command_handler.send_sysex(CP_COMMAND, [CP_PIXEL_BRIGHTNESS, brightness & 0x7F])
+        self._send([CP_PIXEL_BRIGHTNESS, brightness & 0x7F])
 
     def tone(self, frequency_hz, duration_ms=0):
         """Play a tone with the specified frequency (in hz) for the specified
@@ -328,50 +1430,143 @@ class CircuitPlayground(PyMata):
         duration_ms &= 0x3FFF
         d1 = duration_ms & 0x7F
         d2 = duration_ms >> 7
-        self._command_handler.send_sysex(CP_COMMAND, [CP_TONE, f1, f2, d1, d2])
+        self._send([CP_TONE, f1, f2, d1, d2])
 
     def no_tone(self):
         """Stop all tone playback on the Circuit Playground board speaker."""
-        self._command_handler.send_sysex(CP_COMMAND, [CP_NO_TONE])
+        self._send([CP_NO_TONE])
+
+    def play_sequence(self, notes, callback=None, timeout=READ_TIMEOUT):
+        """Play a sequence of notes on the Circuit Playground board speaker.
+        Notes is a list of up to 64 frequency (hz, 0 for a rest) and duration
+        (milliseconds, 1-16,383) tuples, for example:
+
+          board.play_sequence([(262, 250), (0, 50), (330, 250), (392, 500)])
+
+        The whole sequence is sent up front in one or a few messages and the
+        board times the notes itself, so they play back to back without the
+        gaps and jitter of calling tone from Python.  Playing a sequence, tone,
+        no_tone or a board reset stops a sequence that's already playing.  Once
+        the sequence ends the provided callback is called with 2 parameters:
+         - True if every note was played, False if the sequence was stopped
+         - Number of notes played
+        Returns a concurrent.futures.Future that resolves to a tuple of the same
+        2 values, or fails with a TimeoutError if the sequence hasn't ended
+        timeout seconds after its total duration (None waits forever).
+        """
+        notes = [(int(frequency_hz), int(duration_ms)) for frequency_hz, duration_ms in notes]
+        assert 1 <= len(notes) <= TONE_SEQUENCE_MAX, 'Sequence must have 1-64 notes!'
+        data = []
+        for frequency_hz, duration_ms in notes:
+            assert 0 <= frequency_hz <= 0x3FFF, 'Frequency must be a value 0-16383!'
+            assert 1 <= duration_ms <= 0x3FFF, 'Duration must be a value 1-16383!'
+            data.extend((frequency_hz & 0x7F, frequency_hz >> 7, duration_ms & 0x7F, duration_ms >> 7))
+        if timeout is not None:
+            timeout += sum(duration_ms for _, duration_ms in notes)/1000.0
+        # Queue the notes in messages that fit the board's sysex buffer, the
+        # first clears any previous sequence and the last starts playback.
+        size = 4*TONE_SEQUENCE_NOTES
+        frames = [data[i:i + size] for i in range(0, len(data), size)]
+        flags = [0]*len(frames)
+        flags[0] |= 0x01
+        flags[-1] |= 0x02
+        with self._send_lock:
+            for frame_flags, frame in zip(flags[:-1], frames[:-1]):
+                self._send([CP_TONE_SEQUENCE, frame_flags] + frame)
+            return self._request(CP_TONE_SEQUENCE_REPLY, [CP_TONE_SEQUENCE, flags[-1]] + frames[-1],
+                                 callback, timeout)
 
-    def read_accel(self, callback):
+    def stop_sequence(self):
+        """Stop playing a tone sequence, see play_sequence."""
+        self._send([CP_TONE_SEQUENCE_STOP])
+
+    def read_accel(self, callback=None, timeout=READ_TIMEOUT):
         """Request an accelerometer reading.  The result will be returned by
         calling the provided callback function and passing it 3 parameters:
          - X acceleration
          - Y acceleration
          - Z acceleration
+        Returns a concurrent.futures.Future that resolves to a tuple of the same
+        3 values, or fails with a TimeoutError if no reply is received within
+        timeout seconds (None waits forever).  Reads can be issued from many
+        threads at once and each reply resolves exactly one request.  The
+        callback is only called for this reading, use start_accel to stream.
         """
-        self._accel_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_READ])
+        return self._request(CP_ACCEL_READ_REPLY, [CP_ACCEL_READ], callback, timeout)
 
-    def read_tap(self, callback):
+    def read_tap(self, callback=None, timeout=READ_TIMEOUT):
         """Request a tap state reading.  The result will be returned by
-        calling the provided callback function and passing it the tap state byte.
+        calling the provided callback function and passing it the single and
+        double tap booleans.  Returns a concurrent.futures.Future that resolves
+        to a tuple of the same 2 values (see read_accel for the timeout).
         """
-        self._tap_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_TAP])
+        return self._request(CP_ACCEL_TAP_REPLY, [CP_ACCEL_TAP], callback, timeout)
 
     def start_tap(self, callback):
         """Request to start streaming tap data from the board.  Will call the
         provided callback with tap data."""
-        self._tap_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_TAP_STREAM_ON])
+        self._tap_callback = self._dispatch('tap', callback)
+        self._send([CP_ACCEL_TAP_STREAM_ON])
 
     def stop_tap(self):
         """Stop streaming tap data from the board."""
         self._tap_callback = None
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_TAP_STREAM_OFF])
+        self._send([CP_ACCEL_TAP_STREAM_OFF])
 
-    def start_accel(self, callback):
+    def start_accel(self, callback, rate_hz=None, format='float'):
         """Request to start streaming accelerometer data from the board.  Will
-        call the provided callback with tap data."""
-        self._accel_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_STREAM_ON])
+        call the provided callback with the X, Y, Z acceleration in
+        meters/second^2 (see read_accel).  Rate_hz is an optional number of
+        samples per second to stream (at most 1000), by default a sample is sent
+        every sampling interval of the firmware.  Format selects how samples are
+        sent by the board:
+          - 'float' = 3 floating point values (default)
+          - 'int16' = raw accelerometer counts and range, less than half the
+            bytes of 'float' so much higher rates are possible.  The counts are
+            scaled to meters/second^2 using the range set with set_accel_range.
+        """
+        assert format in ACCEL_FORMATS, "Format must be 'float' or 'int16'!"
+        assert rate_hz is None or 1 <= rate_hz <= 1000, 'Rate must be a value 1-1000 hz!'
+        self._accel_callback = self._dispatch('accel', callback)
+        if rate_hz is None and format == 'float':
+            self._send([CP_ACCEL_STREAM_ON])
+            return
+        # Pack the interval between samples (in milliseconds) into 2 7-bit bytes.
+        interval_ms = 0 if rate_hz is None else max(1, int(round(1000.0/rate_hz)))
+        self._send([CP_ACCEL_STREAM_CONFIG,
+            ACCEL_FORMATS[format], interval_ms & 0x7F, interval_ms >> 7])
+
+    def start_accel_batched(self, callback, samples_per_frame=10, rate_hz=100):
+        """Request to start streaming batches of accelerometer samples from the
+        board.  The board takes rate_hz samples per second (at most 1000) and
+        sends them samples_per_frame (1-32) at a time, which is much less
+        overhead than a message per sample.  Will call the provided callback
+        with 3 parameters:
+         - NumPy array of shape (samples_per_frame, 3) with the X, Y, Z
+           acceleration in meters/second^2 of each sample
+         - Time of the first sample in milliseconds since the board started
+         - Milliseconds between samples
+        This requires NumPy to be installed.
+        """
+        if np is None:
+            raise RuntimeError('start_accel_batched requires NumPy to be installed!')
+        assert 1 <= samples_per_frame <= ACCEL_BATCH_MAX, 'Samples per frame must be a value 1-32!'
+        assert 1 <= rate_hz <= 1000, 'Rate must be a value 1-1000 hz!'
+        self._accel_batch_callback = self._dispatch('accel_batch', callback)
+        # Pack the interval between samples (in milliseconds) into 2 7-bit bytes.
+        interval_ms = max(1, int(round(1000.0/rate_hz)))
+        self._send([CP_ACCEL_BATCH_ON,
+            samples_per_frame, interval_ms & 0x7F, interval_ms >> 7])
+
+    def stop_accel_batched(self):
+        """Stop streaming batches of accelerometer samples from the board."""
+        self._accel_batch_callback = None
+        self._send([CP_ACCEL_BATCH_OFF])
 
     def stop_accel(self):
-        """Stop streaming tap data from the board."""
+        """Stop streaming accelerometer data from the board."""
         self._accel_callback = None
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_STREAM_OFF])
+        self._send([CP_ACCEL_STREAM_OFF])
 
     def start_temperature(self, callback=None):
         """Enable reading data from the thermistor.  Callback is an optional
@@ -383,7 +1578,7 @@ class CircuitPlayground(PyMata):
         the most recent temperature measurement (but you must still call
         start_temperature once to initialize it!).
         """
-        self._temp_callback = callback
+        self._temp_callback = self._dispatch('temperature', callback)
         self.set_pin_mode(THERM_PIN, self.INPUT, self.ANALOG, self._therm_handler)
 
     def stop_temperature(self):
@@ -407,41 +1602,90 @@ class CircuitPlayground(PyMata):
         raw = self.analog_read(THERM_PIN)
         return raw
 
-    def read_cap_touch(self, input_pin, callback=None):
+    def read_cap_touch(self, input_pin, callback=None, timeout=READ_TIMEOUT):
         """Read the specified input pin as a capacitive touch sensor.  Will
-        invoke the provided callback when the result is available (note this
-        callback is global and will override any previously specified callback).
-        The callback should take three parameters, one that is the cap touch input
+        invoke the provided callback when the result is available.  The callback
+        should take three parameters, one that is the cap touch input
         pin, the next that is a boolean if the cap input was 'pressed' (i.e. above
         a large enough threshold), and a signed integer value that's the raw cap
         touch library result (bigger values mean more capacitance, i.e. something
-        is touching the input).
+        is touching the input).  Returns a concurrent.futures.Future that
+        resolves to a tuple of the same 3 values (see read_accel for the timeout).
         """
-        assert input_pin in [0, 1, 2, 3, 6, 9, 10, 12], 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
-        self._cap_callback = callback
+        assert input_pin in CAP_INPUTS, 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
         # Construct a cap read command and send it.
-        self._command_handler.send_sysex(CP_COMMAND, [CP_CAP_READ, input_pin & 0x7F])
+        return self._request((CP_CAP_REPLY, input_pin), [CP_CAP_READ, input_pin & 0x7F], callback, timeout)
 
-    def start_cap_touch(self, input_pin, callback=None):
+    def start_cap_touch(self, input_pin, callback=None, threshold=None, hysteresis=CAP_HYSTERESIS,
+                        heartbeat_ms=0, heartbeat_callback=None):
         """Start continuous capacitive touch queries for the specified input
         pin.  Will invoke the provided callback each time a new cap touch result
-        is available (note this callback is global and will override any other
-        instances previously specified).  See read_cap_touch for a description of
+        is available (note this callback is per input pin and will override any
+        callback previously specified for the same pin).  See read_cap_touch for a description of
         the callback parameters.
+
+        By default every value read is sent by the board.  If a threshold is
+        provided the board detects touches itself and the callback is only
+        invoked when the input is touched (value above threshold) or released
+        (value below threshold - hysteresis), which is far less serial traffic.
+        Heartbeat_ms optionally also sends the raw value every heartbeat_ms
+        milliseconds (at most 16383), so slow drift can still be watched.  The
+        heartbeat values are passed to heartbeat_callback (with the same
+        parameters as callback) and never to callback, so callback only sees
+        real touch and release events.
         """
-        assert input_pin in [0, 1, 2, 3, 6, 9, 10, 12], 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
-        self._cap_callback = callback
+        assert input_pin in CAP_INPUTS, 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
+        self._cap_callbacks[input_pin] = self._dispatch('cap', callback)
+        self._cap_heartbeat_callbacks[input_pin] = self._dispatch('cap', heartbeat_callback)
+        if threshold is not None or input_pin in self._cap_config:
+            self.set_cap_touch_config(input_pin, threshold or 0, hysteresis, heartbeat_ms)
         # Construct a continuous cap read start command and send it.
-        self._command_handler.send_sysex(CP_COMMAND, [CP_CAP_ON, input_pin & 0x7F])
+        self._send([CP_CAP_ON, input_pin & 0x7F])
 
     def stop_cap_touch(self, input_pin):
         """Stop continuous capacitive touch queries for the specified input
-        pin.
+        pin.  Callbacks of other streaming input pins are left in place.
         """
-        assert input_pin in [0, 1, 2, 3, 6, 9, 10, 12], 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
-        self._cap_callback = None
+        assert input_pin in CAP_INPUTS, 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
+        self._cap_callbacks.pop(input_pin, None)
+        self._cap_heartbeat_callbacks.pop(input_pin, None)
         # Construct a continuous cap read stop command and send it.
-        self._command_handler.send_sysex(CP_COMMAND, [CP_CAP_OFF, input_pin & 0x7F])
+        self._send([CP_CAP_OFF, input_pin & 0x7F])
+
+    def set_cap_touch_config(self, input_pin, threshold=CAP_THRESHOLD, hysteresis=CAP_HYSTERESIS,
+                             heartbeat_ms=0):
+        """Configure touch detection on the board for the specified input pin
+        (see start_cap_touch).  Threshold and hysteresis are raw cap touch
+        values 0-16383, a threshold of 0 turns touch detection off so every
+        value is streamed again.  The threshold is also used for the touched
+        boolean of read_cap_touch.
+        """
+        assert input_pin in CAP_INPUTS, 'Input pin must be a capacitive input (0,1,2,3,6,9,10,12)!'
+        assert 0 <= threshold <= 16383, 'Threshold must be a value 0-16383!'
+        assert 0 <= hysteresis <= threshold or threshold == 0, 'Hysteresis must be a value 0-threshold!'
+        assert 0 <= heartbeat_ms <= 16383, 'Heartbeat must be a value 0-16383 ms!'
+        if threshold == 0:
+            self._cap_config.pop(input_pin, None)
+        else:
+            self._cap_config[input_pin] = (threshold, hysteresis)
+        self._cap_touched.pop(input_pin, None)
+        # Pack the threshold, hysteresis and heartbeat into 2 7-bit bytes each.
+        self._send([CP_CAP_CONFIG, input_pin & 0x7F,
+            threshold & 0x7F, threshold >> 7,
+            hysteresis & 0x7F, hysteresis >> 7,
+            heartbeat_ms & 0x7F, heartbeat_ms >> 7])
+
+    def scan_cap_touch(self, callback=None, timeout=READ_TIMEOUT):
+        """Read all eight capacitive touch inputs with a single command and
+        reply.  Will invoke the provided callback when the result is available.
+        The callback should take two parameters, a tuple of
+        booleans that are true if the input was 'pressed' (i.e. above a large
+        enough threshold, with the same hysteresis as read_cap_touch), and a
+        tuple with the raw cap touch library value of each input.  Both tuples are in the order of the CAP_INPUTS pins
+        (0, 1, 2, 3, 6, 9, 10, 12).  Returns a concurrent.futures.Future that
+        resolves to a tuple of the same 2 values (see read_accel for the timeout).
+        """
+        return self._request(CP_CAP_SCAN_REPLY, [CP_CAP_SCAN], callback, timeout)
 
     def set_accel_range(self, accel_range=0):
         """Set the range of the accelerometer.  Accel_range should be a value of:
@@ -451,7 +1695,7 @@ class CircuitPlayground(PyMata):
           - 3 = +/-16G
         """
         assert accel_range in [0, 1, 2, 3], 'Accel range must be one of 0, 1, 2, 3!'
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_RANGE, accel_range & 0x7F])
+        self._send([CP_ACCEL_RANGE, accel_range & 0x7F])
 
     def set_tap_config(self, tap_type=0, threshold=80):
         """Set the tap detection configuration.  Tap_type should be a value of:
@@ -476,16 +1720,143 @@ class CircuitPlayground(PyMata):
         threshold_low  = threshold & 0x7F
         threshold_high = (threshold & 0xFF) >> 7
         # Send command.
-        self._command_handler.send_sysex(CP_COMMAND, [CP_ACCEL_TAP_CONFIG,
+        self._send([CP_ACCEL_TAP_CONFIG,
             tap_type_low, tap_type_high, threshold_low, threshold_high])
 
-    def sense_color(self, callback=None):
+    def sense_color(self, callback=None, timeout=READ_TIMEOUT):
         """Perform a color sense using NeoPixel #1 and the light sensor. Callback
         should be a function that will be called when a color response is received
         from the board.  This function should take three parameters, the red,
         green, blue byte values that define the color (values that range from
-        0 to 255, i.e. minimum to maximum intensity).
+        0 to 255, i.e. minimum to maximum intensity).  Returns a
+        concurrent.futures.Future that resolves to a tuple of the same 3 values
+        (see read_accel for the timeout).
+        """
+        return self._request(CP_SENSECOLOR_REPLY, [CP_SENSECOLOR], callback, timeout)
+
+    def _mic_period(self, rate_hz):
+        """Return the microseconds between microphone samples for a rate."""
+        assert 100 <= rate_hz <= 20000, 'Rate must be a value 100-20000 hz!'
+        return int(round(1000000.0/rate_hz))
+
+    def capture_audio(self, n_samples, rate_hz=MIC_RATE, timeout=READ_TIMEOUT):
+        """Capture n_samples (1-16383) consecutive microphone samples taken
+        rate_hz times a second (100-20000, about 8000 is the most the classic
+        board can do) and return them as a NumPy int16 array of the unsigned
+        10-bit values (the microphone rests at about the middle, 512).  The
+        board times the samples itself in frames of 32 samples, and only
+        pauses briefly between frames to send them.  Blocks until every sample
+        was received, raises a TimeoutError if that takes timeout seconds
+        longer than the capture itself.  A capture can't run while samples are
+        streamed with start_audio, as the board runs one capture at a time.
+        This requires NumPy to be installed.
+        """
+        if np is None:
+            raise RuntimeError('capture_audio requires NumPy to be installed!')
+        assert 1 <= n_samples <= 16383, 'Number of samples must be a value 1-16383!'
+        period_us = self._mic_period(rate_hz)
+        assert self._audio_callback is None, 'Call stop_audio before capturing audio!'
+        if self._audio_flush:
+            # Frames of a stopped stream or capture can still be on their way,
+            # the version reply is received after all of them so wait for it.
+            self.read_implementation_version(timeout=timeout).result()
+            self._audio_flush = False
+        with self._send_lock:
+            assert self._audio_capture is None, 'Only one audio capture can run at a time!'
+            assert self._audio_callback is None, 'Call stop_audio before capturing audio!'
+            self._audio_capture = [np.empty(n_samples, dtype=np.int16), 0]
+            future = self._request(CP_MIC_SAMPLES_REPLY, [CP_MIC_CAPTURE,
+                n_samples & 0x7F, n_samples >> 7, period_us & 0x7F, period_us >> 7],
+                timeout=n_samples*period_us/1000000.0 + timeout)
+        try:
+            return future.result()[0]
+        except concurrent.futures.TimeoutError:
+            self._send([CP_MIC_CAPTURE_STOP])
+            self._audio_flush = True
+            raise
+        finally:
+            self._audio_capture = None
+
+    def start_audio(self, callback, rate_hz=MIC_RATE):
+        """Request to start streaming raw microphone samples taken rate_hz
+        times a second (see capture_audio) until stop_audio is called.  Will
+        call the provided callback with 3 parameters for each frame of up to 32
+        samples:
+         - NumPy int16 array of the unsigned 10-bit samples
+         - Time of the first sample in microseconds since the board started
+           (wraps around after 2^28 microseconds)
+         - Microseconds between samples
+        Can't be started while capture_audio runs.  This requires NumPy to be
+        installed.
+        """
+        if np is None:
+            raise RuntimeError('start_audio requires NumPy to be installed!')
+        period_us = self._mic_period(rate_hz)
+        with self._send_lock:
+            assert self._audio_capture is None, 'Audio can\'t be streamed while capture_audio runs!'
+            self._audio_callback = self._dispatch('audio', callback)
+            self._send([CP_MIC_CAPTURE, 0, 0, period_us & 0x7F, period_us >> 7])
+
+    def stop_audio(self):
+        """Stop streaming raw microphone samples."""
+        self._audio_callback = None
+        self._send([CP_MIC_CAPTURE_STOP])
+        self._audio_flush = True
+
+    def start_sound_level(self, callback, interval_ms=50, samples=128, rate_hz=MIC_RATE):
+        """Request to start streaming the sound level measured by the board.
+        Every interval_ms milliseconds (at most 16383) the board takes samples
+        (1-4096) microphone samples at rate_hz and calls the provided callback
+        with 2 parameters, the RMS level and the peak level of the samples,
+        both in ADC counts from the average value.  Only the levels are sent,
+        so this is very little data.  The board samples in short slices between
+        its other work, so streams and commands keep running during long
+        windows, and a window that takes longer than the interval delays the
+        next report.
+        """
+        assert 0 <= interval_ms <= 16383, 'Interval must be a value 0-16383 ms!'
+        assert 1 <= samples <= MIC_LEVEL_MAX, 'Samples must be a value 1-4096!'
+        period_us = self._mic_period(rate_hz)
+        self._sound_level_callback = self._dispatch('sound_level', callback)
+        self._send([CP_MIC_LEVEL_ON, interval_ms & 0x7F, interval_ms >> 7,
+            samples & 0x7F, samples >> 7, period_us & 0x7F, period_us >> 7])
+
+    def stop_sound_level(self):
+        """Stop streaming the sound level."""
+        self._sound_level_callback = None
+        self._send([CP_MIC_LEVEL_OFF])
+
+    def read_accel_sync(self, timeout=READ_TIMEOUT):
+        """Read the accelerometer and block until the reply is received, then
+        return a tuple of the X, Y, Z acceleration in meters/second^2.  Raises
+        a TimeoutError if no reply is received within timeout seconds.
+        """
+        return self.read_accel(timeout=timeout).result(timeout)
+
+    def read_tap_sync(self, timeout=READ_TIMEOUT):
+        """Read the tap state and block until the reply is received, then return
+        a tuple of the single and double tap booleans (see read_accel_sync for
+        the timeout).
+        """
+        return self.read_tap(timeout=timeout).result(timeout)
+
+    def read_cap_touch_sync(self, input_pin, timeout=READ_TIMEOUT):
+        """Read the specified capacitive touch input and block until the reply
+        is received, then return a tuple of the input pin, touched boolean and
+        raw cap touch value (see read_accel_sync for the timeout).
+        """
+        return self.read_cap_touch(input_pin, timeout=timeout).result(timeout)
+
+    def sense_color_sync(self, timeout=READ_TIMEOUT):
+        """Perform a color sense and block until the reply is received, then
+        return a tuple of the red, green, blue values (see read_accel_sync for
+        the timeout).
+        """
+        return self.sense_color(timeout=timeout).result(timeout)
+
+    def read_implementation_version_sync(self, timeout=READ_TIMEOUT):
+        """Read the implementation version and block until the reply is
+        received, then return a tuple of the major, minor and bugfix version
+        (see read_accel_sync for the timeout).
         """
-        # Save the passed in callback and then invoke the sense color command.
-        self._sensecolor_callback = callback
-        self._command_handler.send_sysex(CP_COMMAND, [CP_SENSECOLOR])
+        return self.read_implementation_version(timeout=timeout).result(timeout)
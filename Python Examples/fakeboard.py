@@ -0,0 +1,714 @@
+# Simulated Circuit Playground board.
+#
+# This is not an example, rather it's a class that pretends to be a Circuit
+# Playground running CircuitPlaygroundFirmata so the helper class and the
+# examples can be run (and benchmarked) without a board.  The simulated board
+# is connected to a pseudo terminal, or driven directly in-process.  Make sure
+# this file is in the same directory as the examples!  Pseudo terminals are
+# only available on Linux and Mac OSX.
+#
+# Run this file to start a simulated board and print its serial port, then run
+# any example with that port in another terminal:
+#   python fakeboard.py
+#   python accelerometer.py /dev/pts/3
+#
+# Or use it from code:
+#   fake = FakeCircuitPlayground(accel_noise=0.1)
+#   board = CircuitPlayground(fake.open(), fast_connect=True)
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import math
+import os
+import random
+import select
+import struct
+import threading
+import time
+import tty
+
+from circuitplayground import *
+
+
+# Firmata protocol bytes used by PyMata.
+START_SYSEX          = 0xF0
+END_SYSEX            = 0xF7
+REPORT_VERSION       = 0xF9
+SYSTEM_RESET         = 0xFF
+ANALOG_MESSAGE       = 0xE0
+REPORT_ANALOG        = 0xC0
+ANALOG_MAPPING_QUERY = 0x69
+ANALOG_MAPPING_REPLY = 0x6A
+CAPABILITY_QUERY     = 0x6B
+CAPABILITY_REPLY     = 0x6C
+PIN_STATE_QUERY      = 0x6D
+PIN_STATE_REPLY      = 0x6E
+REPORT_FIRMWARE      = 0x79
+SAMPLING_INTERVAL    = 0x7A
+
+# Pins of the board's 32u4 processor, like the Firmata Boards.h definitions.
+TOTAL_PINS          = 30
+ANALOG_PIN_OFFSET   = 18  # Analog input 0 is pin 18, up to analog input 11.
+FIRMWARE_NAME       = 'CircuitPlaygroundFirmata.ino'
+
+# Quarter wave of a sine scaled to +/-127, like the firmware's pixel animation table.
+QUARTER_SINE = [int(round(127*math.sin(i/64.0*math.pi/2))) for i in range(65)]
+PIXEL_ANIM_INTERVAL = 20  # Milliseconds between pixel animation frames.
+
+# Tap register values of the accelerometer for single and double taps.
+TAP_SINGLE = 0x51
+TAP_DOUBLE = 0x62
+
+
+class FakeCircuitPlayground(object):
+    """Simulated Circuit Playground board that answers the same Firmata and
+    Circuit Playground commands as CircuitPlaygroundFirmata.ino with the same
+    replies, and streams data at the rates the firmware would.  Sensor values
+    are attributes that can be changed at any time:
+      - accel: X, Y, Z acceleration in meters/second^2
+      - cap_values: dict of raw cap touch value for each cap input pin
+      - color: red, green, blue bytes returned by a color sense
+      - analog_values: dict of 10-bit value of each analog input (0 is the
+        thermistor)
+      - version: major, minor, bugfix implementation version
+      - mic_tones: list of frequency (hz) and amplitude (ADC counts) tuples of
+        the sine waves the microphone hears, around a bias of 512
+    Gaussian noise with the configured standard deviations is added to each
+    accelerometer, cap touch, analog and microphone value that's sent.  Taps can be
+    simulated with tap().  Commands that only change outputs are recorded in
+    the pixels, brightness and tone attributes, and pixel animations are
+    rendered into the pixels attribute.
+    """
+
+    def __init__(self, accel=(0.0, 0.0, 9.80665), accel_noise=0.0, cap_values=None,
+                 cap_noise=0.0, color=(0, 0, 0), analog_values=None, analog_noise=0.0,
+                 version=(10, 31, 0), sampling_interval_ms=19, seed=None, mic_tones=(),
+                 mic_noise=0.0):
+        self.accel = accel
+        self.accel_noise = accel_noise
+        self.cap_values = dict((pin, 0) for pin in CAP_INPUTS)
+        if cap_values is not None:
+            self.cap_values.update(cap_values)
+        self.cap_noise = cap_noise
+        self.color = color
+        self.analog_values = {THERM_PIN: 512}  # About 25 degrees Celsius.
+        if analog_values is not None:
+            self.analog_values.update(analog_values)
+        self.analog_noise = analog_noise
+        self.version = version
+        self.mic_tones = list(mic_tones)
+        self.mic_noise = mic_noise
+        self.sampling_interval_ms = sampling_interval_ms
+        self._random = random.Random(seed)
+        self._output = None
+        self._master = None
+        self._slave = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._lock = threading.RLock()
+        self._start = time.time()
+        # Bytes received from the host that aren't yet a complete message.
+        self._message = bytearray()
+        self._reset()
+
+    @property
+    def port(self):
+        """Serial port name to pass to CircuitPlayground, or None if the board
+        isn't open.
+        """
+        return None if self._slave is None else os.ttyname(self._slave)
+
+    def open(self):
+        """Connect the board to a new pseudo terminal, start simulating it and
+        return the serial port name to connect to.
+        """
+        self._master, self._slave = os.openpty()
+        # Keep the terminal raw so nothing sent to the host is echoed back.
+        tty.setraw(self._slave)
+        self.start(self._write_master)
+        return self.port
+
+    def start(self, output):
+        """Start simulating the board in a background thread.  Output is a
+        function that's called with a bytearray of the data the board sends.
+        Use this directly to run the board in-process, where the host sends
+        data to the board by calling write.
+        """
+        self._output = output
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def close(self):
+        """Stop simulating the board and close its pseudo terminal."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fd in (self._master, self._slave):
+            if fd is not None:
+                os.close(fd)
+        self._master = self._slave = None
+
+    def millis(self):
+        """Return the milliseconds since the board started, like the Arduino
+        millis function.
+        """
+        return int((time.time() - self._start)*1000.0)
+
+    def micros(self):
+        """Return the microseconds since the board started, like the Arduino
+        micros function.
+        """
+        return int((time.time() - self._start)*1000000.0)
+
+    def tap(self, double=False):
+        """Simulate a single (or double) tap, it will be reported by the next
+        tap reading.
+        """
+        with self._lock:
+            self._tap_register = TAP_DOUBLE if double else TAP_SINGLE
+
+    def write(self, data):
+        """Handle data sent by the host, a string or bytes of any length."""
+        if isinstance(data, str):
+            data = bytearray(ord(c) for c in data)
+        with self._lock:
+            for b in bytearray(data):
+                self._receive(b)
+
+    def _write_master(self, data):
+        os.write(self._master, bytes(data))
+
+    def _reset(self):
+        """Reset the board state, like a Firmata system reset."""
+        self._accel_stream = False
+        self._accel_format = ACCEL_FORMATS['float']
+        self._accel_interval = 0
+        self._previous_accel = 0
+        self._batch_stream = False
+        self._batch_size = 0
+        self._batch_interval = 0
+        self._previous_batch = 0
+        self._batch = []
+        self._batch_start = 0
+        self._accel_range = ACCEL_2G
+        self._tap_stream = False
+        self._tap_register = 0
+        self._cap_streams = set()
+        self._mic_capture = False
+        self._mic_remaining = 0
+        self._mic_period = 125
+        self._mic_next = 0  # Microseconds time of the first sample of the next frame.
+        self._mic_level_stream = False
+        self._mic_level_interval = 50
+        self._mic_level_samples = 128
+        self._mic_level_period = 125
+        self._previous_mic_level = 0
+        # Touch detection of each configured cap input as a list of threshold,
+        # hysteresis, heartbeat interval, touched and last heartbeat time.
+        self._cap_config = {}
+        self._analog_reports = set()
+        self._previous = self.millis()
+        self.pixels = [(0, 0, 0)]*PIXEL_COUNT
+        self.brightness = 20
+        self.tone = None
+        self._pixel_anim = PIXEL_ANIMATIONS['off']
+        self._pixel_anim_frequency = 0
+        self._pixel_anim_phase_step = 0
+        self._pixel_anim_colors = ((0, 0, 0), (0, 0, 0))
+        self._pixel_anim_turn = 0
+        self._previous_pixel_anim = 0
+        # Queued tone sequence notes, index of the next note, and the start
+        # time and duration of the playing note.
+        self._tone_sequence = []
+        self._tone_index = 0
+        self._tone_playing = False
+        self._tone_start = 0
+        self._tone_duration = 0
+
+    def _run(self):
+        """Thread that receives host data from the pseudo terminal and sends
+        streamed data when it's due.
+        """
+        while not self._stop.is_set():
+            timeout = 0.001
+            if self._master is not None:
+                ready, _, _ = select.select([self._master], [], [], timeout)
+                if ready:
+                    try:
+                        self.write(os.read(self._master, 4096))
+                    except OSError:
+                        # The host closed the port, wait for it to reopen.
+                        time.sleep(timeout)
+            else:
+                time.sleep(timeout)
+            with self._lock:
+                self._loop(self.millis())
+
+    def _loop(self, now):
+        """Send streamed data that's due at the provided time in milliseconds,
+        like the loop function of the firmware.
+        """
+        if self._tone_playing and now - self._tone_start >= self._tone_duration:
+            self._play_next_note()
+        if self._pixel_anim and now - self._previous_pixel_anim >= PIXEL_ANIM_INTERVAL:
+            self._render_pixel_animation(now - self._previous_pixel_anim)
+            self._previous_pixel_anim = now
+        if self._accel_stream and self._accel_interval > 0 and now - self._previous_accel >= self._accel_interval:
+            self._previous_accel = now
+            self._send_accel_stream()
+        if self._batch_stream and now - self._previous_batch >= self._batch_interval:
+            self._previous_batch += self._batch_interval
+            if now - self._previous_batch >= self._batch_interval:
+                self._previous_batch = now
+                self._batch = []
+            self._sample_batch(self._previous_batch)
+        if self._mic_capture:
+            self._send_mic_frames(self.micros())
+        if self._mic_level_stream and now - self._previous_mic_level >= self._mic_level_interval:
+            self._previous_mic_level = now
+            self._send_mic_level()
+        if now - self._previous > self.sampling_interval_ms:
+            self._previous += self.sampling_interval_ms
+            for channel in sorted(self._analog_reports):
+                value = self._noisy(self.analog_values.get(channel, 0), self.analog_noise, 0, 1023)
+                self._send(bytearray((ANALOG_MESSAGE | channel, value & 0x7F, value >> 7)))
+            if self._tap_stream:
+                self._send_tap()
+            if self._accel_stream and self._accel_interval == 0:
+                self._send_accel_stream()
+            for pin in CAP_INPUTS:
+                if pin in self._cap_streams:
+                    if pin in self._cap_config:
+                        self._check_cap_events(pin, now)
+                    else:
+                        self._send_cap(pin)
+
+    def _send_tone_sequence(self, completed):
+        self._send_sysex(CP_COMMAND, struct.pack('<3B', CP_TONE_SEQUENCE_REPLY, completed, self._tone_index))
+
+    def _stop_tone_sequence(self):
+        if self._tone_playing:
+            self._tone_playing = False
+            self.tone = None
+            self._send_tone_sequence(False)
+        self._tone_sequence = []
+        self._tone_index = 0
+
+    def _play_next_note(self):
+        """Play the next tone sequence note (recorded in the tone attribute),
+        or finish the sequence after the last note.
+        """
+        if self._tone_index >= len(self._tone_sequence):
+            self._tone_playing = False
+            self.tone = None
+            self._send_tone_sequence(True)
+            self._tone_sequence = []
+            self._tone_index = 0
+            return
+        frequency, duration = self._tone_sequence[self._tone_index]
+        self._tone_start += self._tone_duration
+        self._tone_duration = duration
+        self.tone = (frequency, duration) if frequency > 0 else None
+        self._tone_index += 1
+
+    def _sine_wave8(self, phase):
+        """Return the sine wave at a phase (0-255 is one turn) scaled to 1-255."""
+        i = phase & 0x3F
+        if phase & 0x40:
+            i = 64 - i
+        return 128 - QUARTER_SINE[i] if phase & 0x80 else 128 + QUARTER_SINE[i]
+
+    def _color_wheel(self, position):
+        """Return the color of a color wheel position, like the CircuitPlayground
+        library colorWheel function.
+        """
+        position = 255 - position
+        if position < 85:
+            return (255 - position*3, 0, position*3)
+        if position < 170:
+            position -= 85
+            return (0, position*3, 255 - position*3)
+        position -= 170
+        return (position*3, 255 - position*3, 0)
+
+    def _render_pixel_animation(self, elapsed):
+        """Render a frame of the pixel animation with the firmware's integer math."""
+        self._pixel_anim_turn = (self._pixel_anim_turn + elapsed*self._pixel_anim_frequency) % 1000000
+        phase = self._pixel_anim_turn*4096//62500
+        color0, color1 = self._pixel_anim_colors
+        for i in range(PIXEL_COUNT):
+            pixel_phase = (phase + i*self._pixel_anim_phase_step) & 0xFFFF
+            if self._pixel_anim == PIXEL_ANIMATIONS['rainbow']:
+                self.pixels[i] = self._color_wheel(pixel_phase >> 8)
+                continue
+            if self._pixel_anim == PIXEL_ANIMATIONS['breathe']:
+                weight = self._sine_wave8(phase >> 8)
+                weight = 255 - weight*weight//255
+            elif self._pixel_anim == PIXEL_ANIMATIONS['chase']:
+                weight = self._sine_wave8(pixel_phase >> 8)
+                weight = weight*weight//255
+                weight = 255 - weight*weight//255
+            else:
+                weight = self._sine_wave8(pixel_phase >> 8)
+            # Truncate towards zero like the firmware's integer division.
+            self.pixels[i] = tuple(a + int((b - a)*weight/255.0) for a, b in zip(color0, color1))
+
+    def _noisy(self, value, stddev, low, high):
+        """Return an integer value with noise added, clamped to low-high."""
+        if stddev:
+            value += self._random.gauss(0.0, stddev)
+        return int(max(low, min(high, round(value))))
+
+    def _accel_sample(self):
+        """Return the current X, Y, Z acceleration with noise added."""
+        return [value + (self._random.gauss(0.0, self.accel_noise) if self.accel_noise else 0.0)
+                for value in self.accel]
+
+    def _accel_counts(self):
+        """Return the current acceleration as signed 12-bit counts."""
+        scale = ACCEL_RAW_SCALE[self._accel_range]
+        return [int(max(-2048, min(2047, round(value/scale)))) for value in self._accel_sample()]
+
+    def _send(self, data):
+        if self._output is not None:
+            self._output(data)
+
+    def _send_sysex(self, command, data):
+        """Send a sysex message with each byte of data split into two 7-bit
+        bytes, like Firmata.sendSysex.
+        """
+        message = bytearray((START_SYSEX, command))
+        for b in bytearray(data):
+            message.append(b & 0x7F)
+            message.append(b >> 7)
+        message.append(END_SYSEX)
+        self._send(message)
+
+    def _send_raw_sysex(self, command, data):
+        """Send a sysex message with data that's already 7-bit bytes."""
+        self._send(bytearray((START_SYSEX, command)) + bytearray(data) + bytearray((END_SYSEX,)))
+
+    def _send_accel(self):
+        self._send_sysex(CP_COMMAND, struct.pack('<B3f', CP_ACCEL_READ_REPLY, *self._accel_sample()))
+
+    def _send_accel_raw(self):
+        data = [CP_ACCEL_RAW_REPLY, 0, self._accel_range]
+        for count in self._accel_counts():
+            data.extend((count & 0x7F, (count >> 7) & 0x7F))
+        self._send_raw_sysex(CP_COMMAND, data)
+
+    def _send_accel_stream(self):
+        if self._accel_format == ACCEL_FORMATS['int16']:
+            self._send_accel_raw()
+        else:
+            self._send_accel()
+
+    def _sample_batch(self, sample_millis):
+        if not self._batch:
+            self._batch_start = sample_millis
+        self._batch.append(self._accel_counts())
+        if len(self._batch) < self._batch_size:
+            return
+        data = [CP_ACCEL_BATCH_REPLY, 0, self._accel_range, len(self._batch)]
+        data.extend((self._batch_start >> (i*7)) & 0x7F for i in range(4))
+        data.extend((self._batch_interval & 0x7F, (self._batch_interval >> 7) & 0x7F))
+        for counts in self._batch:
+            for count in counts:
+                data.extend((count & 0x7F, (count >> 7) & 0x7F))
+        self._send_raw_sysex(CP_COMMAND, data)
+        self._batch = []
+
+    def _send_tap(self):
+        # Reading the tap register clears it, like the accelerometer does.
+        self._send_sysex(CP_COMMAND, struct.pack('<BB', CP_ACCEL_TAP_REPLY, self._tap_register))
+        self._tap_register = 0
+
+    def _cap_value(self, pin):
+        return self._noisy(self.cap_values.get(pin, 0), self.cap_noise, -2**31, 2**31 - 1)
+
+    def _send_cap(self, pin, value=None):
+        if value is None:
+            value = self._cap_value(pin)
+        self._send_sysex(CP_COMMAND, struct.pack('<BBl', CP_CAP_REPLY, pin, value))
+
+    def _check_cap_events(self, pin, now):
+        """Send a cap touch event if a configured input was touched or
+        released, and its raw value if a heartbeat is due.
+        """
+        config = self._cap_config[pin]
+        threshold, hysteresis, heartbeat, touched, last_heartbeat = config
+        value = self._cap_value(pin)
+        if not touched and value > threshold:
+            config[3] = True
+            self._send_sysex(CP_COMMAND, struct.pack('<BBBl', CP_CAP_EVENT_REPLY, pin, 1, value))
+        elif touched and value < threshold - hysteresis:
+            config[3] = False
+            self._send_sysex(CP_COMMAND, struct.pack('<BBBl', CP_CAP_EVENT_REPLY, pin, 0, value))
+        if heartbeat > 0 and now - last_heartbeat >= heartbeat:
+            config[4] = now
+            self._send_cap(pin, value)
+
+    def _mic_samples(self, start_us, count, period_us):
+        """Return count microphone samples starting at a time in microseconds."""
+        samples = []
+        for i in range(count):
+            t = (start_us + i*period_us)/1000000.0
+            value = 512 + sum(amplitude*math.sin(2.0*math.pi*frequency*t)
+                              for frequency, amplitude in self.mic_tones)
+            samples.append(self._noisy(value, self.mic_noise, 0, 1023))
+        return samples
+
+    def _send_mic_frames(self, now_us):
+        """Send the microphone frames whose samples were all taken by now.  The
+        simulated board has no gaps between frames.
+        """
+        while self._mic_capture:
+            count = MIC_FRAME_MAX
+            if self._mic_remaining > 0:
+                count = min(count, self._mic_remaining)
+            if now_us < self._mic_next + count*self._mic_period:
+                return
+            start = self._mic_next
+            data = [CP_MIC_SAMPLES_REPLY, 0]
+            data.extend((start >> (i*7)) & 0x7F for i in range(4))
+            data.extend((count, self._mic_period & 0x7F, (self._mic_period >> 7) & 0x7F))
+            for sample in self._mic_samples(start, count, self._mic_period):
+                data.extend((sample & 0x7F, (sample >> 7) & 0x7F))
+            self._send_raw_sysex(CP_COMMAND, data)
+            self._mic_next += count*self._mic_period
+            if self._mic_remaining > 0:
+                self._mic_remaining -= count
+                if self._mic_remaining == 0:
+                    self._mic_capture = False
+
+    def _send_mic_level(self):
+        samples = self._mic_samples(self.micros(), self._mic_level_samples, self._mic_level_period)
+        mean = float(sum(samples))/len(samples)
+        rms = math.sqrt(max(0.0, sum(sample*sample for sample in samples)/float(len(samples)) - mean*mean))
+        peak = int(max(max(samples) - mean, mean - min(samples)))
+        self._send_sysex(CP_COMMAND, struct.pack('<BfH', CP_MIC_LEVEL_REPLY, rms, peak))
+
+    def _receive(self, b):
+        """Handle one byte received from the host."""
+        message = self._message
+        if not message:
+            if b == SYSTEM_RESET:
+                # The firmware reports a playing tone sequence as stopped.
+                self._stop_tone_sequence()
+                self._reset()
+            elif b == REPORT_VERSION:
+                self._send(bytearray((REPORT_VERSION, 2, 5)))
+            elif b >= 0x80 and b != END_SYSEX:
+                message.append(b)
+            # Anything else is stray data and is ignored.
+            return
+        if message[0] == START_SYSEX:
+            if b == END_SYSEX:
+                self._sysex(message[1], message[2:])
+                del message[:]
+            else:
+                message.append(b)
+            return
+        # Reporting commands have 1 byte of data and the others have 2 bytes.
+        message.append(b)
+        if len(message) == (2 if message[0] & 0xE0 == REPORT_ANALOG else 3):
+            self._command(message[0], message[1:])
+            del message[:]
+
+    def _command(self, command, data):
+        """Handle a non-sysex Firmata command."""
+        if command & 0xF0 == REPORT_ANALOG:
+            channel = command & 0x0F
+            if data[0]:
+                self._analog_reports.add(channel)
+            else:
+                self._analog_reports.discard(channel)
+        # Pin modes, digital output and digital reporting aren't simulated.
+
+    def _sysex(self, command, data):
+        """Handle a sysex message."""
+        if command == ANALOG_MAPPING_QUERY:
+            mapping = [pin - ANALOG_PIN_OFFSET if pin >= ANALOG_PIN_OFFSET else 0x7F for pin in range(TOTAL_PINS)]
+            self._send_raw_sysex(ANALOG_MAPPING_REPLY, mapping)
+        elif command == CAPABILITY_QUERY:
+            # Digital input and output for every pin, plus analog for the analog pins.
+            capabilities = []
+            for pin in range(TOTAL_PINS):
+                capabilities.extend((0, 1, 1, 1))
+                if pin >= ANALOG_PIN_OFFSET:
+                    capabilities.extend((2, 10))
+                capabilities.append(0x7F)
+            self._send_raw_sysex(CAPABILITY_REPLY, capabilities)
+        elif command == PIN_STATE_QUERY and data:
+            self._send_raw_sysex(PIN_STATE_REPLY, [data[0], 0, 0])
+        elif command == REPORT_FIRMWARE:
+            name = bytearray(FIRMWARE_NAME.encode('ascii'))
+            self._send_raw_sysex(REPORT_FIRMWARE, [2, 5] + [b for c in name for b in (c & 0x7F, c >> 7)])
+        elif command == SAMPLING_INTERVAL and len(data) >= 2:
+            self.sampling_interval_ms = max(1, data[0] | (data[1] << 7))
+        elif command == CP_COMMAND and data:
+            self._cp_command(data[0], data[1:])
+
+    def _cp_command(self, command, data):
+        """Handle a Circuit Playground command, see the CP_* constants."""
+        if command == CP_PIXEL_SET and len(data) >= 5:
+            self._pixel_anim = PIXEL_ANIMATIONS['off']
+            self._set_pixels(data[0], data[1:5])
+        elif command == CP_PIXEL_SET_ALL and len(data) >= 2:
+            self._pixel_anim = PIXEL_ANIMATIONS['off']
+            self._set_pixels(data[0], data[2:])
+        elif command == CP_PIXEL_CLEAR:
+            self._pixel_anim = PIXEL_ANIMATIONS['off']
+            self.pixels = [(0, 0, 0)]*PIXEL_COUNT
+        elif command == CP_PIXEL_ANIM and len(data) >= 13 and data[0] in PIXEL_ANIMATIONS.values():
+            # Unknown animations are ignored like the firmware does.
+            self._pixel_anim = data[0]
+            self._pixel_anim_frequency = data[1] | (data[2] << 7)
+            self._pixel_anim_phase_step = ((data[3] | (data[4] << 7)) % 1000)*65536//1000
+            self._pixel_anim_colors = (self._unpack_color(data[5:9]), self._unpack_color(data[9:13]))
+            self._pixel_anim_turn = 0
+            self._previous_pixel_anim = self.millis()
+            if self._pixel_anim:
+                self._render_pixel_animation(0)
+        elif command == CP_PIXEL_BRIGHTNESS and data:
+            self.brightness = data[0]
+        elif command == CP_TONE and len(data) >= 4:
+            self._stop_tone_sequence()
+            self.tone = (data[0] | (data[1] << 7), data[2] | (data[3] << 7))
+        elif command == CP_NO_TONE:
+            self._stop_tone_sequence()
+            self.tone = None
+        elif command == CP_TONE_SEQUENCE and data:
+            if data[0] & 0x01:
+                self._stop_tone_sequence()
+            for i in range(1, len(data) - 3, 4):
+                if len(self._tone_sequence) < TONE_SEQUENCE_MAX:
+                    self._tone_sequence.append((data[i] | (data[i+1] << 7), data[i+2] | (data[i+3] << 7)))
+            if data[0] & 0x02 and not self._tone_playing:
+                self._tone_playing = True
+                self._tone_start = self.millis()
+                self._tone_duration = 0
+                self._play_next_note()
+        elif command == CP_TONE_SEQUENCE_STOP:
+            self._stop_tone_sequence()
+        elif command == CP_ACCEL_READ:
+            self._send_accel()
+        elif command == CP_ACCEL_TAP:
+            self._send_tap()
+        elif command == CP_ACCEL_STREAM_ON:
+            self._accel_stream = True
+            self._accel_format = ACCEL_FORMATS['float']
+            self._accel_interval = 0
+        elif command == CP_ACCEL_STREAM_CONFIG and len(data) >= 3:
+            self._accel_stream = True
+            self._accel_format = data[0]
+            self._accel_interval = data[1] | (data[2] << 7)
+            self._previous_accel = self.millis()
+        elif command == CP_ACCEL_STREAM_OFF:
+            self._accel_stream = False
+        elif command == CP_ACCEL_BATCH_ON and len(data) >= 3:
+            self._batch_stream = True
+            self._batch_size = max(1, min(ACCEL_BATCH_MAX, data[0]))
+            self._batch_interval = max(1, data[1] | (data[2] << 7))
+            self._batch = []
+            self._previous_batch = self.millis()
+        elif command == CP_ACCEL_BATCH_OFF:
+            self._batch_stream = False
+        elif command == CP_ACCEL_TAP_STREAM_ON:
+            self._tap_stream = True
+        elif command == CP_ACCEL_TAP_STREAM_OFF:
+            self._tap_stream = False
+        elif command == CP_ACCEL_RANGE and data:
+            self._accel_range = data[0] & 0x03
+        elif command == CP_CAP_READ and data:
+            if data[0] in CAP_INPUTS:
+                self._send_cap(data[0])
+        elif command == CP_CAP_ON and data:
+            if data[0] in CAP_INPUTS:
+                self._cap_streams.add(data[0])
+        elif command == CP_CAP_OFF and data:
+            self._cap_streams.discard(data[0])
+        elif command == CP_CAP_CONFIG and len(data) >= 7:
+            if data[0] in CAP_INPUTS:
+                threshold = data[1] | (data[2] << 7)
+                if threshold == 0:
+                    self._cap_config.pop(data[0], None)
+                else:
+                    self._cap_config[data[0]] = [threshold, data[3] | (data[4] << 7),
+                                                 data[5] | (data[6] << 7), False, self.millis()]
+        elif command == CP_CAP_SCAN:
+            self._send_sysex(CP_COMMAND, struct.pack('<B8l', CP_CAP_SCAN_REPLY,
+                                                     *[self._cap_value(pin) for pin in CAP_INPUTS]))
+        elif command == CP_MIC_CAPTURE and len(data) >= 4:
+            period = data[2] | (data[3] << 7)
+            if period > 0:
+                self._mic_capture = True
+                self._mic_remaining = data[0] | (data[1] << 7)
+                self._mic_period = period
+                self._mic_next = self.micros()
+        elif command == CP_MIC_CAPTURE_STOP:
+            self._mic_capture = False
+        elif command == CP_MIC_LEVEL_ON and len(data) >= 6:
+            samples = data[2] | (data[3] << 7)
+            period = data[4] | (data[5] << 7)
+            if 1 <= samples <= MIC_LEVEL_MAX and period > 0:
+                self._mic_level_stream = True
+                self._mic_level_interval = data[0] | (data[1] << 7)
+                self._mic_level_samples = samples
+                self._mic_level_period = period
+                self._previous_mic_level = self.millis()
+        elif command == CP_MIC_LEVEL_OFF:
+            self._mic_level_stream = False
+        elif command == CP_SENSECOLOR:
+            self._send_sysex(CP_COMMAND, struct.pack('<B3B', CP_SENSECOLOR_REPLY, *self.color))
+        elif command == CP_IMPL_VERS:
+            self._send_sysex(CP_COMMAND, struct.pack('<B3B', CP_IMPL_VERS_REPLY, *self.version))
+        # Tap configuration has no effect on simulated taps.
+
+    def _set_pixels(self, start, data):
+        """Set pixels from their packed 4 byte colors, starting at pixel start."""
+        for i in range(len(data)//4):
+            pixel = start + i
+            if pixel >= PIXEL_COUNT:
+                break
+            self.pixels[pixel] = self._unpack_color(data[i*4:i*4+4])
+
+    def _unpack_color(self, data):
+        """Return the red, green, blue color of a packed 4 byte color."""
+        b1, b2, b3, b4 = data
+        red = ((b1 & 0x7F) << 1) | ((b2 & 0x40) >> 6)
+        green = ((b2 & 0x3F) << 2) | ((b3 & 0x60) >> 5)
+        blue = ((b3 & 0x1F) << 3) | ((b4 & 0x70) >> 4)
+        return (red, green, blue)
+
+
+if __name__ == '__main__':
+    fake = FakeCircuitPlayground(accel_noise=0.05, cap_noise=2.0, analog_noise=1.0)
+    print('Simulated Circuit Playground board on port: {0}'.format(fake.open()))
+    print('Press Ctrl-C to quit...')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        fake.close()
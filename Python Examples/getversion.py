@@ -1,5 +1,4 @@
 #!/usr/bin/python
-import time
 import sys
 
 # Import CircuitPlayground class from the circuitplayground.py in the same directory.
@@ -12,15 +11,12 @@ if len(sys.argv) != 2:
     sys.exit(-1)
 port = sys.argv[1]
 
-# Define a function which will be called when the version is received.
-def print_version(maj, min, fix):
-    print('Detected major={0} minor={1} fix={2}'.format(maj, min, fix))
-
 # Connect to Circuit Playground board on specified port.
 board = CircuitPlayground(port)
 
+# Read the version, this waits only until the board replies.
 print('Reading version:')
-board.read_implementation_version(print_version)
-time.sleep(1)
+major, minor, bugfix = board.read_implementation_version_sync()
+print('Detected major={0} minor={1} fix={2}'.format(major, minor, bugfix))
 # Close Firmata board connection when done.
 board.close()
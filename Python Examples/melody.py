@@ -0,0 +1,40 @@
+#!/usr/bin/python
+import sys
+
+# Import CircuitPlayground class from the circuitplayground.py in the same directory.
+from circuitplayground import CircuitPlayground
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Define a melody as a list of note frequency (hz) and duration (ms) tuples, a
+# frequency of 0 is a rest.  This is the start of 'Ode to Joy'.
+E4, F4, G4, D4, C4 = 330, 349, 392, 294, 262
+quarter = 300
+melody = [(E4, quarter), (E4, quarter), (F4, quarter), (G4, quarter),
+          (G4, quarter), (F4, quarter), (E4, quarter), (D4, quarter),
+          (C4, quarter), (C4, quarter), (D4, quarter), (E4, quarter),
+          (E4, quarter*3//2), (D4, quarter//2), (D4, quarter*2), (0, quarter)]
+
+# Add a short rest after each note so repeated notes can be heard separately.
+notes = []
+for frequency, duration in melody:
+    notes.append((frequency, duration - 30))
+    notes.append((0, 30))
+
+# Send the whole melody to the board, it times the notes itself so they play
+# back to back without any jitter from Python or the serial connection.  The
+# returned future resolves once the board has played the last note.
+print('Playing melody...')
+completed, played = board.play_sequence(notes).result()
+print('Played {0} notes{1}.'.format(played, '' if completed else ' (stopped early)'))
+
+# Close Firmata board connection when done.
+board.close()
@@ -82,11 +82,11 @@ while True:
         red   = int(lerp(x, -1.0, 1.0, c0_red,   c1_red))
         green = int(lerp(x, -1.0, 1.0, c0_green, c1_green))
         blue  = int(lerp(x, -1.0, 1.0, c0_blue,  c1_blue))
-        # Set the pixel color.
-        board.set_pixel(i, red, green, blue)
-    # Push the updated colors out to the pixels (this will make the pixels change
-    # their color, the previous set_pixel calls just change the memory and not
-    # the pixels).
-    board.show_pixels()
+        # Set the pixel color in the board's pixel buffer (this only changes
+        # memory on the computer and doesn't send anything to the board).
+        board.pixels[i] = (red, green, blue)
+    # Send the pixels that changed color to the board and show them.  Pixels
+    # that didn't change since the last frame aren't sent at all.
+    board.pixels.flush()
     # Sleep for a bit between iterations.
     time.sleep(0.01)
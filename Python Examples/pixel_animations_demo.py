@@ -0,0 +1,82 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import CircuitPlayground
+# Renders the frames with NumPy, see pixeleffects.py in the same directory.
+from pixeleffects import PixelEffects
+
+
+# List of color gradients.  Each entry is a 2-tuple of RGB colors.
+COLORS = [ ((255,   0,   0),  (0,   0,   0)),
+           ((0,   255,   0),  (0,   0,   0)),
+           ((0,     0, 255),  (0,   0,   0)),
+           ((255,   0,   0),  (0, 255,   0)),
+           ((255,   0,   0),  (0,   0, 255)),
+           ((0,   255,   0),  (0,   0, 255)) ]
+
+# List of frequency values for the animation.  Higher values are faster
+# animations (this goes directly into the sine wave computation).
+FREQUENCIES = [ 0.25, 0.5, 1, 2 ]
+
+# Global amimation state, the currently selected color combo (index into colors)
+# and the frequency of the aninmation (index into frequencies).
+current_color = 0
+current_frequency = 0
+
+
+# Define functions that will be called when the buttons change state.
+def left_changed(data):
+    global current_color
+    if not data[2]:
+        # Move to the next color when button is released.
+        current_color = (current_color + 1) % len(COLORS)
+
+def right_changed(data):
+    global current_frequency
+    if not data[2]:
+        # Move to the next frequency when button is released.
+        current_frequency = (current_frequency + 1) % len(FREQUENCIES)
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Adjust the brightness of all the pixels by calling set_pixel_brightness.
+# Send a value from 0 - 100 which means dark to full bright.
+# Note that if you go down to 0 brightness you won't be able to go back up
+# to higher brightness because the color information is 'lost'.  It's best to
+# just call set brightness once at the start to set a good max brightness instead
+# of trying to make animations with it.
+board.set_pixel_brightness(50)
+
+# Setup Firmata to listen to button changes.
+# The buttons/switches on Circuit Playground use these pins:
+#  - Left button = Digital pin 4
+#  - Right button = Digital pin 19
+board.set_pin_mode(4, board.INPUT, board.DIGITAL, left_changed)
+board.set_pin_mode(19, board.INPUT, board.DIGITAL, right_changed)
+
+# The effects renderer gives each pixel a phase offset based on its position
+# and computes every pixel of a frame at once.
+effects = PixelEffects()
+
+# Animate moving the colors across the pixels 100 times / 10 seconds.
+print('Animating pixels...')
+print('Press left button to cycle colors and right button to cycle speeds.')
+while True:
+    # Interpolate the color of each pixel using a sine wave with a phase offset
+    # based on pixel position, the result is a gamma corrected frame of red,
+    # green, blue bytes for all 10 pixels.
+    frame = effects.gradient(time.time(), COLORS[current_color], FREQUENCIES[current_frequency])
+    # Send the pixels that changed color to the board and show them.  Pixels
+    # that didn't change since the last frame aren't sent at all.
+    effects.show(board, frame)
+    # Sleep for a bit between iterations.
+    time.sleep(0.01)
@@ -0,0 +1,80 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import CircuitPlayground
+
+
+# List of animations the board can render, see start_pixel_animation.
+ANIMATIONS = [ 'lerp', 'breathe', 'chase', 'rainbow' ]
+
+# List of color gradients, like pixel_animations.py.  Each entry is a 2-tuple
+# of RGB colors.
+COLORS = [ ((255,   0,   0),  (0,   0,   0)),
+           ((0,   255,   0),  (0,   0,   0)),
+           ((0,     0, 255),  (0,   0,   0)),
+           ((255,   0,   0),  (0, 255,   0)),
+           ((255,   0,   0),  (0,   0, 255)),
+           ((0,   255,   0),  (0,   0, 255)) ]
+
+# List of frequency values (animation cycles per second).
+FREQUENCIES = [ 0.25, 0.5, 1, 2 ]
+
+# Global animation state, the currently selected animation, color combo and
+# frequency (indices into the lists above).
+current_animation = 0
+current_color = 0
+current_frequency = 0
+
+
+def start_animation():
+    # Send the whole animation to the board in one message, the board renders
+    # the frames itself so nothing else is sent until the next change.
+    animation = ANIMATIONS[current_animation]
+    print('Animation: {0}, frequency: {1} hz'.format(animation, FREQUENCIES[current_frequency]))
+    board.start_pixel_animation(animation, COLORS[current_color], FREQUENCIES[current_frequency])
+
+# Define functions that will be called when the buttons change state.
+def left_changed(data):
+    global current_color, current_animation
+    if not data[2]:
+        # Move to the next color when button is released, and to the next
+        # animation after the last color.
+        current_color = (current_color + 1) % len(COLORS)
+        if current_color == 0:
+            current_animation = (current_animation + 1) % len(ANIMATIONS)
+        start_animation()
+
+def right_changed(data):
+    global current_frequency
+    if not data[2]:
+        # Move to the next frequency when button is released.
+        current_frequency = (current_frequency + 1) % len(FREQUENCIES)
+        start_animation()
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Set a good max brightness once at the start (see pixel_animations.py).
+board.set_pixel_brightness(50)
+
+# Setup Firmata to listen to button changes.
+# The buttons/switches on Circuit Playground use these pins:
+#  - Left button = Digital pin 4
+#  - Right button = Digital pin 19
+board.set_pin_mode(4, board.INPUT, board.DIGITAL, left_changed)
+board.set_pin_mode(19, board.INPUT, board.DIGITAL, right_changed)
+
+print('Animating pixels on the board...')
+print('Press left button to cycle colors and animations and right button to cycle speeds.')
+start_animation()
+# Nothing to do here, the board keeps animating by itself.
+while True:
+    time.sleep(1.0)
@@ -0,0 +1,135 @@
+# Vectorized pixel effects for Circuit Playground NeoPixels.
+#
+# This is not an example, rather it's a class that renders whole frames of
+# pixel colors with NumPy: sine waves over time and pixel phase, color
+# interpolation and gamma correction for every pixel (or many frames) at once
+# without a Python loop over the pixels.  Make sure this file is in the same
+# directory as the examples!  Requires NumPy (pip install numpy).
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import numpy as np
+
+from circuitplayground import PIXEL_COUNT
+
+
+# Default gamma, the same curve as the gamma8 table of the Adafruit NeoPixel
+# library.
+GAMMA = 2.8
+
+
+class PixelEffects(object):
+    """Render frames of NeoPixel colors with NumPy, for effects that have to be
+    computed on the computer (see CircuitPlayground.start_pixel_animation for
+    animations the board can render itself).  For example the color gradient
+    of pixel_animations.py is:
+
+      effects = PixelEffects()
+      while True:
+          frame = effects.gradient(time.time(), ((255, 0, 0), (0, 0, 255)), 0.5)
+          effects.show(board, frame)
+
+    Every pixel has a phase, the fraction of a cycle it's offset by (by default
+    spread evenly so one cycle covers the pixels).  Times can be a single time
+    in seconds, which renders one frame of shape (pixels, 3), or an array of
+    times, which renders a frame for each with shape times.shape + (pixels, 3).
+    Frames are uint8 red, green, blue values, gamma corrected so equal steps
+    of a value look like equal steps of brightness (gamma None turns this off).
+    """
+
+    def __init__(self, pixel_count=PIXEL_COUNT, phases=None, gamma=GAMMA):
+        if phases is None:
+            phases = np.arange(pixel_count)/float(pixel_count)
+        self.phases = np.asarray(phases, dtype=np.float64)
+        assert self.phases.shape == (pixel_count,), 'Phases must have a value for each pixel!'
+        self.set_gamma(gamma)
+        # Buffers reused to render single frames of a gradient, and the
+        # midpoint and half difference of the last gradient colors.
+        self._angles = 2.0*np.pi*self.phases
+        self._wave = np.empty(pixel_count)
+        self._frame = np.empty((pixel_count, 3))
+        self._index = np.empty((pixel_count, 3), dtype=np.uint8)
+        self._colors = None
+        self._mid = None
+        self._half = None
+
+    def set_gamma(self, gamma):
+        """Set the gamma used to correct colors, None turns correction off."""
+        self.gamma = gamma
+        values = np.arange(256)
+        if gamma is not None:
+            values = np.round(255.0*(values/255.0)**gamma)
+        self._gamma_table = values.astype(np.uint8)
+
+    def wave(self, t, frequency, phases=None):
+        """Return the sine wave (-1 to 1) of every pixel at times t (seconds)
+        for a frequency in cycles per second, with the pixels offset by their
+        phase.  Phases overrides the pixel phases for this call.
+        """
+        if phases is None:
+            phases = self.phases
+        t = np.asarray(t, dtype=np.float64)
+        return np.sin(2.0*np.pi*(frequency*t[..., np.newaxis] + phases))
+
+    def lerp(self, x, color0, color1, x0=-1.0, x1=1.0):
+        """Linearly interpolate each value of x within x0...x1 into a color
+        between color0 and color1, returning float colors with a last axis of
+        red, green, blue.
+        """
+        color0 = np.asarray(color0, dtype=np.float64)
+        weight = (np.asarray(x, dtype=np.float64) - x0)/(x1 - x0)
+        return color0 + weight[..., np.newaxis]*(np.asarray(color1, dtype=np.float64) - color0)
+
+    def to_rgb(self, colors):
+        """Convert float colors (0-255) to gamma corrected uint8 colors."""
+        return self._gamma_table[np.clip(colors, 0, 255).astype(np.uint8)]
+
+    def gradient(self, t, colors, frequency, phases=None):
+        """Render the color gradient of pixel_animations.py, every pixel follows
+        a sine wave between the two colors of colors offset by its phase.
+        """
+        color0, color1 = colors
+        if phases is not None or np.ndim(t) != 0:
+            return self.to_rgb(self.lerp(self.wave(t, frequency, phases), color0, color1))
+        # A single frame is rendered into the reused buffers as a few NumPy
+        # calls, the interpolation of -1...1 is the color midpoint plus the
+        # wave times half the color difference.
+        colors = (tuple(color0), tuple(color1))
+        if colors != self._colors:
+            self._colors = colors
+            self._mid = (np.asarray(color0, dtype=np.float64) + color1)/2.0
+            self._half = (np.asarray(color1, dtype=np.float64) - color0)/2.0
+        wave = self._wave
+        np.add(self._angles, 2.0*np.pi*frequency*t, out=wave)
+        np.sin(wave, out=wave)
+        frame = self._frame
+        np.multiply(wave[:, np.newaxis], self._half, out=frame)
+        np.add(frame, self._mid, out=frame)
+        self._index[...] = frame
+        return self._gamma_table.take(self._index)
+
+    def show(self, board, frame):
+        """Send a frame of shape (pixels, 3) to a board and show it.  The frame
+        goes through the board's pixels buffer in one call, so only the pixels
+        that changed since the last frame are sent.
+        """
+        board.pixels.assign(frame)
+        board.pixels.flush()
@@ -0,0 +1,44 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+from sensorbuffer import SensorRingBuffer
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Create ring buffers that keep the last 1000 accelerometer samples (X, Y, Z)
+# and the last 1000 light sensor readings.  The buffers are passed straight
+# to the streams as their callbacks (this needs NumPy to be installed).
+accel = SensorRingBuffer(1000, channels=3)
+light = SensorRingBuffer(1000)
+board.start_accel(accel, rate_hz=100, format='int16')
+# The light sensor is on analog input 5.
+board.set_pin_mode(5, board.INPUT, board.ANALOG, light.analog)
+
+# Every second print statistics of the data received in the last 2 seconds.
+try:
+    print('Printing sensor statistics, press Ctrl-C to quit...')
+    while True:
+        time.sleep(1.0)
+        times, values = accel.window(2.0)
+        if len(values) > 0:
+            print('Accelerometer: {0} samples, mean {1}, peak to peak {2}'.format(
+                len(values), values.mean(axis=0), values.max(axis=0) - values.min(axis=0)))
+        times, values = light.window(2.0)
+        if len(values) > 0:
+            print('Light: {0} changes, min {1} max {2}'.format(len(values), values.min(), values.max()))
+finally:
+    print('Stopping...')
+    board.stop_accel()
+
+# Close Firmata board connection when done.
+board.close()
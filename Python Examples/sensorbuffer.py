@@ -0,0 +1,164 @@
+# Sensor ring buffer for streamed Circuit Playground data.
+#
+# This is not an example, rather it's a helper class to keep the most recent
+# samples of a Circuit Playground stream in NumPy arrays.  Make sure this file
+# is in the same directory as the examples!  Requires NumPy (pip install numpy).
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import threading
+import time
+
+import numpy as np
+
+
+class SensorRingBuffer(object):
+    """Fixed capacity buffer of the most recent samples of a sensor stream,
+    stored with their host receive time in preallocated NumPy arrays.  An
+    instance can be passed directly as the callback of a stream, for example:
+
+      accel = SensorRingBuffer(1000, channels=3)
+      board.start_accel(accel)                      # Stores x, y, z.
+      board.start_accel_batched(accel.batch)        # Stores each batch at once.
+      cap = SensorRingBuffer(1000, select=(2,))
+      board.start_cap_touch(10, cap)                # Stores the raw cap value.
+      temp = SensorRingBuffer(1000, select=(0,))
+      board.start_temperature(temp)                 # Stores degrees Celsius.
+      light = SensorRingBuffer(1000)
+      board.set_pin_mode(5, board.INPUT, board.ANALOG, light.analog)
+
+    Channels is the number of values stored per sample and select optionally
+    picks which callback parameters (by position) are stored.  Memory use is
+    constant no matter how long the stream runs, once full the oldest samples
+    are overwritten.
+    """
+
+    def __init__(self, capacity, channels=None, select=None, dtype=np.float64):
+        assert capacity > 0, 'Capacity must be at least 1!'
+        if channels is None:
+            channels = 1 if select is None else len(select)
+        assert select is None or len(select) == channels, 'Select must pick one parameter per channel!'
+        self._capacity = capacity
+        self._channels = channels
+        self._select = select
+        # Samples are written twice, at their position and one capacity later,
+        # so the most recent samples are always a contiguous slice that can be
+        # returned as a view without copying.
+        self._times = np.zeros(2*capacity, dtype=np.float64)
+        self._values = np.zeros((2*capacity, channels), dtype=dtype)
+        self._index = 0  # Position the next sample is written to (0 to capacity-1).
+        self._count = 0  # Number of samples stored (at most capacity).
+        self._lock = threading.Lock()
+
+    @property
+    def capacity(self):
+        """Maximum number of samples kept."""
+        return self._capacity
+
+    @property
+    def channels(self):
+        """Number of values stored per sample."""
+        return self._channels
+
+    def __len__(self):
+        return self._count
+
+    def __call__(self, *values):
+        """Store a sample from the values passed to a stream callback."""
+        if self._select is not None:
+            values = [values[i] for i in self._select]
+        self.append(values[:self._channels])
+
+    def analog(self, data):
+        """Store a sample from a PyMata analog pin callback (data is a list of
+        the pin mode, pin number and analog value).
+        """
+        self.append((data[2],))
+
+    def batch(self, samples, timestamp_ms=None, period_ms=None):
+        """Store a batch of samples, for example from start_accel_batched.  The
+        last sample gets the current host time and the others are spaced by
+        period_ms before it (or get the same time if no period is given).
+        """
+        samples = np.asarray(samples).reshape(-1, self._channels)
+        now = time.time()
+        if period_ms is None:
+            times = np.full(len(samples), now)
+        else:
+            times = now - (period_ms/1000.0)*np.arange(len(samples) - 1, -1, -1)
+        self.extend(samples, times)
+
+    def append(self, values, timestamp=None):
+        """Store one sample with values for each channel and a timestamp (by
+        default the current host time from time.time()).
+        """
+        if timestamp is None:
+            timestamp = time.time()
+        with self._lock:
+            i = self._index
+            self._times[i] = self._times[i + self._capacity] = timestamp
+            self._values[i] = self._values[i + self._capacity] = values
+            self._index = (i + 1) % self._capacity
+            self._count = min(self._count + 1, self._capacity)
+
+    def extend(self, values, timestamps):
+        """Store many samples at once, values should have a row of channel
+        values for each sample and timestamps a time for each sample.
+        """
+        values = np.asarray(values).reshape(-1, self._channels)
+        timestamps = np.asarray(timestamps, dtype=np.float64)
+        assert len(values) == len(timestamps), 'Need a timestamp for each sample!'
+        # Only the last capacity samples can be kept.
+        values = values[-self._capacity:]
+        timestamps = timestamps[-self._capacity:]
+        with self._lock:
+            # Write the samples to their positions in both copies of the storage.
+            positions = (self._index + np.arange(len(values))) % self._capacity
+            for offset in (0, self._capacity):
+                self._times[positions + offset] = timestamps
+                self._values[positions + offset] = values
+            self._index = (self._index + len(values)) % self._capacity
+            self._count = min(self._count + len(values), self._capacity)
+
+    def latest(self, n=None):
+        """Return a tuple of timestamps and values (one row per sample) of the
+        most recent n samples (or all stored samples), oldest first.  These are
+        views into the buffer and not copies, so copy them if they need to be
+        kept while more samples arrive.
+        """
+        with self._lock:
+            n = self._count if n is None else min(n, self._count)
+            end = self._index + self._capacity
+        return self._times[end - n:end], self._values[end - n:end]
+
+    def window(self, seconds):
+        """Return a tuple of timestamps and values (views like latest) of the
+        samples received within the last number of seconds.
+        """
+        times, values = self.latest()
+        start = np.searchsorted(times, time.time() - seconds, side='left')
+        return times[start:], values[start:]
+
+    def clear(self):
+        """Remove all the stored samples."""
+        with self._lock:
+            self._index = 0
+            self._count = 0
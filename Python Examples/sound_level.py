@@ -0,0 +1,44 @@
+#!/usr/bin/python
+import time
+import sys
+
+import numpy as np
+
+from circuitplayground import *
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Capture half a second of audio sampled 8000 times a second and print the
+# loudest frequency (this needs NumPy to be installed).
+samples = board.capture_audio(4000, rate_hz=8000)
+spectrum = np.abs(np.fft.rfft(samples - samples.mean()))
+frequencies = np.fft.rfftfreq(len(samples), 1.0/8000)
+print('Loudest frequency: {0:.0f} hz'.format(frequencies[np.argmax(spectrum)]))
+
+# Callback that will be called with the sound level measured by the board.
+# The rms and peak parameters are the RMS and peak level of the microphone
+# samples in ADC counts (0 is silence).
+def sound_level(rms, peak):
+    print('Sound level: RMS {0:6.1f}  peak {1:4d}  {2}'.format(rms, peak, '#'*int(rms/4)))
+
+try:
+    # Let the board measure the sound level 10 times a second, only the levels
+    # are sent instead of every sample.
+    print('Printing sound level (Ctrl-C to quit)...')
+    board.start_sound_level(sound_level, interval_ms=100)
+    while True:
+        time.sleep(1.0)
+finally:
+    print('Stopping!')
+    board.stop_sound_level()
+
+# Close Firmata board connection when done.
+board.close()
@@ -0,0 +1,158 @@
+# Streaming spectrum analyzer for Circuit Playground sample streams.
+#
+# This is not an example, rather it's a class that keeps an overlapping window
+# over streamed samples (like microphone frames or accelerometer batches) and
+# computes a windowed FFT every hop, reporting the peak frequency and the
+# energy in configured frequency bands.  Make sure this file is in the same
+# directory as the examples!  Requires NumPy (pip install numpy).
+#
+# The MIT License (MIT)
+#
+# Copyright 2016 Adafruit Industries
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:  The above copyright
+# notice and this permission notice shall be included in all copies or
+# substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+import numpy as np
+
+
+# NumPy 2.0 added the out parameter of the FFT functions, use it to reuse the
+# output buffer when it's available.
+try:
+    np.fft.rfft(np.zeros(4), out=np.zeros(3, dtype=np.complex128))
+    _RFFT_OUT = True
+except TypeError:
+    _RFFT_OUT = False
+
+
+class SpectrumAnalyzer(object):
+    """Compute the spectrum of a stream of samples over a sliding window.  An
+    instance can be passed directly as the callback of a stream, for example:
+
+      def spectrum(peak_hz, band_energies):
+          print(peak_hz)
+
+      mic = SpectrumAnalyzer(spectrum, window_size=512, hop=128)
+      board.start_audio(mic.audio)                  # Microphone frames.
+      vibration = SpectrumAnalyzer(spectrum, bands=[(5, 15), (15, 40)], select=2)
+      board.start_accel_batched(vibration.batch)    # Z axis of accelerometer batches.
+      tilt = SpectrumAnalyzer(spectrum, sample_rate=50.0, window_size=64)
+      board.start_accel(tilt, rate_hz=50)           # X axis of single samples.
+
+    Every hop new samples (once window_size samples were seen) the last
+    window_size samples have their average removed, are multiplied by a Hann
+    window and transformed with a real FFT.  The callback is called with the
+    frequency of the strongest bin (ignoring the average) and a NumPy array of
+    the energy in each of the bands, which are low and high frequency tuples
+    in hz (the array is empty if no bands are configured).  Sample_rate is the
+    samples per second, when it's None it's taken from the sample interval of
+    the first audio frame or batch.  Select picks which value of multi value
+    samples (like X, Y, Z) is analyzed.
+
+    The window, FFT input, power and band buffers are allocated once and
+    reused, the power and band arrays passed around are overwritten by the
+    next hop so copy them to keep them.
+    """
+
+    def __init__(self, callback=None, window_size=256, hop=64, sample_rate=None, bands=(), select=0):
+        assert window_size >= 4, 'Window size must be at least 4!'
+        assert 0 < hop <= window_size, 'Hop must be a value 1-window size!'
+        self.callback = callback
+        self.window_size = window_size
+        self.hop = hop
+        self.select = select
+        self._bands = list(bands)
+        self._buffer = np.zeros(window_size)   # Last window_size samples, circular.
+        self._index = 0                        # Position the next sample is written to.
+        self._seen = 0                         # Samples seen, up to window_size.
+        self._pending = 0                      # Samples since the last hop.
+        self._window = np.hanning(window_size)
+        self._frame = np.zeros(window_size)
+        self._spectrum = np.zeros(window_size//2 + 1, dtype=np.complex128)
+        self.power = np.zeros(window_size//2 + 1)
+        self.energies = np.zeros(len(self._bands))
+        self.peak_frequency = None
+        self.sample_rate = None
+        self.frequencies = None
+        self._band_mask = None
+        if sample_rate is not None:
+            self._set_sample_rate(sample_rate)
+
+    def _set_sample_rate(self, sample_rate):
+        """Setup the bin frequencies and band masks for a sample rate."""
+        self.sample_rate = float(sample_rate)
+        self.frequencies = np.fft.rfftfreq(self.window_size, 1.0/self.sample_rate)
+        # Each row selects the bins of a band, so the energy of every band is
+        # one matrix product with the power spectrum.
+        self._band_mask = np.zeros((len(self._bands), len(self.frequencies)))
+        for i, (low, high) in enumerate(self._bands):
+            self._band_mask[i, (self.frequencies >= low) & (self.frequencies < high)] = 1.0
+
+    def __call__(self, *values):
+        """Add a sample from the values passed to a stream callback."""
+        self.extend((values[self.select],))
+
+    def audio(self, samples, timestamp_us=None, period_us=None):
+        """Add a frame of samples from start_audio."""
+        if self.sample_rate is None and period_us:
+            self._set_sample_rate(1000000.0/period_us)
+        self.extend(samples)
+
+    def batch(self, samples, timestamp_ms=None, period_ms=None):
+        """Add a batch of samples from start_accel_batched."""
+        if self.sample_rate is None and period_ms:
+            self._set_sample_rate(1000.0/period_ms)
+        self.extend(np.asarray(samples)[:, self.select])
+
+    def extend(self, samples):
+        """Add samples, analyzing the window every hop samples."""
+        samples = np.asarray(samples, dtype=np.float64).ravel()
+        size = self.window_size
+        offset = 0
+        while offset < len(samples):
+            # Copy up to the next hop (or the end of the circular buffer) at once.
+            count = min(len(samples) - offset, self.hop - self._pending, size - self._index)
+            self._buffer[self._index:self._index + count] = samples[offset:offset + count]
+            self._index = (self._index + count) % size
+            self._seen = min(size, self._seen + count)
+            self._pending += count
+            offset += count
+            if self._pending == self.hop:
+                self._pending = 0
+                if self._seen == size:
+                    self._analyze()
+
+    def _analyze(self):
+        """Compute the spectrum of the current window and call the callback."""
+        if self.sample_rate is None:
+            raise RuntimeError('SpectrumAnalyzer needs a sample rate!')
+        # Unroll the circular buffer so the oldest sample is first.
+        i = self._index
+        frame = self._frame
+        frame[:self.window_size - i] = self._buffer[i:]
+        frame[self.window_size - i:] = self._buffer[:i]
+        frame -= frame.mean()
+        frame *= self._window
+        if _RFFT_OUT:
+            np.fft.rfft(frame, out=self._spectrum)
+        else:
+            self._spectrum[:] = np.fft.rfft(frame)
+        np.abs(self._spectrum, out=self.power)
+        np.square(self.power, out=self.power)
+        self.peak_frequency = float(self.frequencies[1 + np.argmax(self.power[1:])])
+        np.dot(self._band_mask, self.power, out=self.energies)
+        if self.callback is not None:
+            self.callback(self.peak_frequency, self.energies)
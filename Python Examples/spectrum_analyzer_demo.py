@@ -0,0 +1,44 @@
+#!/usr/bin/python
+import time
+import sys
+
+from circuitplayground import *
+from spectrum import SpectrumAnalyzer
+
+
+# Grab the serial port from the command line parameters.
+if len(sys.argv) != 2:
+    print('ERROR! Must specify the serial port as command line parameter.')
+    sys.exit(-1)
+port = sys.argv[1]
+
+# Connect to Circuit Playground board on specified port.
+board = CircuitPlayground(port)
+
+# Frequency bands (low and high frequency in hz) to measure the energy of.
+BANDS = [(60, 250), (250, 500), (500, 1000), (1000, 2000), (2000, 4000)]
+
+# Callback that will be called with the loudest frequency and the energy in
+# each band every time the analyzer computes a new spectrum.
+def spectrum(peak_hz, band_energies):
+    bars = ' '.join('{0:<8}'.format('#'*min(8, int(energy/1e6))) for energy in band_energies)
+    print('{0:6.0f} hz  {1}'.format(peak_hz, bars))
+
+# Analyze windows of 512 microphone samples, a new spectrum is computed every
+# 256 samples.  The sample rate is taken from the microphone frames.  The
+# frames wait in a queue for their own thread, so printing doesn't hold up
+# reading the board (see set_dispatch).
+analyzer = SpectrumAnalyzer(spectrum, window_size=512, hop=256, bands=BANDS)
+board.set_dispatch('audio', 'queue')
+
+try:
+    print('Printing the microphone spectrum (Ctrl-C to quit)...')
+    board.start_audio(analyzer.audio, rate_hz=8000)
+    while True:
+        time.sleep(1.0)
+finally:
+    print('Stopping!')
+    board.stop_audio()
+
+# Close Firmata board connection when done.
+board.close()